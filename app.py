@@ -20,6 +20,21 @@ sys.path.append(game_dir)
 app = Flask(__name__)
 app.secret_key = os.urandom(24)
 
+# Worker processes shared by every chess search (Hard difficulty), so that
+# concurrent games cannot each claim every CPU core
+CHESS_SEARCH_WORKERS = min(4, os.cpu_count() or 1)
+
+# เกมหมากรุกที่กำลังเล่นอยู่ เก็บไว้ฝั่งเซิร์ฟเวอร์ (สร้างเมื่อมีการเรียกใช้ครั้งแรก)
+chess_games = None
+
+def get_chess_games():
+    """Registry of live Chess games, shared by all requests"""
+    global chess_games
+    if chess_games is None:
+        from chess_sessions import ChessSessionRegistry
+        chess_games = ChessSessionRegistry()
+    return chess_games
+
 @app.route('/')
 def index():
     return render_template('index.html')
@@ -35,6 +50,11 @@ def checkers():
     ai = request.args.get('ai', '0')
     return render_template('checkers.html', ai_mode=ai)
 
+@app.route('/chess')
+def chess():
+    ai = request.args.get('ai', '0')
+    return render_template('chess.html', ai_mode=ai)
+
 @app.route('/poker')
 def poker():
     """หน้าเกม Poker"""
@@ -586,5 +606,137 @@ def checkers_ai_move():
         'winner': winner,
         'player_turn': True
     })
+
+def chess_session_id(data):
+    """Session id of the chess game: from the request, else from the Flask session"""
+    return (data or {}).get('session_id') or session.get('chess_session_id')
+
+def chess_game_state(game):
+    """Game state returned by the /api/chess/* routes"""
+    legal_moves = {}
+    if game.player_turn:
+        # The whole move map of the player's pieces, so selecting a piece needs no request
+        for (from_row, from_col), moves in game.get_all_valid_moves().items():
+            legal_moves[f"{from_row},{from_col}"] = {
+                f"{to_row},{to_col}": info for (to_row, to_col), info in moves.items()
+            }
+    return {
+        'board': game.board,
+        'fen': game.position.fen(),
+        'player_turn': game.player_turn,
+        'game_over': game.game_over,
+        'winner': game.winner,
+        'move_history': game.move_history,
+        'legal_moves': legal_moves
+    }
+
+@app.route('/api/chess/new_game', methods=['POST'])
+def chess_new_game():
+    """เริ่มเกมหมากรุกใหม่ (ใช้เอนจินเดิมของ session ถ้ามี)"""
+    data = request.get_json() or {}
+    difficulty = data.get('difficulty', 'medium')
+    if difficulty not in ('easy', 'medium', 'hard'):
+        return jsonify({'error': 'Invalid difficulty'}), 400
+    
+    session_id = chess_session_id(data) or str(uuid.uuid4())
+    session['chess_session_id'] = session_id
+    game = get_chess_games().new_game(session_id, difficulty)
+    
+    state = chess_game_state(game)
+    state['session_id'] = session_id
+    state['difficulty'] = difficulty
+    return jsonify(state)
+
+@app.route('/api/chess/legal_moves', methods=['POST'])
+def chess_legal_moves():
+    """การเดินที่ถูกต้องทั้งหมดของฝ่ายที่ถึงตาเดิน ในรูปแบบ {"row,col": {"row,col": info}}"""
+    data = request.get_json() or {}
+    with get_chess_games().use(chess_session_id(data)) as game:
+        if game is None:
+            return jsonify({'error': 'No active game'}), 404
+        return jsonify({'legal_moves': chess_game_state(game)['legal_moves']})
+
+@app.route('/api/chess/move', methods=['POST'])
+def chess_move():
+    """ผู้เล่นเดินหมากรุก"""
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 400
+    
+    try:
+        from_row, from_col = int(data['from_row']), int(data['from_col'])
+        to_row, to_col = int(data['to_row']), int(data['to_col'])
+    except (KeyError, TypeError, ValueError):
+        return jsonify({'error': 'Missing or invalid move coordinates'}), 400
+    
+    with get_chess_games().use(chess_session_id(data)) as game:
+        if game is None:
+            return jsonify({'error': 'No active game'}), 404
+        if game.game_over or not game.player_turn:
+            return jsonify({'error': 'Not player turn'}), 400
+        if not game.make_move(from_row, from_col, to_row, to_col, data.get('promotion_piece')):
+            return jsonify({'error': 'Illegal move'}), 400
+        return jsonify(chess_game_state(game))
+
+@app.route('/api/chess/ai_move', methods=['POST'])
+def chess_ai_move():
+    """AI เดินหมากรุก"""
+    data = request.get_json() or {}
+    with get_chess_games().use(chess_session_id(data)) as game:
+        if game is None:
+            return jsonify({'error': 'No active game'}), 404
+        if game.game_over or game.player_turn:
+            return jsonify({'error': 'Not AI turn'}), 400
+        
+        history_length = len(game.move_history)
+        if not game.ai_move_minimax(game.settings['search_depth']):
+            return jsonify({'error': 'AI could not move'}), 500
+        
+        state = chess_game_state(game)
+        state['move'] = game.move_history[history_length] if len(game.move_history) > history_length else None
+        return jsonify(state)
+
+@app.route('/api/chess/hint', methods=['POST'])
+def chess_hint():
+    """แนะนำการเดินที่ดีที่สุดสำหรับตำแหน่งของเกมที่กำลังเล่นอยู่ (ผลลัพธ์ถูกเก็บในแคช)
+    
+    Hints follow the game's difficulty; /api/chess/analysis scores any FEN
+    """
+    from chess_hints import hint, DEFAULT_HINT_DEPTH
+    data = request.get_json() or {}
+    with get_chess_games().use(chess_session_id(data)) as game:
+        if game is None:
+            return jsonify({'error': 'No active game'}), 404
+        if not game.settings['hint_enabled']:
+            return jsonify({'error': 'Hints are disabled at this difficulty'}), 403
+        fen = game.position.fen()
+    
+    try:
+        best = hint(fen, data.get('depth', DEFAULT_HINT_DEPTH))
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify({'hint': best})
+
+@app.route('/api/chess/analysis', methods=['POST'])
+def chess_analysis():
+    """วิเคราะห์ตำแหน่งหมากรุก: การเดินที่ดีที่สุดหลายแบบพร้อมคะแนนและแนวการเดิน"""
+    from chess_hints import analyse, DEFAULT_ANALYSIS_DEPTH, DEFAULT_LINES
+    data = request.get_json()
+    if not data or 'fen' not in data:
+        return jsonify({'error': 'Missing fen parameter'}), 400
+    
+    try:
+        result = analyse(data['fen'], data.get('depth', DEFAULT_ANALYSIS_DEPTH),
+                         data.get('lines', DEFAULT_LINES))
+    except (ValueError, TypeError) as e:
+        return jsonify({'error': str(e)}), 400
+    
+    return jsonify(result)
+
 if __name__ == '__main__':
+    # The debug reloader runs this twice; only its serving child needs the chess workers
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        from chess_parallel import start_pool
+        start_pool(CHESS_SEARCH_WORKERS)
     app.run(debug=True, host='0.0.0.0', port=5000)
@@ -1,9 +1,54 @@
 import json
+import math
 import os
 import random
 import time
-from copy import deepcopy
 from game_settings import GameSettings
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
+from checkers_bitboard import (Position, START_FEN, O, X, square, square_cell, squares_of,
+                               popcount, board_fen, move_from, move_to, move_captures)
+from checkers_eval import compile_weights, evaluate
+from checkers_endgame import get_default_database
+
+# Scores of a finished game from the AI's point of view: a win found sooner
+# scores higher and a loss put off longer scores higher
+WIN_SCORE = 1000
+WIN_BOUND = WIN_SCORE - 500  # Scores beyond this are wins or losses
+MAX_PLY = 64
+# Plies assumed for a database result stored without its distance
+ENDGAME_UNKNOWN_PLIES = 200
+MCTS_EXPLORATION = 1.4
+MCTS_ROLLOUT_PLIES = 40  # Random plies before a playout is scored by the evaluation
+ROLLOUT_SCORE_SCALE = 3.0  # Men ahead at which a cut-off playout scores tanh(1), about 0.76
+
+
+def _score_to_tt(score, ply):
+    """Make a win/loss score relative to the stored position instead of the root"""
+    if score > WIN_BOUND:
+        return score + ply
+    if score < -WIN_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    """Inverse of _score_to_tt for a position found at this ply"""
+    if score > WIN_BOUND:
+        return score - ply
+    if score < -WIN_BOUND:
+        return score + ply
+    return score
+
+
+def _endgame_score(result, ply):
+    """Search score for the side to move of an endgame database result (outcome, plies)"""
+    outcome, plies = result
+    if outcome == 0:
+        return 0
+    if plies is None:
+        plies = ENDGAME_UNKNOWN_PLIES
+    return outcome * (WIN_SCORE - ply - plies)
+
 
 class Checkers:
     """
@@ -17,9 +62,14 @@ class Checkers:
         self.game_over = False
         self.winner = None
         self.player_turn = True  # True for player (O), False for AI (X)
-        self.must_jump = False
         self.game_settings = GameSettings()
         self.settings = self.game_settings.get_settings()
+        self.tt = TranspositionTable()
+        self.position = Position()
+        self._move_lists = [[] for _ in range(MAX_PLY)]  # Reused move list per search ply
+        self._weights = None  # Evaluation weights, resolved when a search starts
+        self.endgame = get_default_database()  # Exact results of small endings, or None
+        self.mcts = None  # Created by the first get_ai_move()
         self.reset_game()
         self.stats = self.load_stats()
     
@@ -30,22 +80,25 @@ class Checkers:
     
     def reset_game(self):
         """Reset the game to initial state"""
-        # สร้างกระดานเปล่า
-        self.board = [[None for _ in range(self.COLS)] for _ in range(self.ROWS)]
-        
-        # วางหมากเริ่มต้น
-        for row in range(self.ROWS):
-            for col in range(self.COLS):
-                if row % 2 == col % 2:  # ช่องสีเดียวกัน
-                    if row < 3:  # บน 3 แถวแรก - AI
-                        self.board[row][col] = {'piece': 'X', 'king': False}
-                    elif row > 4:  # ล่าง 3 แถวสุดท้าย - Player
-                        self.board[row][col] = {'piece': 'O', 'king': False}
+        # วางหมากเริ่มต้น: X (AI) บน 3 แถวแรก, O (Player) ล่าง 3 แถวสุดท้าย
+        self.position.set_fen(START_FEN)
+        self._sync_board()
         
         self.game_over = False
         self.winner = None
-        self.player_turn = True
-        self.must_jump = False
+        self.tt.clear()
+        if self.mcts is not None:
+            self.mcts.reset_for_new_game()
+    
+    def _sync_board(self):
+        """Rebuild the dict board and the turn the API reads from the bitboard position"""
+        position = self.position
+        self.board = [[None for _ in range(self.COLS)] for _ in range(self.ROWS)]
+        for side, name in ((O, 'O'), (X, 'X')):
+            for sq in squares_of(position.pieces[side]):
+                row, col = square_cell(sq)
+                self.board[row][col] = {'piece': name, 'king': bool(position.kings >> sq & 1)}
+        self.player_turn = position.side == O
     
     def load_stats(self):
         """Load game statistics from file"""
@@ -110,6 +163,9 @@ class Checkers:
     def get_valid_moves(self, row, col):
         """Get all valid moves for a piece at the given position
         
+        Captures are mandatory for the whole side, and a multi-jump is one
+        move to the square where it ends.
+        
         Returns:
             dict: Dictionary where key is destination (row,col) and value is list of captured pieces
         """
@@ -123,100 +179,14 @@ class Checkers:
         if (self.player_turn and piece['piece'] != 'O') or (not self.player_turn and piece['piece'] != 'X'):
             return {}
         
-        # If there's a mandatory jump, only return jump moves
-        jumps = self._get_jump_moves(row, col)
-        if self.must_jump or jumps:
-            return jumps
-        
-        # Otherwise, also include regular moves
-        return {**self._get_regular_moves(row, col), **jumps}
-    
-    def _get_regular_moves(self, row, col):
-        """Get non-capture moves for a piece
-        
-        Returns:
-            dict: Dictionary where key is destination (row,col) and value is an empty list
-        """
+        from_sq = square(row, col)
         valid_moves = {}
-        piece = self.board[row][col]
-        
-        # Movement directions
-        directions = []
-        if piece['piece'] == 'O' or piece['king']:  # Player or any king (move up)
-            directions.extend([(-1, -1), (-1, 1)])
-        if piece['piece'] == 'X' or piece['king']:  # AI or any king (move down)
-            directions.extend([(1, -1), (1, 1)])
-        
-        # Check valid moves in each direction
-        for dr, dc in directions:
-            r, c = row + dr, col + dc
-            if 0 <= r < self.ROWS and 0 <= c < self.COLS and self.board[r][c] is None:
-                valid_moves[(r, c)] = []  # No pieces captured for regular moves
-        
+        for move in self.position.legal_moves():
+            if move_from(move) == from_sq:
+                valid_moves.setdefault(square_cell(move_to(move)),
+                                       [square_cell(sq) for sq in squares_of(move_captures(move))])
         return valid_moves
     
-    def _get_jump_moves(self, row, col, captured=None):
-        """Get possible jump moves (capturing opponent's pieces)
-        
-        Args:
-            row, col: Current piece position
-            captured: Optional list of already captured positions in this sequence
-            
-        Returns:
-            dict: Dictionary where key is destination (row,col) and value is list of captured pieces
-        """
-        if captured is None:
-            captured = []
-        
-        valid_jumps = {}
-        piece = self.board[row][col]
-        
-        # Jumping directions
-        directions = []
-        if piece['piece'] == 'O' or piece['king']:  # Player or any king (move up)
-            directions.extend([(-1, -1), (-1, 1)])
-        if piece['piece'] == 'X' or piece['king']:  # AI or any king (move down)
-            directions.extend([(1, -1), (1, 1)])
-        
-        # Check for jumps in each direction
-        opponent = 'X' if piece['piece'] == 'O' else 'O'
-        
-        for dr, dc in directions:
-            # Position to jump over (opponent)
-            r1, c1 = row + dr, col + dc
-            # Landing position
-            r2, c2 = row + 2*dr, col + 2*dc
-            
-            # Check if jump is valid
-            if (0 <= r1 < self.ROWS and 0 <= c1 < self.COLS and 
-                0 <= r2 < self.ROWS and 0 <= c2 < self.COLS and
-                self.board[r1][c1] is not None and self.board[r1][c1]['piece'] == opponent and
-                self.board[r2][c2] is None and (r1, c1) not in captured):
-                
-                # This is a valid jump
-                new_captured = captured + [(r1, c1)]
-                valid_jumps[(r2, c2)] = new_captured
-                
-                # Recursively check for multi-jumps
-                # Temporarily move piece to check for further jumps
-                original_piece = self.board[r1][c1]
-                self.board[r2][c2] = piece
-                self.board[row][col] = None
-                self.board[r1][c1] = None
-                
-                # Get more jumps from the new position
-                more_jumps = self._get_jump_moves(r2, c2, new_captured)
-                
-                # Restore original board state
-                self.board[row][col] = piece
-                self.board[r1][c1] = original_piece
-                self.board[r2][c2] = None
-                
-                # Add multi-jumps to valid moves
-                valid_jumps.update(more_jumps)
-        
-        return valid_jumps
-    
     def make_move(self, from_row, from_col, to_row, to_col):
         """Make a move from one position to another
         
@@ -224,43 +194,23 @@ class Checkers:
             bool: True if move was successful, False otherwise
         """
         # Check if the move is valid
-        valid_moves = self.get_valid_moves(from_row, from_col)
-        
-        if (to_row, to_col) not in valid_moves:
+        move = self.position.find_move(square(from_row, from_col), square(to_row, to_col))
+        if move is None:
             return False
         
-        # Get the piece being moved
-        piece = self.board[from_row][from_col]
-        
-        # Check for promotion to king (reaching the opposite side)
-        if (piece['piece'] == 'O' and to_row == 0) or (piece['piece'] == 'X' and to_row == self.ROWS - 1):
-            piece['king'] = True
-        
-        # Execute the move
-        self.board[to_row][to_col] = piece
-        self.board[from_row][from_col] = None
-        
-        # Handle captures
-        captured = valid_moves[(to_row, to_col)]
-        for r, c in captured:
-            self.board[r][c] = None
+        # Execute the move: captures, promotion and the turn switch
+        self.position.make(move)
+        self._sync_board()
         
         # Check for end of game
         if self.check_game_over():
             return True
         
-        # Check if another jump is possible from the new position
-        possible_jumps = self._get_jump_moves(to_row, to_col)
-        
-        # Switch turns if no more jumps or different piece
-        if not captured or not possible_jumps:
-            self.player_turn = not self.player_turn
-            
-            # Check if the next player has any valid moves
-            if not self.has_valid_moves():
-                # No valid moves means game over
-                self.game_over = True
-                self.winner = 'X' if self.player_turn else 'O'  # Winner is the opposite player
+        # Check if the next player has any valid moves
+        if not self.has_valid_moves():
+            # No valid moves means game over
+            self.game_over = True
+            self.winner = 'X' if self.player_turn else 'O'  # Winner is the opposite player
         
         return True
     
@@ -270,25 +220,7 @@ class Checkers:
         Returns:
             bool: True if valid moves exist, False otherwise
         """
-        piece_type = 'O' if self.player_turn else 'X'
-        
-        # First check for any jump moves (they're mandatory)
-        for row in range(self.ROWS):
-            for col in range(self.COLS):
-                if (self.board[row][col] is not None and 
-                    self.board[row][col]['piece'] == piece_type and
-                    self._get_jump_moves(row, col)):
-                    return True
-        
-        # If no jumps, check for any regular moves
-        for row in range(self.ROWS):
-            for col in range(self.COLS):
-                if (self.board[row][col] is not None and 
-                    self.board[row][col]['piece'] == piece_type and
-                    self._get_regular_moves(row, col)):
-                    return True
-        
-        return False
+        return bool(self.position.legal_moves())
     
     def check_game_over(self):
         """Check if the game is over (one player has no pieces or no valid moves)
@@ -297,16 +229,8 @@ class Checkers:
             bool: True if game is over, False otherwise
         """
         # Count pieces
-        player_pieces = 0
-        ai_pieces = 0
-        
-        for row in range(self.ROWS):
-            for col in range(self.COLS):
-                if self.board[row][col] is not None:
-                    if self.board[row][col]['piece'] == 'O':
-                        player_pieces += 1
-                    else:
-                        ai_pieces += 1
+        player_pieces = popcount(self.position.pieces[O])
+        ai_pieces = popcount(self.position.pieces[X])
         
         # Check if one player has no pieces left
         if player_pieces == 0:
@@ -347,9 +271,9 @@ class Checkers:
                         mid_row, mid_col = row + dr//2, col + dc//2
                         
                         if (0 <= new_row < self.ROWS and 0 <= new_col < self.COLS and
-                            self.board[new_row][new_col] is None and
-                            self.board[mid_row][mid_col] and
-                            self.board[mid_row][mid_col]['piece'] == 'O'):
+                            board[new_row][new_col] is None and
+                            board[mid_row][mid_col] and
+                            board[mid_row][mid_col]['piece'] == 'O'):
                             possible_jumps += 1
         
         # คำนวณความซับซ้อนโดยรวม
@@ -358,7 +282,11 @@ class Checkers:
         return complexity
     
     def get_ai_move(self):
-        """รับการเคลื่อนที่ของ AI"""
+        """รับการเคลื่อนที่ของ AI (MCTS จำกัดเวลา, ดู algorithm.mcts)
+        
+        Returns:
+            tuple: ((from_row, from_col), (to_row, to_col)), or None when X has no move
+        """
         settings = self.game_settings.adjust_settings('checkers')
         
         # คำนวณเวลาคิดตามความซับซ้อนของกระดาน
@@ -366,57 +294,33 @@ class Checkers:
         complexity = self.calculate_board_complexity(self.board)
         thinking_time = self.game_settings.calculate_thinking_time('checkers', move_count, complexity)
         
-        # ปรับความลึกของการค้นหาตามเวลาคิด
-        search_depth = min(settings['search_depth'], int(thinking_time * 1.5))
-        
         # ใช้ MCTS สำหรับการค้นหาการเคลื่อนที่ที่ดีที่สุด
-        from algorithm.mcts import MCTS
-        mcts = MCTS()
-        
-        # ปรับพารามิเตอร์ตามระดับความยาก
-        mcts.set_parameters(
-            search_depth=search_depth,
-            time_limit=thinking_time,
-            pattern_weight=settings['pattern_weight'],
-            randomness=settings['randomness'],
-            king_capture_bonus=settings['king_capture_bonus']
-        )
+        if self.mcts is None:
+            from algorithm.mcts import MCTS
+            self.mcts = MCTS(rollout_limit=MCTS_ROLLOUT_PLIES, evaluate=self._rollout_score)
+        # ปรับพารามิเตอร์ตามระดับความยาก: ค้นหากว้างขึ้นเมื่อสุ่มมากขึ้น
+        self.mcts.exploration_weight = MCTS_EXPLORATION * (1.0 + settings['randomness'])
+        self._weights = compile_weights(settings)
         
         # ทำให้ AI ช้าลงในโหมดง่ายเพื่อให้ผู้เล่นมีเวลาคิด
         if settings['ai_delay'] > 0:
             time.sleep(settings['ai_delay'])
         
-        # ค้นหาการเคลื่อนที่ที่ดีที่สุด
-        best_move = mcts.search(self.board, self.player_turn)
-        return best_move
+        # ค้นหาการเคลื่อนที่ที่ดีที่สุด (the position is played on and restored)
+        best_move = self.mcts.search(self.position, thinking_time)
+        if best_move is None:
+            return None
+        return square_cell(move_from(best_move)), square_cell(move_to(best_move))
+    
+    def _rollout_score(self, position):
+        """Score of a cut-off MCTS playout for the side to move, between -1 and 1"""
+        score = math.tanh(evaluate(position, self._weights) / ROLLOUT_SCORE_SCALE)
+        return score if position.side == X else -score
     
     def evaluate_board(self, board):
-        """ประเมินค่ากระดาน"""
-        settings = self.game_settings.adjust_settings('checkers')
-        
-        score = 0
-        for row in range(self.ROWS):
-            for col in range(self.COLS):
-                piece = board[row][col]
-                if piece:
-                    if piece['piece'] == 'O':  # Player piece
-                        score -= 1
-                        if piece['king']:
-                            score -= 2
-                    else:  # AI piece
-                        score += 1
-                        if piece['king']:
-                            score += 2
-        
-        # เพิ่มโบนัสสำหรับการจับกษัตริย์
-        if self.must_jump:
-            score += settings['king_capture_bonus']
-        
-        # ปรับคะแนนตามความซับซ้อนของกระดาน
-        complexity = self.calculate_board_complexity(board)
-        score *= (1 + complexity * 0.1)
-        
-        return score
+        """ประเมินค่ากระดาน (คะแนนจากมุมมองของ AI, ดู checkers_eval)"""
+        weights = compile_weights(self.game_settings.adjust_settings('checkers'))
+        return evaluate(Position(board_fen(board)), weights)
     
     def minimax(self, depth, alpha, beta, maximizing_player):
         """Minimax algorithm with alpha-beta pruning
@@ -429,61 +333,84 @@ class Checkers:
         Returns:
             tuple: (best_move, best_score) where move is ((from_row, from_col), (to_row, to_col))
         """
-        # Terminal cases
-        if depth == 0 or self.game_over:
-            return None, self.evaluate_board(self.board)
+        # Difficulty-dependent weights are looked up once, not at every leaf
+        self._weights = compile_weights(self.game_settings.adjust_settings('checkers'))
+        root = self.endgame.probe_root(self.position) if self.endgame is not None else None
+        if root is not None:
+            # Small endings are solved exactly, no search needed
+            best_move, result = root
+            best_score = _endgame_score(result, 0)
+            if self.position.side == O:
+                best_score = -best_score
+        else:
+            best_move, best_score = self._search(depth, alpha, beta, maximizing_player, 0)
+        if best_move is None:
+            return None, best_score
+        return (square_cell(move_from(best_move)), square_cell(move_to(best_move))), best_score
+    
+    def _search(self, depth, alpha, beta, maximizing_player, ply):
+        """minimax() on the bitboard position, with packed moves
+        
+        Moves are played with Position.make/unmake, and the moves of each
+        ply are generated into the same list every time.
         
-        # Find all valid moves for current player
-        all_moves = {}  # (from_pos, to_pos): captured_list
-        piece_type = 'X' if maximizing_player else 'O'
+        Returns:
+            tuple: (best packed move or None, best_score); the root (ply 0)
+                   always returns a move when it has one
+        """
+        position = self.position
         
-        # First check for jumps (they're mandatory)
-        jumps_found = False
+        # Endgame database: exact results below the root, leaves included
+        if ply > 0 and self.endgame is not None:
+            result = self.endgame.probe(position)
+            if result is not None:
+                score = _endgame_score(result, ply)
+                return None, score if maximizing_player else -score
         
-        for row in range(self.ROWS):
-            for col in range(self.COLS):
-                if (self.board[row][col] is not None and 
-                    self.board[row][col]['piece'] == piece_type):
-                    jumps = self._get_jump_moves(row, col)
-                    if jumps:
-                        jumps_found = True
-                        for to_pos, captured in jumps.items():
-                            all_moves[((row, col), to_pos)] = captured
-        
-        # If no jumps, get regular moves
-        if not jumps_found:
-            for row in range(self.ROWS):
-                for col in range(self.COLS):
-                    if (self.board[row][col] is not None and 
-                        self.board[row][col]['piece'] == piece_type):
-                        regular_moves = self._get_regular_moves(row, col)
-                        for to_pos, _ in regular_moves.items():
-                            all_moves[((row, col), to_pos)] = []
+        # Terminal cases
+        if depth == 0 or self.game_over:
+            return None, evaluate(position, self._weights)
+        
+        # Transposition table: repeated positions cost one lookup
+        key = position.key
+        alpha_orig, beta_orig = alpha, beta
+        hash_move = NO_MOVE
+        entry = self.tt.probe(key)
+        if entry is not None:
+            tt_depth, tt_flag, tt_score, hash_move = entry
+            # The root is always searched, so its move comes from this search
+            if ply > 0 and tt_depth >= depth and hash_move != NO_MOVE:
+                tt_score = _score_from_tt(tt_score, ply)
+                if (tt_flag == EXACT or
+                        (tt_flag == LOWER_BOUND and tt_score >= beta) or
+                        (tt_flag == UPPER_BOUND and tt_score <= alpha)):
+                    return hash_move, tt_score
+        
+        # Valid moves for the side to move (jumps only when there is one)
+        moves = position.legal_moves(self._move_lists[ply])
         
         # If no valid moves, game is over for this player
-        if not all_moves:
-            # No moves means player loses
-            return None, float('inf') if maximizing_player else float('-inf')
+        if not moves:
+            # No moves means the side to move loses
+            return None, -(WIN_SCORE - ply) if maximizing_player else WIN_SCORE - ply
+        
+        # Search the stored best move first
+        if hash_move != NO_MOVE and hash_move in moves:
+            index = moves.index(hash_move)
+            moves[0], moves[index] = hash_move, moves[0]
         
         # Track best move and score
         best_move = None
         
         if maximizing_player:
             best_score = float('-inf')
-            for move, captured in all_moves.items():
-                (from_row, from_col), (to_row, to_col) = move
-                
-                # Make the move
-                self._make_temp_move(from_row, from_col, to_row, to_col, captured)
-                
-                # Recursive call
-                _, score = self.minimax(depth - 1, alpha, beta, False)
-                
-                # Undo the move
-                self._undo_temp_move(from_row, from_col, to_row, to_col, captured)
+            for move in moves:
+                position.make(move)
+                _, score = self._search(depth - 1, alpha, beta, False, ply + 1)
+                position.unmake()
                 
                 # Update best score and move
-                if score > best_score:
+                if best_move is None or score > best_score:
                     best_score = score
                     best_move = move
                 
@@ -491,25 +418,16 @@ class Checkers:
                 alpha = max(alpha, best_score)
                 if alpha >= beta:
                     break
-            
-            return best_move, best_score
         
         else:  # Minimizing player
             best_score = float('inf')
-            for move, captured in all_moves.items():
-                (from_row, from_col), (to_row, to_col) = move
-                
-                # Make the move
-                self._make_temp_move(from_row, from_col, to_row, to_col, captured)
-                
-                # Recursive call
-                _, score = self.minimax(depth - 1, alpha, beta, True)
-                
-                # Undo the move
-                self._undo_temp_move(from_row, from_col, to_row, to_col, captured)
+            for move in moves:
+                position.make(move)
+                _, score = self._search(depth - 1, alpha, beta, True, ply + 1)
+                position.unmake()
                 
                 # Update best score and move
-                if score < best_score:
+                if best_move is None or score < best_score:
                     best_score = score
                     best_move = move
                 
@@ -517,38 +435,17 @@ class Checkers:
                 beta = min(beta, best_score)
                 if alpha >= beta:
                     break
-            
-            return best_move, best_score
-    
-    def _make_temp_move(self, from_row, from_col, to_row, to_col, captured):
-        """Make a temporary move for the minimax algorithm"""
-        # Store original board state
-        self.original_board = deepcopy(self.board)
-        self.original_turn = self.player_turn
         
-        # Make the move
-        piece = self.board[from_row][from_col]
-        
-        # Check for promotion
-        if (piece['piece'] == 'O' and to_row == 0) or (piece['piece'] == 'X' and to_row == self.ROWS - 1):
-            piece['king'] = True
-        
-        # Execute the move
-        self.board[to_row][to_col] = piece
-        self.board[from_row][from_col] = None
-        
-        # Handle captures
-        for r, c in captured:
-            self.board[r][c] = None
+        # Scores are from the AI's point of view in both branches
+        if best_score <= alpha_orig:
+            flag = UPPER_BOUND
+        elif best_score >= beta_orig:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        self.tt.store(key, depth, flag, _score_to_tt(best_score, ply), best_move)
         
-        # Change turn
-        self.player_turn = not self.player_turn
-    
-    def _undo_temp_move(self, from_row, from_col, to_row, to_col, captured):
-        """Undo a temporary move made for the minimax algorithm"""
-        # Restore original board state
-        self.board = self.original_board
-        self.player_turn = self.original_turn
+        return best_move, best_score
     
     def ai_move_minimax(self):
         """Make an AI move using minimax algorithm
@@ -0,0 +1,519 @@
+"""
+Bitboard position representation for the Checkers engine
+
+Only the 32 playable squares of ``Checkers.board`` (those with
+``row % 2 == col % 2``) are numbered: square ``row * 4 + col // 2``, so
+row 0 (X's back rank) holds squares 0-3 and row 7 (O's back rank) holds
+squares 28-31. A bitboard is a Python int whose bit ``sq`` is set when
+the square is occupied.
+
+O moves first and up the board (towards row 0), X moves down. Captures
+are mandatory, a multi-jump must be played to the end, men capture
+forwards only, and a man that reaches the far row is crowned, which
+ends the move.
+
+Moves are packed into ints::
+
+    bits 0-4    from square
+    bits 5-9    to square
+    bits 10-41  bitboard of the captured pieces
+
+so a move is identified by where it starts, where it ends and what it
+takes, whatever order the jumps were made in.
+
+Positions are written as ``<side>:O<squares>:X<squares>``, squares
+numbered from 1 and kings prefixed with K, e.g. ``X:OK3,22:X14``.
+"""
+from transposition import ZobristKeys
+
+# Sides, also the index into Position.pieces
+O, X = 0, 1
+SIDE_NAMES = 'OX'
+
+FULL = (1 << 32) - 1
+
+# Zobrist keys: O man, O king, X man, X king on the 32 squares
+ZOBRIST = ZobristKeys(4, 32)
+PIECE_KEYS = ZOBRIST.pieces  # Index is (side * 2 + is_king) * 32 + square
+SIDE_KEY = ZOBRIST.side
+
+SQUARE_ROW = [sq // 4 for sq in range(32)]
+SQUARE_COL = [2 * (sq % 4) + (sq // 4) % 2 for sq in range(32)]
+
+# Men are crowned on the far row: row 0 for O, row 7 for X
+PROMOTION_ROW = (0xF, 0xF << 28)
+
+# Undo records preallocated per position; the lists double if a game outgrows them
+MAX_PLY = 256
+
+UP = ((-1, -1), (-1, 1))
+DOWN = ((1, -1), (1, 1))
+
+
+def square(row, col):
+    """Square index of a board cell, or -1 for a cell pieces never stand on"""
+    if 0 <= row < 8 and 0 <= col < 8 and row % 2 == col % 2:
+        return row * 4 + col // 2
+    return -1
+
+
+def square_cell(sq):
+    """(row, col) of a square index"""
+    return SQUARE_ROW[sq], SQUARE_COL[sq]
+
+
+def encode_move(from_sq, to_sq, captures=0):
+    """Pack a move into an int"""
+    return from_sq | (to_sq << 5) | (captures << 10)
+
+
+def move_from(move):
+    """From square of a packed move"""
+    return move & 31
+
+
+def move_to(move):
+    """To square of a packed move"""
+    return (move >> 5) & 31
+
+
+def move_captures(move):
+    """Bitboard of the pieces a packed move captures"""
+    return move >> 10
+
+
+def popcount(bb):
+    """Number of set bits in a bitboard"""
+    return bin(bb).count('1')
+
+
+def squares_of(bb):
+    """Square indexes of the set bits, lowest first"""
+    squares = []
+    while bb:
+        bit = bb & -bb
+        squares.append(bit.bit_length() - 1)
+        bb ^= bit
+    return squares
+
+
+def move_to_text(move):
+    """Move in checkers notation, squares numbered from 1: '22-18' or '23x14'"""
+    separator = 'x' if move >> 10 else '-'
+    return f"{(move & 31) + 1}{separator}{((move >> 5) & 31) + 1}"
+
+
+def _shift_masks(directions, distance):
+    """Group the squares by how far their index moves along the directions
+
+    Returns:
+        tuple: (shift, mask) pairs: every square in mask has a square
+               ``distance`` steps away in one of the directions, whose
+               index is the square's plus shift
+    """
+    masks = {}
+    for sq in range(32):
+        row, col = square_cell(sq)
+        for dr, dc in directions:
+            to = square(row + dr * distance, col + dc * distance)
+            if to >= 0:
+                masks[to - sq] = masks.get(to - sq, 0) | (1 << sq)
+    return tuple(sorted(masks.items()))
+
+
+def _jump_masks(directions):
+    """Group the squares by the index shifts of the jumped and landing squares
+
+    Returns:
+        tuple: (over_shift, land_shift, mask) triples
+    """
+    masks = {}
+    for sq in range(32):
+        row, col = square_cell(sq)
+        for dr, dc in directions:
+            land = square(row + 2 * dr, col + 2 * dc)
+            if land >= 0:
+                over = square(row + dr, col + dc)
+                shifts = (over - sq, land - sq)
+                masks[shifts] = masks.get(shifts, 0) | (1 << sq)
+    return tuple((over, land, mask) for (over, land), mask in sorted(masks.items()))
+
+
+def _jump_table(directions):
+    """Per square, the (jumped bit, landing square) pairs along the directions"""
+    table = []
+    for sq in range(32):
+        row, col = square_cell(sq)
+        jumps = []
+        for dr, dc in directions:
+            land = square(row + 2 * dr, col + 2 * dc)
+            if land >= 0:
+                jumps.append((1 << square(row + dr, col + dc), land))
+        table.append(tuple(jumps))
+    return table
+
+
+# Simple moves: shifts by 3, 4 or 5 squares, depending on the row parity
+UP_STEPS = tuple((-shift, mask) for shift, mask in _shift_masks(UP, 1))
+DOWN_STEPS = _shift_masks(DOWN, 1)
+# Jumps: landing 7 or 9 squares away, the jumped piece 3, 4 or 5 away
+UP_JUMPS = tuple((-over, -land, mask) for over, land, mask in _jump_masks(UP))
+DOWN_JUMPS = _jump_masks(DOWN)
+# Multi-jump continuation tables, index O man, X man, king
+JUMP_TABLES = (_jump_table(UP), _jump_table(DOWN), _jump_table(UP + DOWN))
+
+
+def _up_jumpers(pieces, enemies, empty):
+    """Pieces that can jump up the board"""
+    jumpers = 0
+    for over, land, mask in UP_JUMPS:
+        jumpers |= pieces & mask & (enemies << over) & (empty << land)
+    return jumpers
+
+
+def _down_jumpers(pieces, enemies, empty):
+    """Pieces that can jump down the board"""
+    jumpers = 0
+    for over, land, mask in DOWN_JUMPS:
+        jumpers |= pieces & mask & (enemies >> over) & (empty >> land)
+    return jumpers
+
+
+def board_fen(board, side=O):
+    """Position string of a ``Checkers.board``: 8x8 cells of None or {'piece', 'king'}"""
+    names = ([], [])
+    for sq in range(32):
+        cell = board[SQUARE_ROW[sq]][SQUARE_COL[sq]]
+        if cell is not None:
+            names[SIDE_NAMES.index(cell['piece'])].append(('K' if cell['king'] else '') + str(sq + 1))
+    return f"{SIDE_NAMES[side]}:O{','.join(names[O])}:X{','.join(names[X])}"
+
+
+def _start_fen():
+    x_squares = ','.join(str(sq + 1) for sq in range(12))
+    o_squares = ','.join(str(sq + 1) for sq in range(20, 32))
+    return f"O:O{o_squares}:X{x_squares}"
+
+
+START_FEN = _start_fen()
+
+
+class Position:
+    """
+    Checkers position stored as three bitboards
+
+    ``pieces[side]`` holds every piece of a side and ``kings`` the kings
+    of both sides, and ``counts`` the number of pieces by code (O men,
+    O kings, X men, X kings). make() and unmake() update them in place
+    with the Zobrist ``key``. Each make() writes an undo record at index ``ply`` of
+    parallel lists allocated once: the packed move (which holds the
+    captured pieces), the moved piece, the captured kings, whether the
+    move crowned a man, the side that moved and the key before the move.
+    Neither make() nor unmake() allocates anything.
+    """
+    def __init__(self, fen=START_FEN):
+        """Create a position (the initial position by default)"""
+        self.undo_move = [0] * MAX_PLY
+        self.undo_piece = [0] * MAX_PLY
+        self.undo_captured_kings = [0] * MAX_PLY
+        self.undo_promoted = [0] * MAX_PLY
+        self.undo_side = [0] * MAX_PLY
+        self.undo_key = [0] * MAX_PLY
+        self._jump_stack = []
+        self.set_fen(fen)
+
+    def set_fen(self, fen):
+        """Load a position written as ``<side>:O<squares>:X<squares>``"""
+        fields = fen.strip().split(':')
+        self.side = SIDE_NAMES.index(fields[0].strip().upper())
+        self.pieces = [0, 0]
+        self.kings = 0
+        for field in fields[1:]:
+            field = field.strip()
+            side = SIDE_NAMES.index(field[0].upper())
+            for name in field[1:].split(','):
+                name = name.strip()
+                if not name:
+                    continue
+                bit = 1 << (int(name.lstrip('Kk')) - 1)
+                self.pieces[side] |= bit
+                if name[0] in 'Kk':
+                    self.kings |= bit
+        self.ply = 0  # Moves played since this position, undo records in use
+        self.key = self.compute_key()
+        self.counts = self.compute_counts()
+
+    def fen(self):
+        """Return the position in the form set_fen() reads"""
+        fields = [SIDE_NAMES[self.side]]
+        for side in (O, X):
+            names = [('K' if self.kings >> sq & 1 else '') + str(sq + 1)
+                     for sq in squares_of(self.pieces[side])]
+            fields.append(SIDE_NAMES[side] + ','.join(names))
+        return ':'.join(fields)
+
+    def compute_key(self):
+        """Zobrist key of the position computed from scratch"""
+        key = ZOBRIST.hash(
+            (side * 2 + (self.kings >> sq & 1), sq)
+            for side in (O, X) for sq in squares_of(self.pieces[side]))
+        if self.side == X:
+            key ^= SIDE_KEY
+        return key
+
+    def compute_counts(self):
+        """Pieces by code (O men, O kings, X men, X kings) counted from scratch"""
+        counts = []
+        for side in (O, X):
+            kings = self.pieces[side] & self.kings
+            counts.append(popcount(self.pieces[side] ^ kings))
+            counts.append(popcount(kings))
+        return counts
+
+    def piece_at(self, sq):
+        """(side, is_king) of the piece on a square, or None"""
+        bit = 1 << sq
+        for side in (O, X):
+            if self.pieces[side] & bit:
+                return side, bool(self.kings & bit)
+        return None
+
+    def jumpers(self, side=None):
+        """Bitboard of the pieces of a side (the side to move by default) that can capture"""
+        if side is None:
+            side = self.side
+        own = self.pieces[side]
+        enemies = self.pieces[side ^ 1]
+        empty = FULL ^ (own | enemies)
+        if side == O:
+            return _up_jumpers(own, enemies, empty) | _down_jumpers(own & self.kings, enemies, empty)
+        return _down_jumpers(own, enemies, empty) | _up_jumpers(own & self.kings, enemies, empty)
+
+    def legal_moves(self, moves=None):
+        """Packed legal moves of the side to move: all captures when there is one
+
+        Args:
+            moves: Optional list to fill, cleared first, so a search can
+                   reuse one list per ply
+
+        Returns:
+            list: The moves
+        """
+        if moves is None:
+            moves = []
+        else:
+            moves.clear()
+        side = self.side
+        own = self.pieces[side]
+        kings = self.kings
+        enemies = self.pieces[side ^ 1]
+        empty = FULL ^ (own | enemies)
+        if side == O:
+            up, down = own, own & kings
+        else:
+            up, down = own & kings, own
+        jumpers = _up_jumpers(up, enemies, empty) | _down_jumpers(down, enemies, empty)
+        if jumpers:
+            return self._jump_moves(jumpers, enemies, empty, moves)
+
+        if up:
+            for shift, mask in UP_STEPS:
+                targets = ((up & mask) >> shift) & empty
+                while targets:
+                    bit = targets & -targets
+                    to = bit.bit_length() - 1
+                    moves.append((to + shift) | (to << 5))
+                    targets ^= bit
+        if down:
+            for shift, mask in DOWN_STEPS:
+                targets = ((down & mask) << shift) & empty
+                while targets:
+                    bit = targets & -targets
+                    to = bit.bit_length() - 1
+                    moves.append((to - shift) | (to << 5))
+                    targets ^= bit
+        return moves
+
+    def _jump_moves(self, jumpers, enemies, empty, moves):
+        """Append every complete jump sequence of the jumping pieces
+
+        Each sequence is followed by an iterative depth-first search whose
+        stack holds ``square | captured << 5`` ints. The jumping piece's
+        own square counts as empty, and jumped pieces stay on the board
+        until the move is over, so none is jumped twice.
+        """
+        side = self.side
+        kings = self.kings
+        promotion_row = PROMOTION_ROW[side]
+        stack = self._jump_stack
+        while jumpers:
+            from_bit = jumpers & -jumpers
+            fr = from_bit.bit_length() - 1
+            jumpers ^= from_bit
+            is_king = kings & from_bit
+            table = JUMP_TABLES[2 if is_king else side]
+            free = empty | from_bit
+            first = len(moves)
+            stack.append(fr)
+            while stack:
+                entry = stack.pop()
+                sq = entry & 31
+                captured = entry >> 5
+                extended = False
+                for over_bit, land in table[sq]:
+                    if enemies & over_bit and not captured & over_bit and free >> land & 1:
+                        extended = True
+                        if not is_king and promotion_row >> land & 1:
+                            # Crowning ends the move
+                            moves.append(fr | (land << 5) | ((captured | over_bit) << 10))
+                        else:
+                            stack.append(land | ((captured | over_bit) << 5))
+                if not extended and captured:
+                    moves.append(fr | (sq << 5) | (captured << 10))
+            if is_king and len(moves) - first > 1:
+                # A king can take the same pieces in a different order
+                moves[first:] = list(dict.fromkeys(moves[first:]))
+        return moves
+
+    def find_move(self, from_sq, to_sq):
+        """Return the first legal packed move between the squares, or None"""
+        for move in self.legal_moves():
+            if move & 31 == from_sq and (move >> 5) & 31 == to_sq:
+                return move
+        return None
+
+    def _grow_undo(self):
+        """Double the undo record lists (only a very long game needs it)"""
+        for name in ('undo_move', 'undo_piece', 'undo_captured_kings', 'undo_promoted',
+                     'undo_side', 'undo_key'):
+            records = getattr(self, name)
+            records.extend([0] * len(records))
+
+    def make(self, move):
+        """Play a packed move in place and write its undo record"""
+        fr = move & 31
+        to = (move >> 5) & 31
+        captures = move >> 10
+        side = self.side
+        them = side ^ 1
+        pieces = self.pieces
+        kings = self.kings
+        key = self.key
+        ply = self.ply
+        if ply == len(self.undo_move):
+            self._grow_undo()
+        self.undo_move[ply] = move
+        self.undo_side[ply] = side
+        self.undo_key[ply] = key
+
+        from_bit = 1 << fr
+        to_bit = 1 << to
+        # XOR, not OR: a king's multi-jump can end on its own square
+        pieces[side] ^= from_bit ^ to_bit
+        if kings & from_bit:
+            kings ^= from_bit ^ to_bit
+            key ^= PIECE_KEYS[(side * 2 + 1) * 32 + fr] ^ PIECE_KEYS[(side * 2 + 1) * 32 + to]
+            self.undo_piece[ply] = side * 2 + 1
+            self.undo_promoted[ply] = 0
+        elif to_bit & PROMOTION_ROW[side]:
+            kings |= to_bit
+            key ^= PIECE_KEYS[side * 64 + fr] ^ PIECE_KEYS[(side * 2 + 1) * 32 + to]
+            self.undo_piece[ply] = side * 2
+            self.undo_promoted[ply] = 1
+            self.counts[side * 2] -= 1
+            self.counts[side * 2 + 1] += 1
+        else:
+            key ^= PIECE_KEYS[side * 64 + fr] ^ PIECE_KEYS[side * 64 + to]
+            self.undo_piece[ply] = side * 2
+            self.undo_promoted[ply] = 0
+
+        if captures:
+            captured_kings = captures & kings
+            self.undo_captured_kings[ply] = captured_kings
+            pieces[them] ^= captures
+            kings ^= captured_kings
+            men = captures ^ captured_kings
+            counts = self.counts
+            if captured_kings:
+                counts[them * 2 + 1] -= popcount(captured_kings)
+                counts[them * 2] -= popcount(men)
+            elif men & (men - 1):
+                counts[them * 2] -= popcount(men)
+            else:
+                counts[them * 2] -= 1
+            while men:
+                bit = men & -men
+                key ^= PIECE_KEYS[them * 64 + bit.bit_length() - 1]
+                men ^= bit
+            while captured_kings:
+                bit = captured_kings & -captured_kings
+                key ^= PIECE_KEYS[(them * 2 + 1) * 32 + bit.bit_length() - 1]
+                captured_kings ^= bit
+        else:
+            self.undo_captured_kings[ply] = 0
+        self.kings = kings
+        self.key = key ^ SIDE_KEY
+        self.side = them
+        self.ply = ply + 1
+
+    def unmake(self):
+        """Take back the last move played with make(), from its undo record"""
+        ply = self.ply - 1
+        self.ply = ply
+        move = self.undo_move[ply]
+        side = self.undo_side[ply]
+        them = side ^ 1
+        moved_bits = (1 << (move & 31)) ^ (1 << ((move >> 5) & 31))
+        captures = move >> 10
+        self.pieces[side] ^= moved_bits
+        kings = self.kings
+        if self.undo_piece[ply] & 1:
+            kings ^= moved_bits
+        elif self.undo_promoted[ply]:
+            kings ^= 1 << ((move >> 5) & 31)
+            self.counts[side * 2] += 1
+            self.counts[side * 2 + 1] -= 1
+        if captures:
+            self.pieces[them] |= captures
+            captured_kings = self.undo_captured_kings[ply]
+            counts = self.counts
+            if captured_kings:
+                kings |= captured_kings
+                counts[them * 2 + 1] += popcount(captured_kings)
+                counts[them * 2] += popcount(captures ^ captured_kings)
+            elif captures & (captures - 1):
+                counts[them * 2] += popcount(captures)
+            else:
+                counts[them * 2] += 1
+        self.kings = kings
+        self.side = side
+        self.key = self.undo_key[ply]
+
+    # Game-state protocol of algorithm.mcts
+    play = make
+    undo = unmake
+
+    def terminal(self):
+        """True when the side to move has no move left, which loses the game"""
+        side = self.side
+        own = self.pieces[side]
+        empty = FULL ^ (own | self.pieces[side ^ 1])
+        if side == O:
+            up, down = own, own & self.kings
+        else:
+            up, down = own & self.kings, own
+        for shift, mask in UP_STEPS:
+            if ((up & mask) >> shift) & empty:
+                return False
+        for shift, mask in DOWN_STEPS:
+            if ((down & mask) << shift) & empty:
+                return False
+        return not self.jumpers()
+
+    def result(self):
+        """Outcome of a finished game for the side to move: -1, it has lost"""
+        return -1 if self.terminal() else 0
+
+    def hash(self):
+        """Zobrist key of the position"""
+        return self.key
@@ -0,0 +1,547 @@
+"""
+Endgame database for the Checkers engine
+
+Retrograde analysis solves every position with a few pieces exactly.
+Positions are grouped into slices by their material: the men and kings
+of the side to move, then the men and kings of the other side. A slice
+is solved after every slice a capture or a crowning leads to (fewer
+pieces, or as many pieces with fewer men), so those results are simply
+read. Within a slice the solver starts from the positions whose result
+is already known and walks simple moves backwards, one ply at a time:
+a position is won for the side to move as soon as one move reaches a
+position lost for the other side, and lost once every move reaches a
+won one. Whatever is left unresolved is a draw.
+
+Only positions with O to move are stored. A position with X to move is
+turned round first (square sq becomes 31 - sq, O and X swap), which
+gives the same position with O to move in the slice with both sides'
+material swapped.
+
+Inside a slice a position is numbered by the combinations of squares
+its pieces stand on: the O men among the 28 squares a man of O can
+stand on, the X men likewise, then the O kings among the squares the
+men leave free and the X kings among the squares left after those. The
+rank of a combination is its colexicographic rank, so every index from
+0 to the slice size is used except the few where men of both sides
+would share a square.
+
+Each slice is one file, named after its material (``1021.bin``: one O
+man, no O king, two X men, one X king), holding an entry per index,
+packed into as few bits as the longest result needs::
+
+    header  8 bytes  b'CKDB', bits per entry, flags, 2 bytes padding
+    data    little-endian bits
+
+With distances (flag 1) an entry is the number of plies until the game
+ends plus one, 0 for a draw: an odd number of plies is a win for the
+side to move, an even one a loss. Without them (``--wld``) an entry is
+0 for a draw, 1 for a win and 2 for a loss, two bits per position.
+
+Generate the database (three and four pieces take a few minutes, five
+pieces a couple of hours) with:
+    python checkers_endgame.py data/checkers_endgame --pieces 4
+"""
+import argparse
+import mmap
+import os
+import struct
+import time
+
+from checkers_bitboard import (
+    Position, O, X, FULL, PROMOTION_ROW, UP, DOWN, square, square_cell,
+    popcount, _up_jumpers, _down_jumpers
+)
+
+HEADER = struct.Struct('<4sBB2x')
+MAGIC = b'CKDB'
+FLAG_DISTANCE = 1
+_WORD = struct.Struct('<H')
+
+DEFAULT_PIECES = 4
+DEFAULT_DB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'checkers_endgame')
+
+WIN, DRAW, LOSS = 1, 0, -1
+
+# Squares a man can stand on: O men are crowned on squares 0-3, X men on 28-31
+O_MAN_SHIFT = 4
+MAN_SQUARES = 28
+
+BINOMIAL = [[0] * 33 for _ in range(33)]
+for _n in range(33):
+    BINOMIAL[_n][0] = 1
+    for _k in range(1, _n + 1):
+        BINOMIAL[_n][_k] = BINOMIAL[_n - 1][_k - 1] + BINOMIAL[_n - 1][_k]
+
+# Turning the board round reverses the 32 square bits
+_REVERSED_BYTE = [int(f"{byte:08b}"[::-1], 2) for byte in range(256)]
+
+
+def _neighbours(directions):
+    """Per square, the squares one step away along the directions"""
+    table = []
+    for sq in range(32):
+        row, col = square_cell(sq)
+        table.append(tuple(to for to in (square(row + dr, col + dc) for dr, dc in directions)
+                           if to >= 0))
+    return table
+
+
+UP_NEIGHBOURS = _neighbours(UP)
+ALL_NEIGHBOURS = _neighbours(UP + DOWN)
+
+
+def mirror(bb):
+    """Bitboard turned round: square sq becomes 31 - sq"""
+    return (_REVERSED_BYTE[bb & 0xFF] << 24 | _REVERSED_BYTE[bb >> 8 & 0xFF] << 16 |
+            _REVERSED_BYTE[bb >> 16 & 0xFF] << 8 | _REVERSED_BYTE[bb >> 24])
+
+
+def material(o, x, kings):
+    """Slice of a position: (O men, O kings, X men, X kings)"""
+    o_kings = popcount(o & kings)
+    x_kings = popcount(x & kings)
+    return popcount(o) - o_kings, o_kings, popcount(x) - x_kings, x_kings
+
+
+def swapped(slice_key):
+    """Slice of the same positions turned round, with X to move"""
+    o_men, o_kings, x_men, x_kings = slice_key
+    return x_men, x_kings, o_men, o_kings
+
+
+def slice_name(slice_key):
+    """File name stem of a slice: its four piece counts"""
+    return ''.join(str(count) for count in slice_key)
+
+
+def slice_size(slice_key):
+    """Number of indices in a slice"""
+    o_men, o_kings, x_men, x_kings = slice_key
+    free = 32 - o_men - x_men
+    return (BINOMIAL[MAN_SQUARES][o_men] * BINOMIAL[MAN_SQUARES][x_men] *
+            BINOMIAL[free][o_kings] * BINOMIAL[free - o_kings][x_kings])
+
+
+def all_slices(max_pieces):
+    """Every slice with both sides on the board, in the order they are solved"""
+    slices = []
+    for total in range(2, max_pieces + 1):
+        for o_pieces in range(1, total):
+            for o_men in range(o_pieces + 1):
+                for x_men in range(total - o_pieces + 1):
+                    slices.append((o_men, o_pieces - o_men, x_men, total - o_pieces - x_men))
+    slices.sort(key=lambda slice_key: (sum(slice_key), slice_key[0] + slice_key[2]))
+    return slices
+
+
+def _rank(bits):
+    """Colexicographic rank of a combination given as a bitboard"""
+    rank = 0
+    k = 0
+    while bits:
+        bit = bits & -bits
+        k += 1
+        rank += BINOMIAL[bit.bit_length() - 1][k]
+        bits ^= bit
+    return rank
+
+
+def _unrank(rank, k):
+    """Bitboard of the combination of k squares with the given rank"""
+    bits = 0
+    top = 32
+    while k:
+        top -= 1
+        while BINOMIAL[top][k] > rank:
+            top -= 1
+        rank -= BINOMIAL[top][k]
+        bits |= 1 << top
+        k -= 1
+    return bits
+
+
+def _compress(bits, taken):
+    """Renumber the squares of bits with the squares in taken left out"""
+    compressed = 0
+    while bits:
+        bit = bits & -bits
+        compressed |= 1 << (bit.bit_length() - 1 - popcount(taken & (bit - 1)))
+        bits ^= bit
+    return compressed
+
+
+def _expand(bits, taken):
+    """Inverse of _compress()"""
+    expanded = 0
+    sq = -1
+    while bits:
+        sq += 1
+        if taken >> sq & 1:
+            continue
+        if bits & 1:
+            expanded |= 1 << sq
+        bits >>= 1
+    return expanded
+
+
+def position_index(slice_key, o, x, kings):
+    """Index of an O-to-move position inside its slice"""
+    _, o_kings, x_men, x_kings = slice_key
+    free = 32 - slice_key[0] - x_men
+    o_man_bits = o & ~kings
+    x_man_bits = x & ~kings
+    men = o_man_bits | x_man_bits
+    index = _rank(o_man_bits >> O_MAN_SHIFT) * BINOMIAL[MAN_SQUARES][x_men] + _rank(x_man_bits)
+    index = index * BINOMIAL[free][o_kings] + _rank(_compress(o & kings, men))
+    return index * BINOMIAL[free - o_kings][x_kings] + _rank(_compress(x & kings, men | o))
+
+
+def index_position(slice_key, index):
+    """Inverse of position_index()
+
+    Returns:
+        tuple: (O pieces, X pieces, kings), or None for an index whose men
+               of both sides would share a square
+    """
+    o_men, o_kings, x_men, x_kings = slice_key
+    free = 32 - o_men - x_men
+    index, x_king_rank = divmod(index, BINOMIAL[free - o_kings][x_kings])
+    index, o_king_rank = divmod(index, BINOMIAL[free][o_kings])
+    o_man_rank, x_man_rank = divmod(index, BINOMIAL[MAN_SQUARES][x_men])
+    o_man_bits = _unrank(o_man_rank, o_men) << O_MAN_SHIFT
+    x_man_bits = _unrank(x_man_rank, x_men)
+    if o_man_bits & x_man_bits:
+        return None
+    men = o_man_bits | x_man_bits
+    o_king_bits = _expand(_unrank(o_king_rank, o_kings), men)
+    x_king_bits = _expand(_unrank(x_king_rank, x_kings), men | o_king_bits)
+    return o_man_bits | o_king_bits, x_man_bits | x_king_bits, o_king_bits | x_king_bits
+
+
+def _solve(slice_keys, solved, position):
+    """Solve one slice, or a slice and its swapped slice, together
+
+    Simple moves of one slice lead into the other, so they are solved at
+    once. Every other move leads into a slice already in ``solved``.
+
+    Args:
+        slice_keys: The slice, and its swapped slice when that differs
+        solved: slice -> bytearray of plies + 1 (0 draw) of the solved slices
+        position: checkers_bitboard.Position used for move generation
+
+    Returns:
+        dict: slice -> bytearray of plies + 1, 0 for a draw
+    """
+    values = {key: bytearray(slice_size(key)) for key in slice_keys}
+    remaining = {key: bytearray(slice_size(key)) for key in slice_keys}
+    longest = {key: bytearray(slice_size(key)) for key in slice_keys}
+    numbers = {key: number for number, key in enumerate(slice_keys)}
+    buckets = {}
+    moves = []
+
+    for key in slice_keys:
+        number = numbers[key]
+        pending = remaining[key]
+        longest_here = longest[key]
+        for index in range(len(pending)):
+            placement = index_position(key, index)
+            if placement is None:
+                continue
+            o, x, kings = placement
+            position.pieces[O] = o
+            position.pieces[X] = x
+            position.kings = kings
+            position.legal_moves(moves)
+            if not moves:
+                # No move left: lost now
+                buckets.setdefault(1, []).append(number << 32 | index)
+                continue
+            children = 0
+            best_win = 0
+            escape = False
+            lost_in = 0
+            for move in moves:
+                from_bit = 1 << (move & 31)
+                to_bit = 1 << ((move >> 5) & 31)
+                captures = move >> 10
+                crowned = not kings & from_bit and to_bit & PROMOTION_ROW[O]
+                if not captures and not crowned:
+                    children += 1
+                    continue
+                after_x = x & ~captures
+                if not after_x:
+                    best_win = 2  # Took the last piece
+                    break
+                after_o = o ^ from_bit ^ to_bit
+                after_kings = kings & ~captures
+                if kings & from_bit:
+                    after_kings ^= from_bit ^ to_bit
+                elif crowned:
+                    after_kings |= to_bit
+                # X to move, turned round so that it is O to move
+                child_o, child_x, child_kings = mirror(after_x), mirror(after_o), mirror(after_kings)
+                child_key = material(child_o, child_x, child_kings)
+                child = solved[child_key][position_index(child_key, child_o, child_x, child_kings)]
+                if not child:
+                    escape = True
+                elif child & 1:
+                    # Even plies for the other side: it loses
+                    if not best_win or child + 1 < best_win:
+                        best_win = child + 1
+                elif child + 1 > lost_in:
+                    lost_in = child + 1
+            if best_win:
+                buckets.setdefault(best_win, []).append(number << 32 | index)
+                pending[index] = 128  # Never lost
+            elif escape:
+                pending[index] = 128
+            elif children:
+                pending[index] = children
+                longest_here[index] = lost_in
+            else:
+                buckets.setdefault(lost_in, []).append(number << 32 | index)
+
+    # Walk simple moves backwards, one ply at a time
+    value = 0
+    while any(level > value for level in buckets):
+        value += 1
+        if value > 255:
+            raise ValueError("Results longer than 254 plies do not fit the table entries")
+        for entry in buckets.pop(value, ()):
+            key = slice_keys[entry >> 32]
+            index = entry & 0xFFFFFFFF
+            table = values[key]
+            if table[index]:
+                continue
+            table[index] = value
+            other = swapped(key)
+            other_values = values[other]
+            other_pending = remaining[other]
+            other_number = numbers[other]
+            for before in _unmoves(key, index, other):
+                if other_values[before]:
+                    continue
+                if value & 1:
+                    # Lost for the side to move here: the move into it wins
+                    buckets.setdefault(value + 1, []).append(other_number << 32 | before)
+                else:
+                    other_pending[before] -= 1
+                    if not other_pending[before]:
+                        level = max(value + 1, longest[other][before])
+                        buckets.setdefault(level, []).append(other_number << 32 | before)
+    return values
+
+
+def _unmoves(slice_key, index, before_key):
+    """Indices in before_key of the positions whose simple move leads to this one
+
+    The position (O to move) was reached by an X simple move that did
+    not crown. The position before it, X to move, is turned round into
+    before_key. A position where X had a capture is left out, since the
+    capture was forced.
+    """
+    o, x, kings = index_position(slice_key, index)
+    empty = FULL ^ (o | x)
+    before = []
+    pieces = x
+    while pieces:
+        bit = pieces & -pieces
+        pieces ^= bit
+        sq = bit.bit_length() - 1
+        is_king = kings & bit
+        # X men move down the board, so they came from a square above
+        for origin in (ALL_NEIGHBOURS if is_king else UP_NEIGHBOURS)[sq]:
+            origin_bit = 1 << origin
+            if not empty & origin_bit:
+                continue
+            before_x = x ^ bit ^ origin_bit
+            before_kings = kings ^ bit ^ origin_bit if is_king else kings
+            before_empty = FULL ^ (o | before_x)
+            if (_down_jumpers(before_x, o, before_empty) |
+                    _up_jumpers(before_x & before_kings, o, before_empty)):
+                continue
+            before.append(position_index(before_key, mirror(before_x), mirror(o), mirror(before_kings)))
+    return before
+
+
+def write_table(path, values, distance=True):
+    """Bit-pack a solved slice into a table file
+
+    Args:
+        path: File to write
+        values: bytearray of plies + 1 per index, 0 for a draw
+        distance: Keep the plies; False stores only win, draw or loss
+    """
+    if not distance:
+        values = bytes(0 if not value else 1 if value & 1 == 0 else 2 for value in values)
+    bits = max(max(values, default=0).bit_length(), 1)
+    data = bytearray()
+    pending = pending_bits = 0
+    for value in values:
+        pending |= value << pending_bits
+        pending_bits += bits
+        while pending_bits >= 8:
+            data.append(pending & 0xFF)
+            pending >>= 8
+            pending_bits -= 8
+    data.append(pending)
+    data.append(0)  # Spare byte so every entry can be read with one two-byte word
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, bits, FLAG_DISTANCE if distance else 0))
+        f.write(data)
+
+
+def generate_all(directory, max_pieces=DEFAULT_PIECES, distance=True):
+    """Solve every slice with up to max_pieces pieces and write it into directory"""
+    os.makedirs(directory, exist_ok=True)
+    position = Position()
+    position.side = O
+    solved = {}
+    for key in all_slices(max_pieces):
+        if key in solved:
+            continue
+        start = time.perf_counter()
+        keys = (key,) if swapped(key) == key else (key, swapped(key))
+        results = _solve(keys, solved, position)
+        solved.update(results)
+        for solved_key, values in results.items():
+            write_table(os.path.join(directory, slice_name(solved_key) + '.bin'), values, distance)
+            won = sum(1 for value in values if value & 1 == 0 and value)
+            lost = sum(1 for value in values if value & 1)
+            print(f"{slice_name(solved_key)}: {len(values)} positions, {won} won, {lost} lost, "
+                  f"longest {max(values) - 1} plies ({time.perf_counter() - start:.1f}s)")
+
+
+class _Table:
+    """
+    One memory-mapped slice file
+    """
+    def __init__(self, path):
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.bits, flags = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC:
+            raise ValueError(f"Not a checkers endgame table: {path}")
+        self.distance = bool(flags & FLAG_DISTANCE)
+        self.mask = (1 << self.bits) - 1
+
+    def result(self, index):
+        """(WIN, DRAW or LOSS for the side to move, plies until the game ends or None)"""
+        bit = index * self.bits
+        word = _WORD.unpack_from(self._data, HEADER.size + (bit >> 3))[0]
+        value = word >> (bit & 7) & self.mask
+        if not value:
+            return DRAW, 0
+        if not self.distance:
+            return (WIN, None) if value == 1 else (LOSS, None)
+        return (LOSS if value & 1 else WIN), value - 1
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+
+class EndgameDatabase:
+    """
+    Probe interface over the slice files found in a directory
+    """
+    def __init__(self, directory=DEFAULT_DB_DIR):
+        """
+        Args:
+            directory: Folder holding the slice files written by generate_all()
+        """
+        self.tables = {}
+        self.max_pieces = 0
+        if os.path.isdir(directory):
+            for name in os.listdir(directory):
+                stem, extension = os.path.splitext(name)
+                if extension != '.bin' or len(stem) != 4 or not stem.isdigit():
+                    continue
+                key = tuple(int(count) for count in stem)
+                self.tables[key] = _Table(os.path.join(directory, name))
+        # Only the piece counts with every slice present are probed
+        for pieces in range(2, 33):
+            if not all(key in self.tables for key in all_slices(pieces)):
+                break
+            self.max_pieces = pieces
+
+    def probe(self, position):
+        """Exact result of a checkers_bitboard.Position, if the database covers it
+
+        Returns:
+            tuple: (WIN, DRAW or LOSS for the side to move, plies until the
+                   game ends, None for tables without distances), or None
+                   when the position is not in the database
+        """
+        counts = position.counts
+        if counts[0] + counts[1] + counts[2] + counts[3] > self.max_pieces:
+            return None
+        if position.side == O:
+            o, x, kings = position.pieces[O], position.pieces[X], position.kings
+            key = tuple(counts)
+        else:
+            o, x, kings = mirror(position.pieces[X]), mirror(position.pieces[O]), mirror(position.kings)
+            key = (counts[2], counts[3], counts[0], counts[1])
+        table = self.tables.get(key)
+        if table is None:
+            return None  # One side has no pieces left
+        return table.result(position_index(key, o, x, kings))
+
+    def probe_root(self, position):
+        """Best move by the database: quickest win, else a draw, else the longest defence
+
+        Returns:
+            tuple: (packed move, (result, plies)) or None when not in the database
+        """
+        if self.probe(position) is None:
+            return None
+        best_move, best_result, best_rank = None, None, None
+        for move in position.legal_moves():
+            position.make(move)
+            # The reply is None only when the move took the last piece
+            reply = self.probe(position) or (LOSS, 0)
+            position.unmake()
+            plies = None if reply[1] is None else reply[1] + 1
+            result = (-reply[0], plies if reply[0] else 0)
+            rank = result[0] * (1000 - (plies or 0)) if result[0] else 0
+            if best_rank is None or rank > best_rank:
+                best_move, best_result, best_rank = move, result, rank
+        if best_move is None:
+            return None
+        return best_move, best_result
+
+    def close(self):
+        """Release every table"""
+        for table in self.tables.values():
+            table.close()
+        self.tables = {}
+        self.max_pieces = 0
+
+
+_default_database = None
+
+
+def get_default_database():
+    """The database shipped in data/checkers_endgame, opened once per process, or None when missing"""
+    global _default_database
+    if _default_database is None:
+        database = EndgameDatabase(DEFAULT_DB_DIR)
+        if database.max_pieces:
+            _default_database = database
+    return _default_database
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate the checkers endgame database by retrograde analysis')
+    parser.add_argument('directory', type=str, nargs='?', default=DEFAULT_DB_DIR,
+                        help='Folder to write the slice files into')
+    parser.add_argument('--pieces', type=int, default=DEFAULT_PIECES,
+                        help='Largest number of pieces on the board')
+    parser.add_argument('--wld', action='store_true',
+                        help='Store only win/draw/loss (2 bits a position) instead of distances')
+    args = parser.parse_args()
+    generate_all(args.directory, args.pieces, not args.wld)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Evaluation kernel for the Checkers search
+
+A leaf is scored from the AI's (X's) point of view with a few lookups
+and bitboard operations on a checkers_bitboard.Position:
+
+    material    men and kings, from the piece counts Position keeps
+                up to date in make()/unmake()
+    back rank   men still guarding their own back rank, which keeps the
+                other side's men from being crowned
+    mobility    pieces with a free square to step to
+
+The result is scaled up as the board empties and as one side gets ahead,
+so trading down pays when winning.
+
+Everything that depends on the difficulty is resolved once per search by
+compile_weights(); evaluate() then only reads a tuple of floats.
+"""
+from checkers_bitboard import FULL, UP_STEPS, DOWN_STEPS, popcount
+
+MAN_VALUE = 1.0
+KING_BONUS = 2.0           # On top of MAN_VALUE: a king counts as three men
+BACK_RANK_WEIGHT = 0.15    # Per man on its own back rank, times pattern_weight
+MOBILITY_WEIGHT = 0.05     # Per piece that can move, times pattern_weight
+SCALE_PER_SQUARE = 0.005   # Score scale added per empty square and per piece of difference
+
+# Back ranks: row 7 for O, row 0 for X
+O_BACK_RANK = 0xF << 28
+X_BACK_RANK = 0xF
+
+# Simple-move shifts by row parity, unpacked for evaluate()
+(_UP_A, _UP_MASK_A), (_UP_B, _UP_MASK_B), (_UP_C, _UP_MASK_C) = UP_STEPS
+(_DOWN_A, _DOWN_MASK_A), (_DOWN_B, _DOWN_MASK_B), (_DOWN_C, _DOWN_MASK_C) = DOWN_STEPS
+
+
+def compile_weights(settings):
+    """Resolve the difficulty settings into the tuple evaluate() reads
+
+    Args:
+        settings: GameSettings.adjust_settings('checkers')
+
+    Returns:
+        tuple: (man, king bonus, back rank, mobility)
+    """
+    pattern_weight = settings['pattern_weight']
+    return (MAN_VALUE, KING_BONUS,
+            BACK_RANK_WEIGHT * pattern_weight,
+            MOBILITY_WEIGHT * pattern_weight)
+
+
+def evaluate(position, weights):
+    """Score of a position for the AI (X), in men
+
+    Args:
+        position: checkers_bitboard.Position
+        weights: Tuple from compile_weights()
+    """
+    man, king, back_rank, mobility = weights
+    o_men, o_kings, x_men, x_kings = position.counts
+    difference = x_men + x_kings - o_men - o_kings
+    score = man * difference + king * (x_kings - o_kings)
+
+    o_pieces, x_pieces = position.pieces
+    kings = position.kings
+    score += back_rank * (popcount(x_pieces & X_BACK_RANK & ~kings) -
+                          popcount(o_pieces & O_BACK_RANK & ~kings))
+
+    # Squares with a free square up the board and down the board
+    empty = FULL ^ (o_pieces | x_pieces)
+    can_step_up = ((_UP_MASK_A & (empty << _UP_A)) | (_UP_MASK_B & (empty << _UP_B)) |
+                   (_UP_MASK_C & (empty << _UP_C)))
+    can_step_down = ((_DOWN_MASK_A & (empty >> _DOWN_A)) | (_DOWN_MASK_B & (empty >> _DOWN_B)) |
+                     (_DOWN_MASK_C & (empty >> _DOWN_C)))
+    score += mobility * (popcount(x_pieces & (can_step_down | (kings & can_step_up))) -
+                         popcount(o_pieces & (can_step_up | (kings & can_step_down))))
+
+    empty_squares = 64 - x_men - x_kings - o_men - o_kings
+    return score * (1.0 + SCALE_PER_SQUARE * (empty_squares + abs(difference)))
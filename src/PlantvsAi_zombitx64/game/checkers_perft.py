@@ -0,0 +1,159 @@
+"""
+Perft (performance test) for the Checkers move generator
+
+perft counts the leaf nodes of the full legal move tree to a fixed depth.
+The start position counts are the published ones for 8x8 checkers; the
+other positions were counted by an independent (slow, dict-based) move
+generator. Any difference after a change to checkers_bitboard means the
+move generator is broken. Timing the same walk gives a nodes/second
+throughput number.
+
+Usage:
+    python checkers_perft.py                      # run the whole suite
+    python checkers_perft.py --depth 8            # start position to depth 8
+    python checkers_perft.py --fen "X:OK22,K23:XK1,14" --depth 4 --divide
+"""
+import argparse
+import time
+
+from checkers_bitboard import Position, START_FEN, move_to_text, squares_of
+
+# (name, position, node counts for depth 1, 2, 3, ...)
+PERFT_SUITE = [
+    ('start', START_FEN, [7, 49, 302, 1469, 7361, 36768, 179740, 845931, 3963680, 18391564]),
+    # Kings on both sides, no men
+    ('kings', 'X:OK22,K23,K26,K27:XK1,K13,K14', [9, 72, 467, 3794, 26489, 233070, 1573257]),
+    # Forced captures on both sides
+    ('middlegame', 'O:O9,11,14,18,19,21,22,27:X2,3,5,6,13,15,16,23',
+     [2, 4, 12, 32, 135, 435, 1636, 6618, 28519, 127279]),
+    # Men crowned at the end of a jump and on a simple move
+    ('crowning', 'X:O6,10,11,18,19,26,27:XK14,28', [4, 28, 164, 1323, 4916, 36635, 137422]),
+    # A king jump that ends on its own square, and two different
+    # captures from 13 to 29
+    ('king-loop', 'X:O10,11,18,19,25,26,K31:X1,K13', [3, 19, 54, 294, 1042, 5684, 17783, 95268]),
+]
+
+
+def perft(position, depth):
+    """Count leaf nodes of the legal move tree
+
+    Args:
+        position: checkers_bitboard.Position, restored before returning
+        depth: Number of plies to walk
+
+    Returns:
+        int: Number of leaf nodes
+    """
+    if depth == 0:
+        return 1
+    moves = position.legal_moves()
+    if depth == 1:
+        # Bulk counting: the leaves are the legal moves themselves
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.make(move)
+        nodes += perft(position, depth - 1)
+        position.unmake()
+    return nodes
+
+
+def divide(position, depth):
+    """Leaf counts below every root move, for finding a faulty move
+
+    Moves with the same squares but different captures are listed apart.
+
+    Returns:
+        dict: move text -> number of leaf nodes
+    """
+    counts = {}
+    for move in position.legal_moves():
+        position.make(move)
+        name = move_to_text(move)
+        if name in counts:
+            name += ' taking ' + ','.join(str(sq + 1) for sq in squares_of(move >> 10))
+        counts[name] = perft(position, depth - 1) if depth > 1 else 1
+        position.unmake()
+    return counts
+
+
+def benchmark(fen=START_FEN, depth=7):
+    """Run perft once and time it
+
+    Returns:
+        dict: nodes, seconds and nodes_per_second
+    """
+    position = Position(fen)
+    start = time.perf_counter()
+    nodes = perft(position, depth)
+    seconds = time.perf_counter() - start
+    return {
+        'nodes': nodes,
+        'seconds': seconds,
+        'nodes_per_second': nodes / seconds if seconds > 0 else 0.0
+    }
+
+
+def run_suite(max_nodes=1000000):
+    """Check every suite position at each depth whose count is at most max_nodes
+
+    Returns:
+        bool: True when every count matched
+    """
+    passed = True
+    total_nodes = 0
+    total_seconds = 0.0
+    for name, fen, counts in PERFT_SUITE:
+        for depth, expected in enumerate(counts, 1):
+            if expected > max_nodes:
+                break
+            result = benchmark(fen, depth)
+            ok = result['nodes'] == expected
+            passed = passed and ok
+            total_nodes += result['nodes']
+            total_seconds += result['seconds']
+            print(f"{name:<12} depth {depth:>2}  {result['nodes']:>9} / {expected:<9} "
+                  f"{'OK  ' if ok else 'FAIL'} {result['nodes_per_second']:>10.0f} nodes/s")
+    if total_seconds > 0:
+        print(f"Total: {total_nodes} nodes in {total_seconds:.2f}s "
+              f"({total_nodes / total_seconds:.0f} nodes/s)")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Perft for the Checkers move generator')
+    parser.add_argument('--fen', type=str, default=None,
+                        help='Position to count, e.g. "X:OK22,K23:XK1,14" (runs the whole suite when omitted)')
+    parser.add_argument('--depth', type=int, default=None,
+                        help='Depth to count to')
+    parser.add_argument('--divide', action='store_true',
+                        help='Print the count below every root move')
+    parser.add_argument('--max-nodes', type=int, default=1000000,
+                        help='Largest expected count the suite will run')
+    args = parser.parse_args()
+
+    if args.fen is None and args.depth is None and not args.divide:
+        return 0 if run_suite(args.max_nodes) else 1
+
+    fen = args.fen or START_FEN
+    depth = args.depth or 7
+    if args.divide:
+        position = Position(fen)
+        start = time.perf_counter()
+        counts = divide(position, depth)
+        seconds = time.perf_counter() - start
+        for move in sorted(counts):
+            print(f"{move}: {counts[move]}")
+        nodes = sum(counts.values())
+        print(f"\nMoves: {len(counts)}")
+        print(f"Nodes: {nodes}")
+        print(f"Time: {seconds:.2f}s ({nodes / seconds if seconds > 0 else 0.0:.0f} nodes/s)")
+    else:
+        result = benchmark(fen, depth)
+        print(f"Nodes: {result['nodes']}")
+        print(f"Time: {result['seconds']:.2f}s ({result['nodes_per_second']:.0f} nodes/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -1,8 +1,25 @@
 import json
+import math
 import os
 import random
-from copy import deepcopy
 from game_settings import GameSettings
+from chess_bitboard import (
+    Position, WHITE, BLACK, KNIGHT, BISHOP, QUEEN, NO_PIECE, PIECE_TYPES,
+    CAPTURE, DOUBLE_PUSH, EP_CAPTURE, KING_CASTLE, QUEEN_CASTLE,
+    CASTLE_WK, CASTLE_WQ, CASTLE_BK, CASTLE_BQ, move_promotion, popcount
+)
+from transposition import TranspositionTable, NO_MOVE
+from chess_search import ChessSearch
+from chess_parallel import ParallelSearch, worker_count
+from chess_eval import PawnHashTable, evaluate_position
+from chess_book import get_default_book
+from chess_tablebase import get_default_tablebase
+from chess_ponder import Ponderer
+
+MCTS_EXPLORATION = 1.4
+MCTS_ROLLOUT_PLIES = 30  # Random plies before a playout is scored by the evaluation
+ROLLOUT_SCORE_SCALE = 3.0  # Pawns ahead at which a cut-off playout scores tanh(1), about 0.76
+
 
 class Chess:
     """
@@ -26,6 +43,15 @@ class Chess:
         self.halfmove_clock = 0
         self.fullmove_number = 1
         self.move_history = []
+        self.position = None  # Bitboard position the search works on
+        self.tt = TranspositionTable()
+        self.pawn_table = PawnHashTable()
+        self.ponderer = Ponderer(self.tt)
+        self.searcher = None
+        self.nnue = None  # chess_nnue.Accumulator when the network evaluates
+        self.parallel_search = None  # Root split over worker processes (hard difficulty)
+        self.debug_eval = False  # Check the incremental evaluation against a full recompute
+        self.mcts = None  # Created by the first get_ai_move()
         self.game_settings = GameSettings()
         self.reset_game()
         self.stats = self.load_stats()
@@ -34,88 +60,116 @@ class Chess:
         """ตั้งค่าระดับความยาก"""
         self.game_settings.set_difficulty(difficulty)
         self.settings = self.game_settings.get_settings()
+        self._configure_search()
+    
+    def _configure_search(self):
+        """Switch the search features on or off for the current difficulty"""
+        settings = self.game_settings.adjust_settings('chess')
+        self.search_options = {
+            'null_move_pruning': settings['null_move_pruning'],
+            'late_move_reductions': settings['late_move_reductions'],
+            'principal_variation_search': settings['principal_variation_search']
+        }
+        self.searcher.configure(**self.search_options)
+        self.use_opening_book = settings['opening_book']
+        self.pondering = settings['pondering']
+        if not self.pondering:
+            self.ponderer.stop()
+        
+        # The NNUE replaces the hand-made evaluation when a trained network is installed
+        network = None
+        if settings['nnue_eval']:
+            from chess_nnue import load_default_network
+            network = load_default_network()
+        if self.nnue is not None and (network is None or self.nnue.position is not self.position):
+            self.nnue.detach()
+            self.nnue = None
+        if network is not None and self.nnue is None:
+            from chess_nnue import Accumulator
+            self.nnue = Accumulator(self.position, network)
+        
+        workers = settings['search_workers']
+        if workers == 1:
+            self.parallel_search = None
+        elif self.parallel_search is None or self.parallel_search.processes != worker_count(workers):
+            self.parallel_search = ParallelSearch(workers)
     
     def get_ai_move(self):
-        """รับการเคลื่อนที่ของ AI"""
+        """รับการเคลื่อนที่ของ AI (MCTS จำกัดเวลา, ดู algorithm.mcts)
+        
+        Returns:
+            tuple: ((from_row, from_col), (to_row, to_col), promotion piece ('Q', 'R',
+                   'B', 'N') or None), ready for make_move(); None when the game is over
+        """
         settings = self.game_settings.adjust_settings('chess')
+        # The search plays on self.position, which a background search must not share
+        self.ponderer.stop()
         
         # ใช้ MCTS สำหรับการค้นหาการเคลื่อนที่ที่ดีที่สุด
-        from algorithm.mcts import MCTS
-        mcts = MCTS()
+        if self.mcts is None:
+            from algorithm.mcts import MCTS
+            self.mcts = MCTS(rollout_limit=MCTS_ROLLOUT_PLIES, evaluate=self._rollout_score)
         
-        # ปรับพารามิเตอร์ตามระดับความยาก
-        mcts.set_parameters(
-            search_depth=settings['search_depth'],
-            time_limit=settings['time_limit'],
-            pattern_weight=settings['pattern_weight'],
-            randomness=settings['randomness']
-        )
+        # ปรับพารามิเตอร์ตามระดับความยาก: ค้นหากว้างขึ้นเมื่อสุ่มมากขึ้น
+        self.mcts.exploration_weight = MCTS_EXPLORATION * (1.0 + settings['randomness'])
         
-        # ค้นหาการเคลื่อนที่ที่ดีที่สุด
-        best_move = mcts.search(self.board, self.player_turn)
-        return best_move
+        # ค้นหาการเคลื่อนที่ที่ดีที่สุด (the position is played on and restored)
+        best_move = self.mcts.search(self.position, settings['time_limit'])
+        if best_move is None:
+            return None
+        promotion_type = move_promotion(best_move)
+        promotion = PIECE_TYPES[promotion_type] if promotion_type is not None else None
+        return divmod(best_move & 63, 8), divmod((best_move >> 6) & 63, 8), promotion
+    
+    def _rollout_score(self, position):
+        """Score of a cut-off MCTS playout (position is self.position) for the side to move, between -1 and 1"""
+        return math.tanh(self._evaluate_side_to_move() / ROLLOUT_SCORE_SCALE)
     
     def reset_game(self):
         """Reset the game to initial state"""
-        # Create empty board
-        self.board = [[None for _ in range(self.COLS)] for _ in range(self.ROWS)]
-        
-        # Place white pieces (player)
-        # Pawns
-        for col in range(self.COLS):
-            self.board[6][col] = {'piece': 'P', 'color': 'white', 'moved': False}
-        
-        # Rooks
-        self.board[7][0] = {'piece': 'R', 'color': 'white', 'moved': False}
-        self.board[7][7] = {'piece': 'R', 'color': 'white', 'moved': False}
-        
-        # Knights
-        self.board[7][1] = {'piece': 'N', 'color': 'white', 'moved': False}
-        self.board[7][6] = {'piece': 'N', 'color': 'white', 'moved': False}
-        
-        # Bishops
-        self.board[7][2] = {'piece': 'B', 'color': 'white', 'moved': False}
-        self.board[7][5] = {'piece': 'B', 'color': 'white', 'moved': False}
-        
-        # Queen
-        self.board[7][3] = {'piece': 'Q', 'color': 'white', 'moved': False}
-        
-        # King
-        self.board[7][4] = {'piece': 'K', 'color': 'white', 'moved': False}
-        
-        # Place black pieces (AI)
-        # Pawns
-        for col in range(self.COLS):
-            self.board[1][col] = {'piece': 'P', 'color': 'black', 'moved': False}
-        
-        # Rooks
-        self.board[0][0] = {'piece': 'R', 'color': 'black', 'moved': False}
-        self.board[0][7] = {'piece': 'R', 'color': 'black', 'moved': False}
-        
-        # Knights
-        self.board[0][1] = {'piece': 'N', 'color': 'black', 'moved': False}
-        self.board[0][6] = {'piece': 'N', 'color': 'black', 'moved': False}
-        
-        # Bishops
-        self.board[0][2] = {'piece': 'B', 'color': 'black', 'moved': False}
-        self.board[0][5] = {'piece': 'B', 'color': 'black', 'moved': False}
-        
-        # Queen
-        self.board[0][3] = {'piece': 'Q', 'color': 'black', 'moved': False}
-        
-        # King
-        self.board[0][4] = {'piece': 'K', 'color': 'black', 'moved': False}
+        self.ponderer.new_session()
+        self.position = Position()
+        self.tt.clear()
+        if self.mcts is not None:
+            self.mcts.reset_for_new_game()
+        self.searcher = ChessSearch(self.position, self._evaluate_side_to_move, self.tt,
+                                    get_default_tablebase())
+        self._configure_search()
+        self._touched = 0  # Squares a move has started from or landed on
+        self._sync_board()
         
         # Reset game state variables
         self.game_over = False
         self.winner = None
         self.player_turn = True
-        self.en_passant_target = None
-        self.castling_rights = {'K': True, 'Q': True, 'k': True, 'q': True}
-        self.halfmove_clock = 0
-        self.fullmove_number = 1
         self.move_history = []
     
+    def _sync_board(self):
+        """Rebuild the dict board and state attributes from the bitboard position
+        
+        A piece counts as moved when its square has been touched by a move:
+        a piece that never moved keeps every other piece off its square.
+        """
+        position = self.position
+        board = [[None for _ in range(self.COLS)] for _ in range(self.ROWS)]
+        for sq, piece in enumerate(position.squares):
+            if piece != NO_PIECE:
+                board[sq >> 3][sq & 7] = {
+                    'piece': PIECE_TYPES[piece % 6],
+                    'color': 'white' if piece < 6 else 'black',
+                    'moved': bool(self._touched >> sq & 1)
+                }
+        self.board = board
+        self.en_passant_target = divmod(position.ep, 8) if position.ep >= 0 else None
+        self.castling_rights = {
+            'K': bool(position.castling & CASTLE_WK),
+            'Q': bool(position.castling & CASTLE_WQ),
+            'k': bool(position.castling & CASTLE_BK),
+            'q': bool(position.castling & CASTLE_BQ)
+        }
+        self.halfmove_clock = position.halfmove
+        self.fullmove_number = position.fullmove
+    
     def load_stats(self):
         """Load game statistics from file"""
         stats_file = 'chess_stats.json'
@@ -193,388 +247,61 @@ class Chess:
         if piece['color'] != current_color:
             return {}
         
-        piece_type = piece['piece']
-        color = piece['color']
-        
-        # Calculate moves based on piece type
+        from_sq = row * 8 + col
         valid_moves = {}
-        
-        if piece_type == 'P':
-            valid_moves = self._get_pawn_moves(row, col, color)
-        elif piece_type == 'R':
-            valid_moves = self._get_rook_moves(row, col, color)
-        elif piece_type == 'N':
-            valid_moves = self._get_knight_moves(row, col, color)
-        elif piece_type == 'B':
-            valid_moves = self._get_bishop_moves(row, col, color)
-        elif piece_type == 'Q':
-            valid_moves = self._get_queen_moves(row, col, color)
-        elif piece_type == 'K':
-            valid_moves = self._get_king_moves(row, col, color)
-        
-        # Filter out moves that would leave the king in check
-        valid_moves = self._filter_check_moves(row, col, valid_moves)
+        for move in self.position.legal_moves():
+            if move & 63 == from_sq:
+                to_sq = (move >> 6) & 63
+                # The four promotion choices share one destination
+                valid_moves[divmod(to_sq, 8)] = self._move_info(move)
         
         return valid_moves
     
-    def _get_pawn_moves(self, row, col, color):
-        """Get valid pawn moves"""
-        valid_moves = {}
-        direction = -1 if color == 'white' else 1  # White moves up, black moves down
-        start_row = 6 if color == 'white' else 1   # Starting row for pawns
-        
-        # Forward move
-        if 0 <= row + direction < 8 and self.board[row + direction][col] is None:
-            valid_moves[(row + direction, col)] = {}
-            
-            # Double move from starting position
-            if (row == start_row and 
-                0 <= row + 2*direction < 8 and 
-                self.board[row + 2*direction][col] is None):
-                
-                valid_moves[(row + 2*direction, col)] = {'double_move': True}
-                # Mark the skipped square as the en passant target
-                valid_moves[(row + 2*direction, col)]['en_passant'] = (row + direction, col)
-        
-        # Capture moves (diagonal)
-        for dc in [-1, 1]:
-            if 0 <= row + direction < 8 and 0 <= col + dc < 8:
-                # Regular capture
-                if (self.board[row + direction][col + dc] is not None and 
-                    self.board[row + direction][col + dc]['color'] != color):
-                    valid_moves[(row + direction, col + dc)] = {'capture': True}
-                
-                # En passant capture
-                elif (self.en_passant_target is not None and 
-                      (row + direction, col + dc) == self.en_passant_target):
-                    # Determine the position of the pawn to be captured
-                    captured_row = row
-                    captured_col = col + dc
-                    valid_moves[(row + direction, col + dc)] = {
-                        'en_passant_capture': True,
-                        'captured_piece': (captured_row, captured_col)
-                    }
-        
-        # Check for promotion
-        promotion_row = 0 if color == 'white' else 7
-        for move in list(valid_moves.keys()):
-            if move[0] == promotion_row:
-                valid_moves[move]['promotion'] = True
-                
-        return valid_moves
-    
-    def _get_rook_moves(self, row, col, color):
-        """Get valid rook moves"""
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]  # Up, down, left, right
-        return self._get_sliding_moves(row, col, color, directions)
-    
-    def _get_bishop_moves(self, row, col, color):
-        """Get valid bishop moves"""
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]  # Diagonals
-        return self._get_sliding_moves(row, col, color, directions)
-    
-    def _get_queen_moves(self, row, col, color):
-        """Get valid queen moves (combination of rook and bishop)"""
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
-        return self._get_sliding_moves(row, col, color, directions)
-    
-    def _get_sliding_moves(self, row, col, color, directions):
-        """Helper for calculating sliding piece moves (rook, bishop, queen)"""
-        valid_moves = {}
-        
-        for dr, dc in directions:
-            r, c = row + dr, col + dc
-            
-            while 0 <= r < 8 and 0 <= c < 8:
-                if self.board[r][c] is None:
-                    # Empty square - valid move
-                    valid_moves[(r, c)] = {}
-                else:
-                    # Square contains a piece
-                    if self.board[r][c]['color'] != color:
-                        # Enemy piece - can capture
-                        valid_moves[(r, c)] = {'capture': True}
-                    # Stop sliding in this direction
-                    break
-                
-                # Continue sliding
-                r += dr
-                c += dc
-        
-        return valid_moves
-    
-    def _get_knight_moves(self, row, col, color):
-        """Get valid knight moves"""
-        valid_moves = {}
-        moves = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
-        
-        for dr, dc in moves:
-            r, c = row + dr, col + dc
-            
-            if 0 <= r < 8 and 0 <= c < 8:
-                if self.board[r][c] is None:
-                    # Empty square
-                    valid_moves[(r, c)] = {}
-                elif self.board[r][c]['color'] != color:
-                    # Enemy piece
-                    valid_moves[(r, c)] = {'capture': True}
-        
-        return valid_moves
-    
-    def _get_king_moves(self, row, col, color):
-        """Get valid king moves including castling"""
-        valid_moves = {}
-        
-        # Regular king moves - one square in any direction
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue  # Skip the current position
-                
-                r, c = row + dr, col + dc
-                
-                if 0 <= r < 8 and 0 <= c < 8:
-                    if self.board[r][c] is None:
-                        # Empty square
-                        valid_moves[(r, c)] = {}
-                    elif self.board[r][c]['color'] != color:
-                        # Enemy piece
-                        valid_moves[(r, c)] = {'capture': True}
-        
-        # Castling
-        if not self.board[row][col]['moved']:
-            # Check kingside castling
-            castling_right = 'K' if color == 'white' else 'k'
-            if self.castling_rights[castling_right]:
-                # Check if squares between king and rook are empty
-                if (self.board[row][col+1] is None and 
-                    self.board[row][col+2] is None and 
-                    self.board[row][7] is not None and 
-                    self.board[row][7]['piece'] == 'R' and 
-                    self.board[row][7]['color'] == color and 
-                    not self.board[row][7]['moved']):
-                    
-                    # Check if king would pass through check
-                    if (not self._is_square_attacked(row, col, color) and 
-                        not self._is_square_attacked(row, col+1, color) and 
-                        not self._is_square_attacked(row, col+2, color)):
-                        
-                        valid_moves[(row, col+2)] = {
-                            'castling': 'kingside',
-                            'rook_from': (row, 7),
-                            'rook_to': (row, col+1)
-                        }
-            
-            # Check queenside castling
-            castling_right = 'Q' if color == 'white' else 'q'
-            if self.castling_rights[castling_right]:
-                # Check if squares between king and rook are empty
-                if (self.board[row][col-1] is None and 
-                    self.board[row][col-2] is None and 
-                    self.board[row][col-3] is None and  # Extra empty square for queenside
-                    self.board[row][0] is not None and 
-                    self.board[row][0]['piece'] == 'R' and 
-                    self.board[row][0]['color'] == color and 
-                    not self.board[row][0]['moved']):
-                    
-                    # Check if king would pass through check
-                    if (not self._is_square_attacked(row, col, color) and 
-                        not self._is_square_attacked(row, col-1, color) and 
-                        not self._is_square_attacked(row, col-2, color)):
-                        
-                        valid_moves[(row, col-2)] = {
-                            'castling': 'queenside',
-                            'rook_from': (row, 0),
-                            'rook_to': (row, col-1)
-                        }
-        
-        return valid_moves
-    
-    def _is_square_attacked(self, row, col, color):
-        """Check if a square is attacked by any opponent pieces"""
-        # Determine opponent color
-        opponent_color = 'black' if color == 'white' else 'white'
-        
-        # Check for pawn attacks
-        pawn_direction = 1 if color == 'white' else -1  # Direction pawns attack from
-        for dc in [-1, 1]:
-            r, c = row + pawn_direction, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                piece = self.board[r][c]
-                if (piece is not None and piece['color'] == opponent_color and 
-                    piece['piece'] == 'P'):
-                    return True
-        
-        # Check for knight attacks
-        knight_moves = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
-        for dr, dc in knight_moves:
-            r, c = row + dr, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                piece = self.board[r][c]
-                if (piece is not None and piece['color'] == opponent_color and 
-                    piece['piece'] == 'N'):
-                    return True
-        
-        # Check for sliding attacks (queen, rook, bishop)
-        # Rook directions
-        for dr, dc in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-            r, c = row + dr, col + dc
-            while 0 <= r < 8 and 0 <= c < 8:
-                piece = self.board[r][c]
-                if piece is not None:
-                    if piece['color'] == opponent_color and (
-                        piece['piece'] == 'R' or piece['piece'] == 'Q'):
-                        return True
-                    break  # Blocked by a piece
-                r += dr
-                c += dc
-        
-        # Bishop directions
-        for dr, dc in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
-            r, c = row + dr, col + dc
-            while 0 <= r < 8 and 0 <= c < 8:
-                piece = self.board[r][c]
-                if piece is not None:
-                    if piece['color'] == opponent_color and (
-                        piece['piece'] == 'B' or piece['piece'] == 'Q'):
-                        return True
-                    break  # Blocked by a piece
-                r += dr
-                c += dc
-        
-        # Check for king attacks
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue
-                r, c = row + dr, col + dc
-                if 0 <= r < 8 and 0 <= c < 8:
-                    piece = self.board[r][c]
-                    if (piece is not None and piece['color'] == opponent_color and 
-                        piece['piece'] == 'K'):
-                        return True
-        
-        return False
-    
-    def _filter_check_moves(self, from_row, from_col, valid_moves):
-        """Filter out moves that would leave king in check"""
-        filtered_moves = {}
+    def get_all_valid_moves(self):
+        """Valid moves of every piece of the side to move, from one move generation
         
-        # Get color of moving piece
-        color = self.board[from_row][from_col]['color']
-        
-        # Try each move and see if it leaves the king in check
-        for (to_row, to_col), move_info in valid_moves.items():
-            # Make a temporary copy of the board
-            temp_board = deepcopy(self.board)
-            
-            # Execute the move temporarily
-            temp_board[to_row][to_col] = temp_board[from_row][from_col]
-            temp_board[from_row][from_col] = None
-            
-            # Handle special moves that capture in different ways
-            if 'en_passant_capture' in move_info:
-                captured_row, captured_col = move_info['captured_piece']
-                temp_board[captured_row][captured_col] = None
-            
-            # If the move was castling, move the rook too
-            if 'castling' in move_info:
-                rook_from = move_info['rook_from']
-                rook_to = move_info['rook_to']
-                temp_board[rook_to[0]][rook_to[1]] = temp_board[rook_from[0]][rook_from[1]]
-                temp_board[rook_from[0]][rook_from[1]] = None
-            
-            # Find king's position
-            king_pos = self._find_king(temp_board, color)
-            
-            # If king wasn't found (shouldn't happen), skip this move
-            if not king_pos:
-                continue
-            
-            # Check if king is in check after this move
-            king_row, king_col = king_pos
-            
-            # If the king is not in check after the move, it's valid
-            if not self._is_square_attacked_on_board(temp_board, king_row, king_col, color):
-                filtered_moves[(to_row, to_col)] = move_info
-        
-        return filtered_moves
-    
-    def _is_square_attacked_on_board(self, board, row, col, color):
-        """Check if a square is attacked on a specific board configuration"""
-        # Determine opponent color
-        opponent_color = 'black' if color == 'white' else 'white'
-        
-        # Check for pawn attacks
-        pawn_direction = 1 if color == 'white' else -1  # Direction pawns attack from
-        for dc in [-1, 1]:
-            r, c = row + pawn_direction, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                piece = board[r][c]
-                if (piece is not None and piece['color'] == opponent_color and 
-                    piece['piece'] == 'P'):
-                    return True
-        
-        # Check for knight attacks
-        knight_moves = [(2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)]
-        for dr, dc in knight_moves:
-            r, c = row + dr, col + dc
-            if 0 <= r < 8 and 0 <= c < 8:
-                piece = board[r][c]
-                if (piece is not None and piece['color'] == opponent_color and 
-                    piece['piece'] == 'N'):
-                    return True
-        
-        # Check for sliding attacks (queen, rook, bishop)
-        # Rook directions
-        for dr, dc in [(0, 1), (1, 0), (0, -1), (-1, 0)]:
-            r, c = row + dr, col + dc
-            while 0 <= r < 8 and 0 <= c < 8:
-                piece = board[r][c]
-                if piece is not None:
-                    if piece['color'] == opponent_color and (
-                        piece['piece'] == 'R' or piece['piece'] == 'Q'):
-                        return True
-                    break  # Blocked by a piece
-                r += dr
-                c += dc
-        
-        # Bishop directions
-        for dr, dc in [(1, 1), (1, -1), (-1, 1), (-1, -1)]:
-            r, c = row + dr, col + dc
-            while 0 <= r < 8 and 0 <= c < 8:
-                piece = board[r][c]
-                if piece is not None:
-                    if piece['color'] == opponent_color and (
-                        piece['piece'] == 'B' or piece['piece'] == 'Q'):
-                        return True
-                    break  # Blocked by a piece
-                r += dr
-                c += dc
-        
-        # Check for king attacks
-        for dr in [-1, 0, 1]:
-            for dc in [-1, 0, 1]:
-                if dr == 0 and dc == 0:
-                    continue
-                r, c = row + dr, col + dc
-                if 0 <= r < 8 and 0 <= c < 8:
-                    piece = board[r][c]
-                    if (piece is not None and piece['color'] == opponent_color and 
-                        piece['piece'] == 'K'):
-                        return True
+        Returns:
+            dict: {(from_row, from_col): valid moves as get_valid_moves returns them}
+        """
+        if self.game_over:
+            return {}
         
-        return False
-    
-    def _find_king(self, board, color):
-        """Find the position of a king of the specified color"""
-        for row in range(8):
-            for col in range(8):
-                piece = board[row][col]
-                if (piece is not None and piece['color'] == color and 
-                    piece['piece'] == 'K'):
-                    return (row, col)
-        return None
+        all_moves = {}
+        for move in self.position.legal_moves():
+            from_square = divmod(move & 63, 8)
+            to_square = divmod((move >> 6) & 63, 8)
+            all_moves.setdefault(from_square, {})[to_square] = self._move_info(move)
+        return all_moves
+    
+    def _move_info(self, move):
+        """Describe a packed move with the special-move keys the UI expects"""
+        from_row, from_col = divmod(move & 63, 8)
+        to_row, to_col = divmod((move >> 6) & 63, 8)
+        flag = move >> 12
+        move_info = {}
+        
+        if flag == DOUBLE_PUSH:
+            move_info['double_move'] = True
+            # Mark the skipped square as the en passant target
+            move_info['en_passant'] = ((from_row + to_row) // 2, from_col)
+        elif flag == EP_CAPTURE:
+            move_info['en_passant_capture'] = True
+            move_info['captured_piece'] = (from_row, to_col)
+        elif flag == KING_CASTLE:
+            move_info['castling'] = 'kingside'
+            move_info['rook_from'] = (from_row, 7)
+            move_info['rook_to'] = (from_row, to_col - 1)
+        elif flag == QUEEN_CASTLE:
+            move_info['castling'] = 'queenside'
+            move_info['rook_from'] = (from_row, 0)
+            move_info['rook_to'] = (from_row, to_col + 1)
+        elif flag & CAPTURE:
+            move_info['capture'] = True
+        
+        if move_promotion(move) is not None:
+            move_info['promotion'] = True
+        
+        return move_info
     
     def make_move(self, from_row, from_col, to_row, to_col, promotion_piece=None):
         """Make a move from one position to another
@@ -587,81 +314,37 @@ class Chess:
         Returns:
             bool: True if move was successful, False otherwise
         """
-        # Check if the move is valid
-        valid_moves = self.get_valid_moves(from_row, from_col)
-        
-        if (to_row, to_col) not in valid_moves:
+        piece = self.board[from_row][from_col] if (
+            0 <= from_row < self.ROWS and 0 <= from_col < self.COLS) else None
+        current_color = 'white' if self.player_turn else 'black'
+        if piece is None or piece['color'] != current_color:
             return False
         
-        move_info = valid_moves[(to_row, to_col)]
-        piece = self.board[from_row][from_col]
-        
-        # Update halfmove clock
-        if piece['piece'] == 'P' or 'capture' in move_info:
-            self.halfmove_clock = 0
-        else:
-            self.halfmove_clock += 1
-        
-        # Handle en passant target
-        self.en_passant_target = None
-        if 'en_passant' in move_info:
-            self.en_passant_target = move_info['en_passant']
-        
-        # Handle castling
-        if 'castling' in move_info:
-            rook_from = move_info['rook_from']
-            rook_to = move_info['rook_to']
-            
-            # Move the rook
-            self.board[rook_to[0]][rook_to[1]] = self.board[rook_from[0]][rook_from[1]]
-            self.board[rook_from[0]][rook_from[1]] = None
-            self.board[rook_to[0]][rook_to[1]]['moved'] = True
-        
-        # Update castling rights
-        if piece['piece'] == 'K':
-            if piece['color'] == 'white':
-                self.castling_rights['K'] = False
-                self.castling_rights['Q'] = False
-            else:
-                self.castling_rights['k'] = False
-                self.castling_rights['q'] = False
-        elif piece['piece'] == 'R':
-            if from_row == 7 and from_col == 0:  # White queenside rook
-                self.castling_rights['Q'] = False
-            elif from_row == 7 and from_col == 7:  # White kingside rook
-                self.castling_rights['K'] = False
-            elif from_row == 0 and from_col == 0:  # Black queenside rook
-                self.castling_rights['q'] = False
-            elif from_row == 0 and from_col == 7:  # Black kingside rook
-                self.castling_rights['k'] = False
-        
-        # Handle en passant capture
-        if 'en_passant_capture' in move_info:
-            captured_row, captured_col = move_info['captured_piece']
-            self.board[captured_row][captured_col] = None
+        # Check if the move is valid (default to Queen if no piece specified)
+        promotion = PIECE_TYPES.index(promotion_piece) if promotion_piece in ('N', 'B', 'R', 'Q') else QUEEN
+        move = self.position.find_move(from_row * 8 + from_col, to_row * 8 + to_col, promotion)
+        if move is None:
+            return False
         
-        # Move the piece
-        piece['moved'] = True
-        self.board[to_row][to_col] = piece
-        self.board[from_row][from_col] = None
+        flag = move >> 12
+        self.position.make(move)
         
-        # Handle pawn promotion
-        if 'promotion' in move_info and piece['piece'] == 'P':
-            # Default to Queen if no piece specified
-            promotion = promotion_piece if promotion_piece else 'Q'
-            self.board[to_row][to_col]['piece'] = promotion
+        # Remember which squares have been disturbed for the 'moved' flags
+        self._touched |= (1 << (from_row * 8 + from_col)) | (1 << (to_row * 8 + to_col))
+        if flag == KING_CASTLE:
+            self._touched |= 1 << (from_row * 8 + 7)
+        elif flag == QUEEN_CASTLE:
+            self._touched |= 1 << (from_row * 8)
+        self._sync_board()
         
         # Record the move in algebraic notation
+        promoted = move_promotion(move)
         self._record_move(from_row, from_col, to_row, to_col, piece['piece'], 
-                         'capture' in move_info, promotion_piece)
+                         bool(flag & CAPTURE), PIECE_TYPES[promoted] if promoted is not None else None)
         
         # Update game state
         self._check_game_over()
         
-        # Update fullmove number after black's move
-        if not self.player_turn:  # After Black's move
-            self.fullmove_number += 1
-        
         # Switch turns if game not over
         if not self.game_over:
             self.player_turn = not self.player_turn
@@ -703,42 +386,25 @@ class Chess:
     
     def _check_game_over(self):
         """Check if the game is over due to checkmate, stalemate, or other conditions"""
-        current_color = 'white' if self.player_turn else 'black'
-        king_pos = self._find_king(self.board, current_color)
+        position = self.position
         
-        if not king_pos:
-            # King not found (shouldn't happen in normal play)
-            return
-        
-        king_row, king_col = king_pos
-        
-        # Check if king is in check
-        in_check = self._is_square_attacked(king_row, king_col, current_color)
-        
-        # Check if the player has any valid moves
-        has_valid_moves = False
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece and piece['color'] == current_color:
-                    moves = self.get_valid_moves(row, col)
-                    if moves:
-                        has_valid_moves = True
-                        break
-            if has_valid_moves:
-                break
-        
-        if not has_valid_moves:
+        # The side that has to reply to the move just made
+        if not position.has_legal_move():
             self.game_over = True
-            if in_check:
+            if position.in_check():
                 # Checkmate
-                self.winner = 'black' if current_color == 'white' else 'white'
+                self.winner = 'black' if position.side == WHITE else 'white'
             else:
                 # Stalemate
                 self.winner = None
         
-        # Check for 50-move rule
-        elif self.halfmove_clock >= 50:
+        # Check for 50-move rule (50 moves by each side)
+        elif position.halfmove >= 100:
+            self.game_over = True
+            self.winner = None  # Draw
+        
+        # Check for threefold repetition
+        elif position.is_repetition(2):
             self.game_over = True
             self.winner = None  # Draw
         
@@ -749,29 +415,20 @@ class Chess:
     
     def _has_insufficient_material(self):
         """Check for draw due to insufficient material"""
-        # Count pieces
-        white_pieces = []
-        black_pieces = []
-        
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece:
-                    if piece['color'] == 'white':
-                        white_pieces.append(piece['piece'])
-                    else:
-                        black_pieces.append(piece['piece'])
+        bb = self.position.bb
+        white_count = popcount(self.position.occ[WHITE])
+        black_count = popcount(self.position.occ[BLACK])
         
         # King vs King
-        if len(white_pieces) == 1 and len(black_pieces) == 1:
+        if white_count == 1 and black_count == 1:
             return True
         
         # King + Bishop/Knight vs King
-        if (len(white_pieces) == 2 and len(black_pieces) == 1 and 
-            ('B' in white_pieces or 'N' in white_pieces)):
+        if (white_count == 2 and black_count == 1 and 
+            (bb[BISHOP] or bb[KNIGHT])):
             return True
-        if (len(black_pieces) == 2 and len(white_pieces) == 1 and 
-            ('B' in black_pieces or 'N' in black_pieces)):
+        if (black_count == 2 and white_count == 1 and 
+            (bb[6 + BISHOP] or bb[6 + KNIGHT])):
             return True
         
         # King + Bishop vs King + Bishop on same color
@@ -780,226 +437,104 @@ class Chess:
         return False
     
     def evaluate_board(self, color='black'):
-        """Evaluate the current position from the perspective of the given color"""
-        # Piece values
-        piece_values = {
-            'P': 1,   # Pawn
-            'N': 3,   # Knight
-            'B': 3,   # Bishop
-            'R': 5,   # Rook
-            'Q': 9,   # Queen
-            'K': 0    # King (not included in material count)
-        }
-        
-        # Position evaluation weights (piece-square tables)
-        pawn_position = [
-            [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-            [0.5, 1.0, 1.0, -2.0, -2.0, 1.0, 1.0, 0.5],
-            [0.5, -0.5, -1.0, 0.0, 0.0, -1.0, -0.5, 0.5],
-            [0.0, 0.0, 0.0, 2.0, 2.0, 0.0, 0.0, 0.0],
-            [0.5, 0.5, 1.0, 2.5, 2.5, 1.0, 0.5, 0.5],
-            [1.0, 1.0, 2.0, 3.0, 3.0, 2.0, 1.0, 1.0],
-            [5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0],
-            [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0]
-        ]
-        
-        knight_position = [
-            [-5.0, -4.0, -3.0, -3.0, -3.0, -3.0, -4.0, -5.0],
-            [-4.0, -2.0, 0.0, 0.0, 0.0, 0.0, -2.0, -4.0],
-            [-3.0, 0.0, 1.0, 1.5, 1.5, 1.0, 0.0, -3.0],
-            [-3.0, 0.5, 1.5, 2.0, 2.0, 1.5, 0.5, -3.0],
-            [-3.0, 0.0, 1.5, 2.0, 2.0, 1.5, 0.0, -3.0],
-            [-3.0, 0.5, 1.0, 1.5, 1.5, 1.0, 0.5, -3.0],
-            [-4.0, -2.0, 0.0, 0.5, 0.5, 0.0, -2.0, -4.0],
-            [-5.0, -4.0, -3.0, -3.0, -3.0, -3.0, -4.0, -5.0]
-        ]
-        
-        bishop_position = [
-            [-2.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -2.0],
-            [-1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -1.0],
-            [-1.0, 0.0, 0.5, 1.0, 1.0, 0.5, 0.0, -1.0],
-            [-1.0, 0.5, 0.5, 1.0, 1.0, 0.5, 0.5, -1.0],
-            [-1.0, 0.0, 1.0, 1.0, 1.0, 1.0, 0.0, -1.0],
-            [-1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.0],
-            [-1.0, 0.5, 0.0, 0.0, 0.0, 0.0, 0.5, -1.0],
-            [-2.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -2.0]
-        ]
-        
-        rook_position = [
-            [0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0],
-            [0.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.5],
-            [-0.5, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -0.5],
-            [-0.5, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -0.5],
-            [-0.5, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -0.5],
-            [-0.5, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -0.5],
-            [-0.5, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -0.5],
-            [0.0, 0.0, 0.0, 0.5, 0.5, 0.0, 0.0, 0.0]
-        ]
-        
-        queen_position = [
-            [-2.0, -1.0, -1.0, -0.5, -0.5, -1.0, -1.0, -2.0],
-            [-1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -1.0],
-            [-1.0, 0.0, 0.5, 0.5, 0.5, 0.5, 0.0, -1.0],
-            [-0.5, 0.0, 0.5, 0.5, 0.5, 0.5, 0.0, -0.5],
-            [0.0, 0.0, 0.5, 0.5, 0.5, 0.5, 0.0, -0.5],
-            [-1.0, 0.5, 0.5, 0.5, 0.5, 0.5, 0.0, -1.0],
-            [-1.0, 0.0, 0.5, 0.0, 0.0, 0.0, 0.0, -1.0],
-            [-2.0, -1.0, -1.0, -0.5, -0.5, -1.0, -1.0, -2.0]
-        ]
-        
-        king_position_middlegame = [
-            [-3.0, -4.0, -4.0, -5.0, -5.0, -4.0, -4.0, -3.0],
-            [-3.0, -4.0, -4.0, -5.0, -5.0, -4.0, -4.0, -3.0],
-            [-3.0, -4.0, -4.0, -5.0, -5.0, -4.0, -4.0, -3.0],
-            [-3.0, -4.0, -4.0, -5.0, -5.0, -4.0, -4.0, -3.0],
-            [-2.0, -3.0, -3.0, -4.0, -4.0, -3.0, -3.0, -2.0],
-            [-1.0, -2.0, -2.0, -2.0, -2.0, -2.0, -2.0, -1.0],
-            [2.0, 2.0, 0.0, 0.0, 0.0, 0.0, 2.0, 2.0],
-            [2.0, 3.0, 1.0, 0.0, 0.0, 1.0, 3.0, 2.0]
-        ]
-        
-        # Calculate score for each side
-        white_score = 0
-        black_score = 0
-        
-        for row in range(8):
-            for col in range(8):
-                piece = self.board[row][col]
-                if piece:
-                    piece_type = piece['piece']
-                    piece_color = piece['color']
-                    
-                    # Base piece value
-                    value = piece_values[piece_type]
-                    
-                    # Add position-based evaluation
-                    if piece_type == 'P':
-                        position_value = pawn_position[row][col]
-                    elif piece_type == 'N':
-                        position_value = knight_position[row][col]
-                    elif piece_type == 'B':
-                        position_value = bishop_position[row][col]
-                    elif piece_type == 'R':
-                        position_value = rook_position[row][col]
-                    elif piece_type == 'Q':
-                        position_value = queen_position[row][col]
-                    elif piece_type == 'K':
-                        position_value = king_position_middlegame[row][col]
-                    else:
-                        position_value = 0
-                    
-                    # Add to appropriate score
-                    if piece_color == 'white':
-                        # Flip table for white pieces
-                        adjusted_position_value = position_value if row < 4 else position_value * 0.5
-                        white_score += value + adjusted_position_value
-                    else:
-                        # For black pieces, the tables are from their perspective
-                        adjusted_position_value = position_value if row >= 4 else position_value * 0.5
-                        black_score += value + adjusted_position_value
+        """Evaluate the current position from the perspective of the given color
+        
+        The position keeps its material + piece-square score up to date on
+        every make/unmake (tables in chess_eval), so this is a lookup. Pawn
+        structure comes from the pawn hash table, which only computes it for
+        pawn formations it has not seen. With a trained NNUE installed
+        (settings['nnue_eval']) the network scores the position instead,
+        from accumulators updated the same way. With debug_eval set the
+        incremental state is also recomputed from scratch and the two have
+        to agree.
+        """
+        position = self.position
+        if self.debug_eval:
+            full_score = position.compute_score()
+            assert abs(position.score - full_score) < 1e-9, (
+                f"Incremental evaluation {position.score} differs from full recompute {full_score}")
+            assert position.pawn_key == position.compute_pawn_key(), "Pawn key out of sync"
+            if self.nnue is not None:
+                full_nnue = self.nnue.network.evaluate(position)
+                assert abs(self.nnue.evaluate() - full_nnue) < 1e-6, (
+                    f"Incremental NNUE score differs from full recompute {full_nnue}")
+        
+        if self.nnue is not None:
+            score = self.nnue.evaluate()  # For the side to move
+            if position.side == BLACK:
+                score = -score
+        else:
+            score = evaluate_position(position, self.pawn_table)  # From white's point of view
         
         # Return the score from the given color's perspective
         if color == 'black':
-            return black_score - white_score
+            return -score
         else:
-            return white_score - black_score
+            return score
+    
+    def _evaluate_side_to_move(self):
+        """Static score for the side to move, as the search expects"""
+        score = self.evaluate_board('white')
+        return -score if self.position.side == BLACK else score
     
     def minimax(self, depth, alpha, beta, maximizing_player):
         """Minimax algorithm with alpha-beta pruning for chess AI
         
+        The search plays and takes back moves on the bitboard position with
+        make/unmake and orders moves by hash move, MVV-LVA, killers and
+        history (see chess_search.ChessSearch).
+        
         Args:
             depth: Maximum depth to search
             alpha, beta: Alpha-beta pruning parameters
             maximizing_player: True for AI (black), False for player (white)
             
         Returns:
-            tuple: (best_move, best_score) where move is ((from_row, from_col), (to_row, to_col))
+            tuple: (best_move, best_score) where move is ((from_row, from_col), (to_row, to_col),
+                   promotion piece ('Q', 'R', 'B', 'N') or None) and the score is from the
+                   AI's (black's) point of view
         """
-        if depth == 0 or self.game_over:
-            # Evaluate the board and return
-            return None, self.evaluate_board('black' if maximizing_player else 'white')
-        
-        # Determine the current color
-        current_color = 'black' if maximizing_player else 'white'
-        best_move = None
-        
-        if maximizing_player:  # AI's turn (black)
-            best_score = float('-inf')
-            
-            # Generate all possible moves for black
-            for from_row in range(8):
-                for from_col in range(8):
-                    piece = self.board[from_row][from_col]
-                    if piece and piece['color'] == 'black':
-                        moves = self.get_valid_moves(from_row, from_col)
-                        
-                        for to_pos, move_info in moves.items():
-                            to_row, to_col = to_pos
-                            
-                            # Make temporary move
-                            temp_board = deepcopy(self.board)
-                            temp_game = Chess()
-                            temp_game.board = temp_board
-                            temp_game.player_turn = self.player_turn
-                            temp_game.en_passant_target = self.en_passant_target
-                            temp_game.castling_rights = self.castling_rights.copy()
-                            
-                            # Make the move
-                            promotion = 'Q' if 'promotion' in move_info else None
-                            if temp_game.make_move(from_row, from_col, to_row, to_col, promotion):
-                                # Recursive call
-                                _, score = temp_game.minimax(depth - 1, alpha, beta, False)
-                                
-                                # Update best move
-                                if score > best_score:
-                                    best_score = score
-                                    best_move = ((from_row, from_col), (to_row, to_col))
-                                
-                                # Alpha-beta pruning
-                                alpha = max(alpha, best_score)
-                                if beta <= alpha:
-                                    break
-            
-            return best_move, best_score
-            
-        else:  # Player's turn (white)
-            best_score = float('inf')
-            
-            # Generate all possible moves for white
-            for from_row in range(8):
-                for from_col in range(8):
-                    piece = self.board[from_row][from_col]
-                    if piece and piece['color'] == 'white':
-                        moves = self.get_valid_moves(from_row, from_col)
-                        
-                        for to_pos, move_info in moves.items():
-                            to_row, to_col = to_pos
-                            
-                            # Make temporary move
-                            temp_board = deepcopy(self.board)
-                            temp_game = Chess()
-                            temp_game.board = temp_board
-                            temp_game.player_turn = self.player_turn
-                            temp_game.en_passant_target = self.en_passant_target
-                            temp_game.castling_rights = self.castling_rights.copy()
-                            
-                            # Make the move
-                            promotion = 'Q' if 'promotion' in move_info else None
-                            if temp_game.make_move(from_row, from_col, to_row, to_col, promotion):
-                                # Recursive call
-                                _, score = temp_game.minimax(depth - 1, alpha, beta, True)
-                                
-                                # Update best move
-                                if score < best_score:
-                                    best_score = score
-                                    best_move = ((from_row, from_col), (to_row, to_col))
-                                
-                                # Alpha-beta pruning
-                                beta = min(beta, best_score)
-                                if beta <= alpha:
-                                    break
-            
-            return best_move, best_score
+        # The table must not be shared with a background search
+        self.ponderer.stop()
+        if self.game_over:
+            return None, self.evaluate_board('black')
+        
+        # The search scores for the side to move; black's window is white's negated
+        black_to_move = self.position.side == BLACK
+        root = self.searcher.probe_root()
+        if root is not None:
+            # Small endings are solved exactly, no search needed
+            best_move, score = root
+        elif self._use_parallel_search(depth):
+            best_move, score = self._parallel_root_search(depth)
+        elif black_to_move:
+            best_move, score = self.searcher.search(depth, alpha, beta)
+        else:
+            best_move, score = self.searcher.search(depth, -beta, -alpha)
+        if not black_to_move:
+            score = -score
+        
+        if best_move == NO_MOVE:
+            return None, score
+        promotion_type = move_promotion(best_move)
+        promotion = PIECE_TYPES[promotion_type] if promotion_type is not None else None
+        return (divmod(best_move & 63, 8), divmod((best_move >> 6) & 63, 8), promotion), score
+    
+    def _use_parallel_search(self, depth):
+        """Split the root over worker processes only when it can pay off"""
+        return (self.parallel_search is not None and self.parallel_search.processes > 1 and
+                depth >= 3)
+    
+    def _parallel_root_search(self, depth):
+        """Search the root moves on the worker pool (full window)"""
+        position = self.position
+        moves = self.searcher.order_moves(position.legal_moves(), self.tt.best_move(position.key), 0)
+        if len(moves) == 1:
+            # Nothing to choose between, a short local search gives the score
+            return self.searcher.search(1)
+        # The workers' results go into the game's table, which pondering and the next search read
+        return self.parallel_search.search(position, moves, depth, self.search_options,
+                                           self.nnue is not None, self.tt)
     
     def ai_move_minimax(self, depth=2):
         """Make an AI move using minimax algorithm
@@ -1013,23 +548,46 @@ class Chess:
         if self.game_over or self.player_turn:  # Only make moves if it's AI's turn
             return False
         
-        # Use minimax to find the best move
-        best_move, _ = self.minimax(depth, float('-inf'), float('inf'), True)
-        
-        if best_move:
-            (from_row, from_col), (to_row, to_col) = best_move
-            
-            # Check if this is a promotion move
-            promotion = None
-            piece = self.board[from_row][from_col]
-            if piece and piece['piece'] == 'P' and to_row == 7:  # Pawn reaching promotion rank
-                promotion = 'Q'  # Always promote to queen for AI
+        # Stop thinking on the player's time; a correct guess has the answer ready
+        self.ponderer.stop()
+        move = None
+        
+        # Play from the opening book while the position is still in it
+        if self.use_opening_book:
+            book = get_default_book()
+            move = book.choose_move(self.position) if book else None
+        if move is None:
+            answer = self.ponderer.get_answer(self.position.key, depth)
+            if answer is not None:
+                move = answer[0]
+        
+        if move is not None:
+            from_row, from_col = divmod(move & 63, 8)
+            to_row, to_col = divmod((move >> 6) & 63, 8)
+            promotion_type = move_promotion(move)
+            promotion = PIECE_TYPES[promotion_type] if promotion_type is not None else None
+            played = self.make_move(from_row, from_col, to_row, to_col, promotion)
+        else:
+            # Use minimax to find the best move
+            best_move, _ = self.minimax(depth, float('-inf'), float('inf'), True)
+            if not best_move:
+                # No valid move found (shouldn't happen in normal play)
+                return False
+            (from_row, from_col), (to_row, to_col), promotion = best_move
             
-            # Make the move
-            return self.make_move(from_row, from_col, to_row, to_col, promotion)
-        
-        # No valid move found (shouldn't happen in normal play)
-        return False
+            # Make the move, promoting to the piece the search chose
+            played = self.make_move(from_row, from_col, to_row, to_col, promotion)
+        
+        if played and self.pondering and not self.game_over:
+            self._start_pondering(depth)
+        return played
+    
+    def _start_pondering(self, depth):
+        """Search the player's expected reply in the background"""
+        predicted = self.tt.best_move(self.position.key)
+        if predicted != NO_MOVE and predicted in self.position.legal_moves():
+            self.ponderer.start(self.position, predicted, depth, self.search_options,
+                                self.nnue.network if self.nnue is not None else None)
 
 
 # Test function for Chess class
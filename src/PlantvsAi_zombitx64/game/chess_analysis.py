@@ -0,0 +1,231 @@
+"""
+Batch analysis of chess games and positions
+
+Streams positions out of a PGN file (every position of every game, with
+the move that was played from it) or a file with one FEN per line, scores
+each one with the engine on a pool of worker processes, and appends one
+record per position to a JSONL or CSV file as soon as it is done::
+
+    id      "<game>:<ply>" for PGN input, "<line>" for FEN input
+    fen     position analysed
+    played  move played from it in the game (UCI), or None
+    best    engine's best move (UCI), or None when the game is over
+    score   evaluation in pawns from white's point of view
+    depth   last fully searched depth
+    nodes   main-search nodes spent
+    error   why the position could not be analysed (a malformed FEN), or
+            None; the engine's fields are None then
+
+An eval curve is the score column of one game, and a blunder is a played
+move after which the score drops sharply for the side that moved.
+
+Records already in the output file are skipped, so an interrupted run
+continues where it stopped when started again with the same arguments.
+Positions are searched from their FEN alone; repetitions with earlier
+moves of the game are not seen.
+
+Example:
+    python chess_analysis.py games.pgn scores.jsonl --depth 6 --workers 4
+"""
+import argparse
+import csv
+import json
+import multiprocessing
+import os
+import time
+
+from chess_bitboard import Position, START_FEN, BLACK, move_to_uci
+from chess_book import iter_pgn_games, parse_san
+from chess_eval import PawnHashTable, side_to_move_evaluator
+from chess_search import ChessSearch, MAX_PLY
+from chess_tablebase import get_default_tablebase
+from transposition import TranspositionTable, NO_MOVE
+
+FIELDS = ('id', 'fen', 'played', 'best', 'score', 'depth', 'nodes', 'error')
+DEFAULT_DEPTH = 6
+REPORT_EVERY = 100  # Positions between two throughput reports
+
+_searcher = None  # ChessSearch owned by a worker process
+
+
+def iter_positions(path):
+    """Stream the positions to analyse from a PGN or FEN file
+
+    Yields:
+        tuple: (id, FEN, played move in UCI or None)
+    """
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.lower().endswith('.pgn'):
+            position = Position()
+            for game, (tags, moves) in enumerate(iter_pgn_games(f), 1):
+                try:
+                    position.set_fen(tags.get('FEN', START_FEN))
+                except ValueError as e:
+                    print(f"Game {game}: skipped: {e}")
+                    continue
+                for ply, san in enumerate(moves, 1):
+                    try:
+                        move = parse_san(position, san)
+                    except ValueError as e:
+                        print(f"Game {game}: stopping at ply {ply}: {e}")
+                        break
+                    yield f"{game}:{ply}", position.fen(), move_to_uci(move)
+                    position.make(move)
+                else:
+                    # The final position, with nothing played from it
+                    yield f"{game}:{len(moves) + 1}", position.fen(), None
+        else:
+            for line_number, line in enumerate(f, 1):
+                fen = line.strip()
+                if fen and not fen.startswith('#'):
+                    yield str(line_number), fen, None
+
+
+def _init_worker():
+    """Set up the search a worker keeps for its whole life"""
+    global _searcher
+    position = Position()
+    _searcher = ChessSearch(position, side_to_move_evaluator(position, PawnHashTable()),
+                            TranspositionTable(), get_default_tablebase())
+    _searcher.configure(null_move_pruning=True, late_move_reductions=True,
+                        principal_variation_search=True)
+
+
+def _analyse(task):
+    """Worker side: score one position
+
+    Args:
+        task: (id, FEN, played move, depth, node limit)
+
+    Returns:
+        dict: Output record, with only the error filled in for a malformed FEN
+    """
+    position_id, fen, played, depth, node_limit = task
+    searcher = _searcher
+    try:
+        searcher.position.set_fen(fen)
+    except ValueError as e:
+        # Written like any other record, so a resumed run skips the line too
+        return {'id': position_id, 'fen': fen, 'played': played, 'best': None, 'score': None,
+                'depth': None, 'nodes': None, 'error': str(e)}
+    move, score = searcher.search(depth, node_limit=node_limit)
+    if searcher.position.side == BLACK:
+        score = -score
+    return {
+        'id': position_id,
+        'fen': fen,
+        'played': played,
+        'best': move_to_uci(move) if move != NO_MOVE else None,
+        'score': round(score, 3),
+        'depth': searcher.completed_depth,
+        'nodes': searcher.nodes,
+        'error': None
+    }
+
+
+def _prepare_output(path, csv_output):
+    """Ids already written to an earlier run's output
+
+    A line cut short by an interruption is removed so new records start
+    on a fresh line.
+    """
+    if not os.path.exists(path):
+        return set()
+    with open(path, 'rb+') as f:
+        data = f.read()
+        end = data.rfind(b'\n') + 1
+        if end != len(data):
+            f.truncate(end)
+    lines = data[:end].decode('utf-8').splitlines()
+    if csv_output:
+        return {row['id'] for row in csv.DictReader(lines)}
+    return {json.loads(line)['id'] for line in lines if line.strip()}
+
+
+def analyse_file(input_path, output_path, depth=DEFAULT_DEPTH, node_limit=None, workers=0):
+    """Score every position of the input and append the records to the output
+
+    Args:
+        input_path: PGN file, or a file with one FEN per line
+        output_path: .jsonl or .csv file; existing records are kept and skipped
+        depth: Search depth (the last finished iteration is used with a node limit)
+        node_limit: Main-search nodes per position, or None for a fixed depth
+        workers: Worker processes, 0 for one per CPU core
+
+    Returns:
+        dict: positions analysed, positions that could not be, positions skipped,
+              seconds and positions per second
+    """
+    workers = workers or os.cpu_count() or 1
+    csv_output = output_path.lower().endswith('.csv')
+    done = _prepare_output(output_path, csv_output)
+    tasks = ((position_id, fen, played, depth, node_limit)
+             for position_id, fen, played in iter_positions(input_path)
+             if position_id not in done)
+
+    pool = None
+    if workers > 1:
+        pool = multiprocessing.Pool(workers, initializer=_init_worker)
+        results = pool.imap_unordered(_analyse, tasks, chunksize=4)
+    else:
+        _init_worker()
+        results = map(_analyse, tasks)
+
+    analysed = 0
+    errors = 0
+    started = time.perf_counter()
+    new_file = not os.path.exists(output_path) or os.path.getsize(output_path) == 0
+    try:
+        with open(output_path, 'a', encoding='utf-8', newline='') as out:
+            writer = csv.DictWriter(out, fieldnames=FIELDS) if csv_output else None
+            if writer is not None and new_file:
+                writer.writeheader()
+            for record in results:
+                if writer is not None:
+                    writer.writerow(record)
+                else:
+                    out.write(json.dumps(record) + '\n')
+                # Keep what is done safe on disk in case the run is interrupted
+                out.flush()
+                analysed += 1
+                if record['error'] is not None:
+                    errors += 1
+                    print(f"Position {record['id']}: {record['error']}")
+                if analysed % REPORT_EVERY == 0:
+                    elapsed = time.perf_counter() - started
+                    print(f"{analysed} positions, {analysed / elapsed:.1f} positions/sec")
+    finally:
+        if pool is not None:
+            pool.terminate()
+            pool.join()
+
+    elapsed = time.perf_counter() - started
+    return {
+        'positions': analysed,
+        'errors': errors,
+        'skipped': len(done),
+        'seconds': round(elapsed, 2),
+        'positions_per_second': round(analysed / elapsed, 1) if elapsed > 0 else 0.0
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Score every position of PGN games or a FEN list')
+    parser.add_argument('input', type=str, help='PGN file, or a file with one FEN per line')
+    parser.add_argument('output', type=str, help='Output file (.jsonl or .csv), appended to')
+    parser.add_argument('--depth', type=int, default=None,
+                        help=f'Search depth (default {DEFAULT_DEPTH} without --nodes)')
+    parser.add_argument('--nodes', type=int, default=None, help='Node budget per position')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='Worker processes, 0 for one per CPU core')
+    args = parser.parse_args()
+
+    # A node budget alone lets iterative deepening go as deep as the budget allows
+    depth = args.depth or (MAX_PLY - 1 if args.nodes else DEFAULT_DEPTH)
+    summary = analyse_file(args.input, args.output, depth, args.nodes, args.workers)
+    print(f"Analysed {summary['positions']} positions ({summary['errors']} malformed, "
+          f"{summary['skipped']} already done) in {summary['seconds']}s, {summary['positions_per_second']} positions/sec")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,1002 @@
+"""
+Bitboard position representation for the Chess engine
+
+Squares are numbered 0-63 in the same order as ``Chess.board``:
+square ``row * 8 + col`` where row 0 is black's back rank (rank 8) and
+row 7 is white's back rank (rank 1). A bitboard is a Python int whose
+bit ``sq`` is set when the square is occupied.
+
+Moves are packed into 16-bit ints::
+
+    bits 0-5    from square
+    bits 6-11   to square
+    bits 12-15  flags (QUIET, DOUBLE_PUSH, castling, CAPTURE, EP_CAPTURE,
+                PROMOTION | piece offset, optionally | CAPTURE)
+
+Sliding attacks use a per-square lookup keyed by the occupancy masked to
+the squares that can block the piece (the same relevant-occupancy masks a
+magic bitboard or PEXT lookup uses), so a rook or bishop attack set is one
+AND and one table lookup.
+"""
+from array import array
+
+from transposition import ZobristKeys
+from chess_eval import PST, evaluate_squares
+
+# Colours and piece types
+WHITE, BLACK = 0, 1
+PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING = range(6)
+NO_PIECE = -1
+PIECE_TYPES = 'PNBRQK'
+PIECE_SYMBOLS = 'PNBRQKpnbrqk'  # Index is color * 6 + piece type
+
+# Move flags
+QUIET = 0
+DOUBLE_PUSH = 1
+KING_CASTLE = 2
+QUEEN_CASTLE = 3
+CAPTURE = 4
+EP_CAPTURE = 5
+PROMOTION = 8  # PROMOTION | (piece - KNIGHT), plus CAPTURE for capture-promotions
+NULL_MOVE = 0  # Never a real move: a8 to a8
+
+# Castling rights bits
+CASTLE_WK = 1
+CASTLE_WQ = 2
+CASTLE_BK = 4
+CASTLE_BQ = 8
+
+# Piece values for static exchange evaluation, in pawns
+SEE_VALUES = (1, 3, 3, 5, 9, 100)
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+FULL = (1 << 64) - 1
+FILE_A = 0x0101010101010101
+FILE_H = FILE_A << 7
+NOT_FILE_A = FULL ^ FILE_A
+NOT_FILE_H = FULL ^ FILE_H
+ROW_MASKS = [0xFF << (8 * row) for row in range(8)]
+
+SQUARE_NAMES = [f + r for r in '87654321' for f in 'abcdefgh']
+
+# Castling rights that survive a move touching each square
+CASTLE_MASK = [15] * 64
+CASTLE_MASK[60] = 15 ^ (CASTLE_WK | CASTLE_WQ)  # e1
+CASTLE_MASK[63] = 15 ^ CASTLE_WK                # h1
+CASTLE_MASK[56] = 15 ^ CASTLE_WQ                # a1
+CASTLE_MASK[4] = 15 ^ (CASTLE_BK | CASTLE_BQ)   # e8
+CASTLE_MASK[7] = 15 ^ CASTLE_BK                 # h8
+CASTLE_MASK[0] = 15 ^ CASTLE_BQ                 # a8
+
+# Zobrist keys: 12 pieces x 64 squares, then 16 castling states and 8 en-passant files
+ZOBRIST = ZobristKeys(12, 64, num_extra=24)
+PIECE_KEYS = ZOBRIST.pieces  # Index is piece * 64 + square
+CASTLING_KEYS = ZOBRIST.extra[:16]
+EP_KEYS = ZOBRIST.extra[16:]
+SIDE_KEY = ZOBRIST.side
+
+ROOK_DIRECTIONS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+BISHOP_DIRECTIONS = ((-1, -1), (-1, 1), (1, -1), (1, 1))
+
+
+def encode_move(from_sq, to_sq, flag=QUIET):
+    """Pack a move into a 16-bit int"""
+    return from_sq | (to_sq << 6) | (flag << 12)
+
+
+def move_from(move):
+    """From square of a packed move"""
+    return move & 63
+
+
+def move_to(move):
+    """To square of a packed move"""
+    return (move >> 6) & 63
+
+
+def move_flag(move):
+    """Flags of a packed move"""
+    return move >> 12
+
+
+def move_promotion(move):
+    """Promotion piece type of a packed move, or None"""
+    if move & 0x8000:
+        return KNIGHT + ((move >> 12) & 3)
+    return None
+
+
+def move_to_uci(move):
+    """Long algebraic notation of a packed move, e.g. 'e2e4' or 'e7e8q'"""
+    text = SQUARE_NAMES[move & 63] + SQUARE_NAMES[(move >> 6) & 63]
+    promotion = move_promotion(move)
+    if promotion is not None:
+        text += PIECE_TYPES[promotion].lower()
+    return text
+
+
+def popcount(bb):
+    """Number of set bits in a bitboard"""
+    return bin(bb).count('1')
+
+
+def _ray_squares(sq, dr, dc):
+    """Squares from sq (exclusive) to the board edge in one direction"""
+    row, col = divmod(sq, 8)
+    squares = []
+    row += dr
+    col += dc
+    while 0 <= row < 8 and 0 <= col < 8:
+        squares.append(row * 8 + col)
+        row += dr
+        col += dc
+    return squares
+
+
+def _step_attacks(deltas):
+    """Attack table for a leaper (knight or king)"""
+    table = []
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        attacks = 0
+        for dr, dc in deltas:
+            r, c = row + dr, col + dc
+            if 0 <= r < 8 and 0 <= c < 8:
+                attacks |= 1 << (r * 8 + c)
+        table.append(attacks)
+    return table
+
+
+def _slider_tables(directions):
+    """Relevant-occupancy masks and attack lookups for a slider
+
+    Each ray is solved on its own for every subset of its blockers, then
+    the per-square table is filled by enumerating every subset of the
+    full mask and combining the ray answers.
+    """
+    masks = [0] * 64
+    tables = [None] * 64
+    for sq in range(64):
+        rays = []
+        mask = 0
+        for dr, dc in directions:
+            squares = _ray_squares(sq, dr, dc)
+            # The last square on a ray never blocks anything beyond it
+            ray_mask = 0
+            for s in squares[:-1]:
+                ray_mask |= 1 << s
+            lookup = {}
+            subset = 0
+            while True:
+                attacks = 0
+                for s in squares:
+                    attacks |= 1 << s
+                    if subset >> s & 1:
+                        break
+                lookup[subset] = attacks
+                subset = (subset - ray_mask) & ray_mask
+                if subset == 0:
+                    break
+            rays.append((ray_mask, lookup))
+            mask |= ray_mask
+
+        (m0, l0), (m1, l1), (m2, l2), (m3, l3) = rays
+        table = {}
+        subset = 0
+        while True:
+            table[subset] = l0[subset & m0] | l1[subset & m1] | l2[subset & m2] | l3[subset & m3]
+            subset = (subset - mask) & mask
+            if subset == 0:
+                break
+        masks[sq] = mask
+        tables[sq] = table
+    return masks, tables
+
+
+KNIGHT_ATTACKS = _step_attacks(((2, 1), (2, -1), (-2, 1), (-2, -1), (1, 2), (1, -2), (-1, 2), (-1, -2)))
+KING_ATTACKS = _step_attacks(((-1, -1), (-1, 0), (-1, 1), (0, -1), (0, 1), (1, -1), (1, 0), (1, 1)))
+# PAWN_ATTACKS[color][sq]: squares a pawn of that colour on sq attacks
+PAWN_ATTACKS = [_step_attacks(((-1, -1), (-1, 1))), _step_attacks(((1, -1), (1, 1)))]
+ROOK_MASKS, ROOK_TABLES = _slider_tables(ROOK_DIRECTIONS)
+BISHOP_MASKS, BISHOP_TABLES = _slider_tables(BISHOP_DIRECTIONS)
+
+
+def _between_table():
+    """BETWEEN[a * 64 + b]: squares strictly between two aligned squares, else 0"""
+    table = [0] * 4096
+    for sq in range(64):
+        for dr, dc in ROOK_DIRECTIONS + BISHOP_DIRECTIONS:
+            ray = 0
+            for s in _ray_squares(sq, dr, dc):
+                table[sq * 64 + s] = ray
+                ray |= 1 << s
+    return table
+
+
+BETWEEN = _between_table()
+
+
+def rook_attacks(sq, occupied):
+    """Rook attack set from sq for the given occupancy"""
+    return ROOK_TABLES[sq][occupied & ROOK_MASKS[sq]]
+
+
+def bishop_attacks(sq, occupied):
+    """Bishop attack set from sq for the given occupancy"""
+    return BISHOP_TABLES[sq][occupied & BISHOP_MASKS[sq]]
+
+
+class Position:
+    """
+    Chess position stored as twelve piece bitboards plus a mailbox
+
+    ``bb[color * 6 + piece_type]`` holds one bitboard per piece kind,
+    ``occ[color]`` the union per colour and ``squares[sq]`` the piece
+    index on every square (NO_PIECE when empty). make() and unmake()
+    update all three in place and keep an undo stack in ``history``,
+    along with the Zobrist ``key``, the pawn-only Zobrist ``pawn_key`` and
+    the material + piece-square ``score`` from white's point of view (see
+    chess_eval). An attached ``accumulator`` (see chess_nnue) is told about
+    every move and take-back as well.
+    """
+    def __init__(self, fen=START_FEN):
+        """Create a position from a FEN string (the initial position by default)"""
+        self.accumulator = None
+        self.set_fen(fen)
+
+    def set_fen(self, fen):
+        """Load a position from Forsyth-Edwards Notation
+
+        Raises:
+            ValueError: When the FEN is malformed; the position is left unchanged
+        """
+        fields = fen.split()
+        placement = fields[0] if fields else ''
+        ranks = placement.split('/')
+        if (len(ranks) != 8 or
+                any(not char.isdigit() and char not in PIECE_SYMBOLS for char in placement.replace('/', '')) or
+                any(sum(int(char) if char.isdigit() else 1 for char in rank) != 8 for rank in ranks) or
+                placement.count('K') != 1 or placement.count('k') != 1 or
+                (len(fields) > 1 and fields[1] not in ('w', 'b')) or
+                (len(fields) > 3 and fields[3] != '-' and fields[3] not in SQUARE_NAMES) or
+                any(not field.isdigit() for field in fields[4:6])):
+            raise ValueError(f"Invalid FEN: {fen!r}")
+        self.start_fen = fen  # history holds the moves played since this position
+        self.bb = [0] * 12
+        self.occ = [0, 0]
+        self.squares = [NO_PIECE] * 64
+
+        sq = 0
+        for char in placement:
+            if char == '/':
+                continue
+            if char.isdigit():
+                sq += int(char)
+                continue
+            piece = PIECE_SYMBOLS.index(char)
+            self._put(piece, sq)
+            sq += 1
+
+        self.side = WHITE if len(fields) < 2 or fields[1] == 'w' else BLACK
+
+        self.castling = 0
+        rights = fields[2] if len(fields) > 2 else '-'
+        for char, bit in (('K', CASTLE_WK), ('Q', CASTLE_WQ), ('k', CASTLE_BK), ('q', CASTLE_BQ)):
+            if char in rights:
+                self.castling |= bit
+
+        ep = fields[3] if len(fields) > 3 else '-'
+        self.ep = SQUARE_NAMES.index(ep) if ep != '-' else -1
+        self.halfmove = int(fields[4]) if len(fields) > 4 else 0
+        self.fullmove = int(fields[5]) if len(fields) > 5 else 1
+        self.history = []
+        self.key = self.compute_key()
+        self.pawn_key = self.compute_pawn_key()
+        self.score = self.compute_score()
+        if self.accumulator is not None:
+            self.accumulator.refresh()
+
+    def compute_key(self):
+        """Zobrist key of the position computed from scratch
+
+        The en-passant file only counts when a pawn can actually capture,
+        so positions that differ only by a useless ep square hash alike.
+        """
+        key = ZOBRIST.hash((piece, sq) for sq, piece in enumerate(self.squares)
+                           if piece != NO_PIECE)
+        key ^= CASTLING_KEYS[self.castling]
+        if self._ep_capturable():
+            key ^= EP_KEYS[self.ep & 7]
+        if self.side == BLACK:
+            key ^= SIDE_KEY
+        return key
+
+    def compute_pawn_key(self):
+        """Zobrist key of the pawns alone, computed from scratch"""
+        return ZOBRIST.hash((piece, sq) for sq, piece in enumerate(self.squares)
+                            if piece == PAWN or piece == 6 + PAWN)
+
+    def compute_score(self):
+        """Material + piece-square score from white's point of view, computed from scratch"""
+        return evaluate_squares(self.squares)
+
+    def _ep_capturable(self):
+        """True if the side to move has a pawn that can capture en passant"""
+        return (self.ep >= 0 and
+                bool(PAWN_ATTACKS[self.side ^ 1][self.ep] & self.bb[self.side * 6 + PAWN]))
+
+    def fen(self):
+        """Return the position in Forsyth-Edwards Notation"""
+        rows = []
+        for row in range(8):
+            text = ''
+            empty = 0
+            for col in range(8):
+                piece = self.squares[row * 8 + col]
+                if piece == NO_PIECE:
+                    empty += 1
+                    continue
+                if empty:
+                    text += str(empty)
+                    empty = 0
+                text += PIECE_SYMBOLS[piece]
+            if empty:
+                text += str(empty)
+            rows.append(text)
+
+        rights = ''
+        for char, bit in (('K', CASTLE_WK), ('Q', CASTLE_WQ), ('k', CASTLE_BK), ('q', CASTLE_BQ)):
+            if self.castling & bit:
+                rights += char
+
+        return ' '.join([
+            '/'.join(rows),
+            'w' if self.side == WHITE else 'b',
+            rights or '-',
+            SQUARE_NAMES[self.ep] if self.ep >= 0 else '-',
+            str(self.halfmove),
+            str(self.fullmove),
+        ])
+
+    def _put(self, piece, sq):
+        """Place a piece on an empty square (set-up only)"""
+        bit = 1 << sq
+        self.bb[piece] |= bit
+        self.occ[piece // 6] |= bit
+        self.squares[sq] = piece
+
+    def king_square(self, color):
+        """Square of the king of the given colour"""
+        return self.bb[color * 6 + KING].bit_length() - 1
+
+    def is_attacked(self, sq, by_color, occupied=None):
+        """Check if a square is attacked by any piece of by_color"""
+        bb = self.bb
+        base = by_color * 6
+        if PAWN_ATTACKS[by_color ^ 1][sq] & bb[base]:
+            return True
+        if KNIGHT_ATTACKS[sq] & bb[base + KNIGHT]:
+            return True
+        if KING_ATTACKS[sq] & bb[base + KING]:
+            return True
+        if occupied is None:
+            occupied = self.occ[0] | self.occ[1]
+        queens = bb[base + QUEEN]
+        if BISHOP_TABLES[sq][occupied & BISHOP_MASKS[sq]] & (bb[base + BISHOP] | queens):
+            return True
+        if ROOK_TABLES[sq][occupied & ROOK_MASKS[sq]] & (bb[base + ROOK] | queens):
+            return True
+        return False
+
+    def in_check(self):
+        """True if the side to move is in check"""
+        return self.is_attacked(self.king_square(self.side), self.side ^ 1)
+
+    def attackers_to(self, sq, occupied):
+        """Pieces of both colours that attack sq, with sliders seeing through
+        squares missing from occupied"""
+        bb = self.bb
+        queens = bb[QUEEN] | bb[6 + QUEEN]
+        return ((PAWN_ATTACKS[BLACK][sq] & bb[PAWN]) |
+                (PAWN_ATTACKS[WHITE][sq] & bb[6 + PAWN]) |
+                (KNIGHT_ATTACKS[sq] & (bb[KNIGHT] | bb[6 + KNIGHT])) |
+                (KING_ATTACKS[sq] & (bb[KING] | bb[6 + KING])) |
+                (BISHOP_TABLES[sq][occupied & BISHOP_MASKS[sq]] & (bb[BISHOP] | bb[6 + BISHOP] | queens)) |
+                (ROOK_TABLES[sq][occupied & ROOK_MASKS[sq]] & (bb[ROOK] | bb[6 + ROOK] | queens)))
+
+    def see(self, move):
+        """Static exchange evaluation of a capture
+
+        Plays out every capture on the target square, always with the least
+        valuable attacker and letting either side stop when recapturing
+        would lose, and returns the material balance for the mover in
+        pawns. Pins are ignored.
+        """
+        fr = move & 63
+        to = (move >> 6) & 63
+        bb = self.bb
+        occ = self.occ
+        occupied = (occ[0] | occ[1]) ^ (1 << fr)
+        attacker = self.squares[fr]
+
+        if move >> 12 == EP_CAPTURE:
+            gain = [SEE_VALUES[PAWN]]
+            occupied ^= 1 << (to + (8 if attacker < 6 else -8))
+        else:
+            victim = self.squares[to]
+            gain = [SEE_VALUES[victim % 6] if victim != NO_PIECE else 0]
+        on_square = SEE_VALUES[attacker % 6]
+        if move & 0x8000:
+            promoted = SEE_VALUES[KNIGHT + ((move >> 12) & 3)]
+            gain[0] += promoted - SEE_VALUES[PAWN]
+            on_square = promoted
+
+        side = (attacker // 6) ^ 1
+        attackers = self.attackers_to(to, occupied) & occupied
+        while True:
+            own = attackers & occ[side]
+            if not own:
+                break
+            for piece_type in (PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING):
+                candidates = own & bb[side * 6 + piece_type]
+                if candidates:
+                    break
+            if piece_type == KING and attackers & occ[side ^ 1]:
+                break  # The king may not recapture into a defended square
+            gain.append(on_square - gain[-1])
+            on_square = SEE_VALUES[piece_type]
+            occupied ^= candidates & -candidates
+            # Removing the piece may uncover a slider behind it
+            attackers = self.attackers_to(to, occupied) & occupied
+            side ^= 1
+
+        while len(gain) > 1:
+            last = gain.pop()
+            gain[-1] = -max(-gain[-1], last)
+        return gain[0]
+
+    def _castling_moves(self, push, occupied):
+        """Append castling moves; the king may not start in, pass or land on an attacked square"""
+        castling = self.castling
+        if self.side == WHITE:
+            if not castling & (CASTLE_WK | CASTLE_WQ):
+                return
+            if (castling & CASTLE_WK and not occupied & 0x6000000000000000 and
+                    not self.is_attacked(60, BLACK) and not self.is_attacked(61, BLACK) and
+                    not self.is_attacked(62, BLACK)):
+                push(60 | (62 << 6) | (KING_CASTLE << 12))
+            if (castling & CASTLE_WQ and not occupied & 0x0E00000000000000 and
+                    not self.is_attacked(60, BLACK) and not self.is_attacked(59, BLACK) and
+                    not self.is_attacked(58, BLACK)):
+                push(60 | (58 << 6) | (QUEEN_CASTLE << 12))
+        else:
+            if not castling & (CASTLE_BK | CASTLE_BQ):
+                return
+            if (castling & CASTLE_BK and not occupied & 0x60 and
+                    not self.is_attacked(4, WHITE) and not self.is_attacked(5, WHITE) and
+                    not self.is_attacked(6, WHITE)):
+                push(4 | (6 << 6) | (KING_CASTLE << 12))
+            if (castling & CASTLE_BQ and not occupied & 0x0E and
+                    not self.is_attacked(4, WHITE) and not self.is_attacked(3, WHITE) and
+                    not self.is_attacked(2, WHITE)):
+                push(4 | (2 << 6) | (QUEEN_CASTLE << 12))
+
+    def legal_moves(self, captures_only=False):
+        """Generate every legal move for the side to move
+
+        Checkers, pinned pieces and their pin rays are found once for the
+        position; every other move is then kept or dropped with mask tests.
+        Only king moves and en passant need an attack query.
+
+        Args:
+            captures_only: Only generate captures and promotions (for quiescence search)
+
+        Returns:
+            array: Packed 16-bit moves
+        """
+        moves = array('H')
+        push = moves.append
+        bb = self.bb
+        side = self.side
+        them = side ^ 1
+        base = side * 6
+        ebase = them * 6
+        own = self.occ[side]
+        enemy = self.occ[them]
+        occupied = own | enemy
+        not_own = FULL ^ own
+        allowed = enemy if captures_only else not_own
+        king = bb[base + KING].bit_length() - 1
+        king_bit = 1 << king
+        enemy_queens = bb[ebase + QUEEN]
+        enemy_diagonal = bb[ebase + BISHOP] | enemy_queens
+        enemy_straight = bb[ebase + ROOK] | enemy_queens
+
+        checkers = ((PAWN_ATTACKS[side][king] & bb[ebase + PAWN]) |
+                    (KNIGHT_ATTACKS[king] & bb[ebase + KNIGHT]) |
+                    (BISHOP_TABLES[king][occupied & BISHOP_MASKS[king]] & enemy_diagonal) |
+                    (ROOK_TABLES[king][occupied & ROOK_MASKS[king]] & enemy_straight))
+
+        # King moves: test each target with the king lifted off the board so
+        # it cannot hide behind itself from a slider
+        targets = KING_ATTACKS[king] & allowed
+        without_king = occupied ^ king_bit
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            to = bit.bit_length() - 1
+            if not self.is_attacked(to, them, without_king):
+                push(king | (to << 6) | (0x4000 if bit & enemy else 0))
+
+        if checkers & (checkers - 1):
+            return moves  # Double check: only the king may move
+
+        if checkers:
+            check_mask = BETWEEN[king * 64 + checkers.bit_length() - 1] | checkers
+        else:
+            check_mask = FULL
+            if not captures_only:
+                self._castling_moves(push, occupied)
+
+        # Pins: sliders that see the king through exactly one of our pieces
+        pinned = 0
+        pin_rays = None
+        snipers = ((BISHOP_TABLES[king][enemy & BISHOP_MASKS[king]] & enemy_diagonal) |
+                   (ROOK_TABLES[king][enemy & ROOK_MASKS[king]] & enemy_straight))
+        while snipers:
+            bit = snipers & -snipers
+            snipers ^= bit
+            ray = BETWEEN[king * 64 + bit.bit_length() - 1]
+            blockers = ray & occupied
+            if blockers and not blockers & (blockers - 1):
+                pinned |= blockers
+                if pin_rays is None:
+                    pin_rays = {}
+                pin_rays[blockers.bit_length() - 1] = ray | bit
+
+        # Pawns: free pawns set-wise, pinned pawns one by one along their ray
+        pawns = bb[base + PAWN]
+        empty = FULL ^ occupied
+        self._pawn_moves(push, pawns & ~pinned, check_mask, empty, enemy, captures_only)
+        pinned_pawns = pawns & pinned
+        while pinned_pawns:
+            bit = pinned_pawns & -pinned_pawns
+            pinned_pawns ^= bit
+            self._pawn_moves(push, bit, check_mask & pin_rays[bit.bit_length() - 1], empty, enemy,
+                             captures_only)
+
+        if self.ep >= 0:
+            # En passant removes two pawns from one rank, which masks cannot
+            # describe, so try it on the board
+            attackers = PAWN_ATTACKS[them][self.ep] & pawns
+            while attackers:
+                bit = attackers & -attackers
+                attackers ^= bit
+                move = (bit.bit_length() - 1) | (self.ep << 6) | (EP_CAPTURE << 12)
+                self.make(move)
+                if not self.is_attacked(king, them):
+                    push(move)
+                self.unmake()
+
+        # Knights, bishops, rooks and queens; a pinned knight can never move
+        movable = allowed & check_mask
+        for piece_type in (KNIGHT, BISHOP, ROOK, QUEEN):
+            pieces = bb[base + piece_type]
+            if piece_type == KNIGHT:
+                pieces &= ~pinned
+            while pieces:
+                bit = pieces & -pieces
+                fr = bit.bit_length() - 1
+                pieces ^= bit
+                if piece_type == KNIGHT:
+                    targets = KNIGHT_ATTACKS[fr]
+                elif piece_type == BISHOP:
+                    targets = BISHOP_TABLES[fr][occupied & BISHOP_MASKS[fr]]
+                elif piece_type == ROOK:
+                    targets = ROOK_TABLES[fr][occupied & ROOK_MASKS[fr]]
+                else:
+                    targets = (BISHOP_TABLES[fr][occupied & BISHOP_MASKS[fr]] |
+                               ROOK_TABLES[fr][occupied & ROOK_MASKS[fr]])
+                targets &= movable
+                if bit & pinned:
+                    targets &= pin_rays[fr]
+                captures = targets & enemy
+                targets ^= captures
+                while captures:
+                    bit = captures & -captures
+                    captures ^= bit
+                    push(fr | ((bit.bit_length() - 1) << 6) | 0x4000)
+                while targets:
+                    bit = targets & -targets
+                    targets ^= bit
+                    push(fr | ((bit.bit_length() - 1) << 6))
+
+        return moves
+
+    def has_legal_move(self):
+        """True if the side to move has any legal move
+
+        Same masks as legal_moves, but it stops at the first move found and
+        never builds a move list. Castling needs no test: when it is legal,
+        so is the king's step towards the rook.
+        """
+        bb = self.bb
+        side = self.side
+        them = side ^ 1
+        base = side * 6
+        ebase = them * 6
+        own = self.occ[side]
+        enemy = self.occ[them]
+        occupied = own | enemy
+        king = bb[base + KING].bit_length() - 1
+        enemy_queens = bb[ebase + QUEEN]
+        enemy_diagonal = bb[ebase + BISHOP] | enemy_queens
+        enemy_straight = bb[ebase + ROOK] | enemy_queens
+
+        targets = KING_ATTACKS[king] & ~own
+        without_king = occupied ^ (1 << king)
+        while targets:
+            bit = targets & -targets
+            targets ^= bit
+            if not self.is_attacked(bit.bit_length() - 1, them, without_king):
+                return True
+
+        checkers = ((PAWN_ATTACKS[side][king] & bb[ebase + PAWN]) |
+                    (KNIGHT_ATTACKS[king] & bb[ebase + KNIGHT]) |
+                    (BISHOP_TABLES[king][occupied & BISHOP_MASKS[king]] & enemy_diagonal) |
+                    (ROOK_TABLES[king][occupied & ROOK_MASKS[king]] & enemy_straight))
+        if checkers & (checkers - 1):
+            return False
+        check_mask = BETWEEN[king * 64 + checkers.bit_length() - 1] | checkers if checkers else FULL
+
+        pinned = 0
+        pin_rays = {}
+        snipers = ((BISHOP_TABLES[king][enemy & BISHOP_MASKS[king]] & enemy_diagonal) |
+                   (ROOK_TABLES[king][enemy & ROOK_MASKS[king]] & enemy_straight))
+        while snipers:
+            bit = snipers & -snipers
+            snipers ^= bit
+            ray = BETWEEN[king * 64 + bit.bit_length() - 1]
+            blockers = ray & occupied
+            if blockers and not blockers & (blockers - 1):
+                pinned |= blockers
+                pin_rays[blockers.bit_length() - 1] = ray | bit
+
+        movable = ~own & check_mask
+        for piece_type in (QUEEN, ROOK, BISHOP, KNIGHT):
+            pieces = bb[base + piece_type]
+            while pieces:
+                bit = pieces & -pieces
+                fr = bit.bit_length() - 1
+                pieces ^= bit
+                if piece_type == KNIGHT:
+                    if bit & pinned:
+                        continue
+                    targets = KNIGHT_ATTACKS[fr]
+                elif piece_type == BISHOP:
+                    targets = BISHOP_TABLES[fr][occupied & BISHOP_MASKS[fr]]
+                elif piece_type == ROOK:
+                    targets = ROOK_TABLES[fr][occupied & ROOK_MASKS[fr]]
+                else:
+                    targets = (BISHOP_TABLES[fr][occupied & BISHOP_MASKS[fr]] |
+                               ROOK_TABLES[fr][occupied & ROOK_MASKS[fr]])
+                targets &= movable
+                if bit & pinned:
+                    targets &= pin_rays[fr]
+                if targets:
+                    return True
+
+        pawns = bb[base + PAWN]
+        empty = FULL ^ occupied
+        if self._pawn_targets(pawns & ~pinned, check_mask, empty, enemy):
+            return True
+        pinned_pawns = pawns & pinned
+        while pinned_pawns:
+            bit = pinned_pawns & -pinned_pawns
+            pinned_pawns ^= bit
+            if self._pawn_targets(bit, check_mask & pin_rays[bit.bit_length() - 1], empty, enemy):
+                return True
+
+        if self.ep >= 0:
+            attackers = PAWN_ATTACKS[them][self.ep] & pawns
+            while attackers:
+                bit = attackers & -attackers
+                attackers ^= bit
+                self.make((bit.bit_length() - 1) | (self.ep << 6) | (EP_CAPTURE << 12))
+                legal = not self.is_attacked(king, them)
+                self.unmake()
+                if legal:
+                    return True
+        return False
+
+    def _pawn_targets(self, pawns, mask, empty, enemy):
+        """Squares in mask the given pawns can push or capture to (no en passant)"""
+        if self.side == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & ROW_MASKS[5]) >> 8) & empty
+            captures = ((pawns & NOT_FILE_A) >> 9 | (pawns & NOT_FILE_H) >> 7) & enemy
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & ROW_MASKS[2]) << 8) & empty
+            captures = ((pawns & NOT_FILE_A) << 7 | (pawns & NOT_FILE_H) << 9) & enemy
+        return (single | double | captures) & mask
+
+    def is_repetition(self, count=1):
+        """True if the position occurred count times before since the last
+        capture or pawn move
+
+        Only positions with the same side to move can repeat, so the hash
+        history is checked every second ply, going back no further than the
+        halfmove clock allows. Use count=1 inside the search and count=2 for
+        the threefold repetition rule.
+        """
+        history = self.history
+        key = self.key
+        seen = 0
+        for back in range(4, min(self.halfmove, len(history)) + 1, 2):
+            if history[-back][5] == key:
+                seen += 1
+                if seen >= count:
+                    return True
+        return False
+
+    def _pawn_moves(self, push, pawns, mask, empty, enemy, captures_only=False):
+        """Append pushes, double pushes, captures and promotions of the given
+        pawns whose target square lies in mask (en passant is handled apart)"""
+        if self.side == WHITE:
+            single = (pawns >> 8) & empty
+            double = ((single & ROW_MASKS[5]) >> 8) & empty & mask
+            left = ((pawns & NOT_FILE_A) >> 9) & enemy & mask
+            right = ((pawns & NOT_FILE_H) >> 7) & enemy & mask
+            push_delta, left_delta, right_delta = 8, 9, 7
+            promotion_row = ROW_MASKS[0]
+        else:
+            single = (pawns << 8) & empty
+            double = ((single & ROW_MASKS[2]) << 8) & empty & mask
+            left = ((pawns & NOT_FILE_A) << 7) & enemy & mask
+            right = ((pawns & NOT_FILE_H) << 9) & enemy & mask
+            push_delta, left_delta, right_delta = -8, -7, -9
+            promotion_row = ROW_MASKS[7]
+        single &= mask
+        if captures_only:
+            single &= promotion_row
+            double = 0
+
+        for targets, delta, flag in ((single, push_delta, QUIET),
+                                     (left, left_delta, CAPTURE),
+                                     (right, right_delta, CAPTURE)):
+            promotions = targets & promotion_row
+            targets ^= promotions
+            while targets:
+                bit = targets & -targets
+                to = bit.bit_length() - 1
+                targets ^= bit
+                push((to + delta) | (to << 6) | (flag << 12))
+            while promotions:
+                bit = promotions & -promotions
+                to = bit.bit_length() - 1
+                promotions ^= bit
+                move = (to + delta) | (to << 6) | ((flag | PROMOTION) << 12)
+                # Queen first, it is almost always the best choice
+                push(move | 0x3000)
+                push(move | 0x2000)
+                push(move | 0x1000)
+                push(move)
+
+        while double:
+            bit = double & -double
+            to = bit.bit_length() - 1
+            double ^= bit
+            push((to + 2 * push_delta) | (to << 6) | (DOUBLE_PUSH << 12))
+
+    def find_move(self, from_sq, to_sq, promotion=QUEEN):
+        """Return the legal packed move matching the squares, or None"""
+        for move in self.legal_moves():
+            if move & 63 == from_sq and (move >> 6) & 63 == to_sq:
+                piece = move_promotion(move)
+                if piece is None or piece == promotion:
+                    return move
+        return None
+
+    def make(self, move):
+        """Play a packed move in place and push an undo record"""
+        fr = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 12
+        side = self.side
+        them = side ^ 1
+        bb = self.bb
+        occ = self.occ
+        squares = self.squares
+
+        piece = squares[fr]
+        from_bit = 1 << fr
+        to_bit = 1 << to
+        if flag == EP_CAPTURE:
+            cap_sq = to + 8 if side == WHITE else to - 8
+            captured = squares[cap_sq]
+        else:
+            captured = squares[to]
+        key = self.key
+        score = self.score
+        pawn_key = self.pawn_key
+        self.history.append((move, captured, self.castling, self.ep, self.halfmove, key, score,
+                             pawn_key))
+
+        # Remove the old en-passant and castling state from the key
+        if self.ep >= 0 and PAWN_ATTACKS[them][self.ep] & bb[side * 6]:
+            key ^= EP_KEYS[self.ep & 7]
+        key ^= CASTLING_KEYS[self.castling]
+
+        if flag == EP_CAPTURE:
+            cap_bit = 1 << cap_sq
+            bb[captured] ^= cap_bit
+            occ[them] ^= cap_bit
+            squares[cap_sq] = NO_PIECE
+            key ^= PIECE_KEYS[captured * 64 + cap_sq]
+            score -= PST[captured * 64 + cap_sq]
+            pawn_key ^= PIECE_KEYS[captured * 64 + cap_sq]
+        elif captured != NO_PIECE:
+            bb[captured] ^= to_bit
+            occ[them] ^= to_bit
+            key ^= PIECE_KEYS[captured * 64 + to]
+            score -= PST[captured * 64 + to]
+            if captured % 6 == PAWN:
+                pawn_key ^= PIECE_KEYS[captured * 64 + to]
+
+        move_bits = from_bit | to_bit
+        bb[piece] ^= move_bits
+        occ[side] ^= move_bits
+        squares[fr] = NO_PIECE
+        squares[to] = piece
+        key ^= PIECE_KEYS[piece * 64 + fr]
+        score -= PST[piece * 64 + fr]
+        is_pawn = piece == side * 6
+        if is_pawn:
+            pawn_key ^= PIECE_KEYS[piece * 64 + fr]
+
+        if flag & PROMOTION:
+            promoted = side * 6 + KNIGHT + (flag & 3)
+            bb[piece] ^= to_bit
+            bb[promoted] ^= to_bit
+            squares[to] = promoted
+            key ^= PIECE_KEYS[promoted * 64 + to]
+            score += PST[promoted * 64 + to]
+        else:
+            key ^= PIECE_KEYS[piece * 64 + to]
+            score += PST[piece * 64 + to]
+            if is_pawn:
+                pawn_key ^= PIECE_KEYS[piece * 64 + to]
+            if flag == KING_CASTLE or flag == QUEEN_CASTLE:
+                if flag == KING_CASTLE:
+                    rook_from, rook_to = to + 1, to - 1
+                else:
+                    rook_from, rook_to = to - 2, to + 1
+                rook = squares[rook_from]
+                rook_bits = (1 << rook_from) | (1 << rook_to)
+                bb[rook] ^= rook_bits
+                occ[side] ^= rook_bits
+                squares[rook_from] = NO_PIECE
+                squares[rook_to] = rook
+                key ^= PIECE_KEYS[rook * 64 + rook_from] ^ PIECE_KEYS[rook * 64 + rook_to]
+                score += PST[rook * 64 + rook_to] - PST[rook * 64 + rook_from]
+
+        self.castling &= CASTLE_MASK[fr] & CASTLE_MASK[to]
+        key ^= CASTLING_KEYS[self.castling]
+        if flag == DOUBLE_PUSH:
+            self.ep = (fr + to) >> 1
+            if PAWN_ATTACKS[side][self.ep] & bb[them * 6]:
+                key ^= EP_KEYS[self.ep & 7]
+        else:
+            self.ep = -1
+        self.key = key ^ SIDE_KEY
+        self.score = score
+        self.pawn_key = pawn_key
+        if is_pawn or captured != NO_PIECE:
+            self.halfmove = 0
+        else:
+            self.halfmove += 1
+        if side == BLACK:
+            self.fullmove += 1
+        self.side = them
+        if self.accumulator is not None:
+            self.accumulator.push(move, piece, captured)
+
+    def make_null(self):
+        """Pass the move to the opponent (for null-move pruning)"""
+        key = self.key
+        self.history.append((NULL_MOVE, NO_PIECE, self.castling, self.ep, self.halfmove, key,
+                             self.score, self.pawn_key))
+        if self.ep >= 0 and PAWN_ATTACKS[self.side ^ 1][self.ep] & self.bb[self.side * 6]:
+            key ^= EP_KEYS[self.ep & 7]
+        self.ep = -1
+        self.key = key ^ SIDE_KEY
+        # Nothing before a null move can repeat a position after it
+        self.halfmove = 0
+        self.side ^= 1
+        if self.accumulator is not None:
+            self.accumulator.push(NULL_MOVE, NO_PIECE, NO_PIECE)
+
+    def unmake_null(self):
+        """Take back make_null()"""
+        (_, _, self.castling, self.ep, self.halfmove, self.key,
+         self.score, self.pawn_key) = self.history.pop()
+        self.side ^= 1
+        if self.accumulator is not None:
+            self.accumulator.pop()
+
+    def unmake(self):
+        """Take back the last move played with make()"""
+        (move, captured, self.castling, self.ep, self.halfmove, self.key,
+         self.score, self.pawn_key) = self.history.pop()
+        if self.accumulator is not None:
+            self.accumulator.pop()
+        fr = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 12
+        them = self.side
+        side = them ^ 1
+        self.side = side
+        if side == BLACK:
+            self.fullmove -= 1
+        bb = self.bb
+        occ = self.occ
+        squares = self.squares
+
+        from_bit = 1 << fr
+        to_bit = 1 << to
+        piece = squares[to]
+        if flag & PROMOTION:
+            bb[piece] ^= to_bit
+            piece = side * 6 + PAWN
+            bb[piece] ^= to_bit
+        elif flag == KING_CASTLE or flag == QUEEN_CASTLE:
+            if flag == KING_CASTLE:
+                rook_from, rook_to = to + 1, to - 1
+            else:
+                rook_from, rook_to = to - 2, to + 1
+            rook = squares[rook_to]
+            rook_bits = (1 << rook_from) | (1 << rook_to)
+            bb[rook] ^= rook_bits
+            occ[side] ^= rook_bits
+            squares[rook_to] = NO_PIECE
+            squares[rook_from] = rook
+
+        move_bits = from_bit | to_bit
+        bb[piece] ^= move_bits
+        occ[side] ^= move_bits
+        squares[fr] = piece
+        squares[to] = NO_PIECE
+
+        if flag == EP_CAPTURE:
+            cap_sq = to + 8 if side == WHITE else to - 8
+            cap_bit = 1 << cap_sq
+            bb[captured] ^= cap_bit
+            occ[them] ^= cap_bit
+            squares[cap_sq] = captured
+        elif captured != NO_PIECE:
+            bb[captured] ^= to_bit
+            occ[them] ^= to_bit
+            squares[to] = captured
+
+    # Game-state protocol of algorithm.mcts
+    play = make
+    undo = unmake
+
+    def terminal(self):
+        """True when the game is over: mate, stalemate, the fifty-move rule,
+        threefold repetition or too little material to mate"""
+        bb = self.bb
+        if (popcount(self.occ[WHITE] | self.occ[BLACK]) <= 3 and
+                not (bb[PAWN] | bb[ROOK] | bb[QUEEN] | bb[6 + PAWN] | bb[6 + ROOK] | bb[6 + QUEEN])):
+            return True  # Bare kings, or a lone minor piece
+        return self.halfmove >= 100 or self.is_repetition(2) or not self.has_legal_move()
+
+    def result(self):
+        """Outcome of a finished game for the side to move: -1 when mated, else 0"""
+        return -1 if self.in_check() and not self.has_legal_move() else 0
+
+    def hash(self):
+        """Zobrist key of the position"""
+        return self.key
@@ -0,0 +1,268 @@
+"""
+Opening book for the Chess engine
+
+A book file is a flat array of fixed-size little-endian records sorted by
+Zobrist key (then move)::
+
+    key     8 bytes  chess_bitboard.Position.key of the position
+    move    2 bytes  packed move played from it
+    weight  2 bytes  number of source games that played it
+
+The reader memory-maps the file and binary-searches it, so opening a book
+costs nothing at startup and every process using the same file shares one
+copy in the page cache. The keys come from the fixed-seed Zobrist table in
+chess_bitboard; a book has to be rebuilt if that table ever changes.
+
+Build a book from PGN games with:
+    python chess_book.py data/chess_openings.pgn data/chess_book.bin --max-plies 16
+"""
+import argparse
+import mmap
+import os
+import random
+import re
+import struct
+
+from chess_bitboard import (
+    Position, START_FEN, PIECE_TYPES, SQUARE_NAMES, PAWN, CAPTURE, KING_CASTLE,
+    QUEEN_CASTLE, move_promotion
+)
+
+RECORD = struct.Struct('<QHH')
+_KEY = struct.Struct('<Q')
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data')
+DEFAULT_BOOK_PATH = os.path.join(DATA_DIR, 'chess_book.bin')
+DEFAULT_MAX_PLIES = 16
+
+_RESULTS = ('1-0', '0-1', '1/2-1/2', '*')
+_SAN_PATTERN = re.compile(r'^([NBRQK])?([a-h])?([1-8])?x?([a-h][1-8])(?:=?([NBRQ]))?$')
+_TAG_PATTERN = re.compile(r'^\[(\w+)\s+"(.*)"\]$')
+
+
+def read_pgn_games(text):
+    """Split PGN text into games
+
+    Comments, variations and numeric annotations are dropped.
+
+    Returns:
+        list: (tags dict, list of SAN moves) per game
+    """
+    text = re.sub(r'\{[^}]*\}', ' ', text)
+    text = re.sub(r';[^\n]*', ' ', text)
+    # Remove variations from the inside out, they may be nested
+    while True:
+        stripped = re.sub(r'\([^()]*\)', ' ', text)
+        if stripped == text:
+            break
+        text = stripped
+
+    games = []
+    tags, moves = {}, []
+    for line in text.splitlines():
+        line = line.strip()
+        tag = _TAG_PATTERN.match(line)
+        if tag:
+            if moves:
+                # Tags after movetext start the next game
+                games.append((tags, moves))
+                tags, moves = {}, []
+            tags[tag.group(1)] = tag.group(2)
+            continue
+        for token in line.split():
+            token = re.sub(r'^\d+\.+', '', token)
+            if not token or token.startswith('$'):
+                continue
+            if token in _RESULTS:
+                games.append((tags, moves))
+                tags, moves = {}, []
+                continue
+            moves.append(token)
+    if moves:
+        games.append((tags, moves))
+    return games
+
+
+def iter_pgn_games(lines):
+    """Stream games from PGN lines (an open file, for instance) one at a time
+
+    Yields:
+        tuple: (tags dict, list of SAN moves) per game
+    """
+    chunk = []
+    has_moves = False
+    for line in lines:
+        text = line.strip()
+        if text.startswith('[') and has_moves:
+            yield from read_pgn_games('\n'.join(chunk))
+            chunk, has_moves = [], False
+        chunk.append(text)
+        if text and not text.startswith('['):
+            has_moves = True
+    if has_moves:
+        yield from read_pgn_games('\n'.join(chunk))
+
+
+def parse_san(position, san):
+    """Find the legal packed move written in Standard Algebraic Notation
+
+    Raises:
+        ValueError: When the text is not exactly one legal move
+    """
+    text = san.rstrip('+#!?')
+    moves = position.legal_moves()
+    if text in ('O-O', '0-0', 'O-O-O', '0-0-0'):
+        flag = KING_CASTLE if len(text) == 3 else QUEEN_CASTLE
+        for move in moves:
+            if move >> 12 == flag:
+                return move
+        raise ValueError(f"Illegal castling move: {san}")
+
+    match = _SAN_PATTERN.match(text)
+    if not match:
+        raise ValueError(f"Unreadable move: {san}")
+    piece, from_file, from_rank, target, promotion = match.groups()
+    piece_type = PIECE_TYPES.index(piece or 'P')
+    to_sq = SQUARE_NAMES.index(target)
+    if promotion is None and piece_type == PAWN and target[1] in '18':
+        promotion = 'Q'
+    promotion_type = PIECE_TYPES.index(promotion) if promotion else None
+    capture = 'x' in text
+
+    candidates = []
+    for move in moves:
+        fr = move & 63
+        if ((move >> 6) & 63 != to_sq or position.squares[fr] % 6 != piece_type or
+                move_promotion(move) != promotion_type or bool(move & CAPTURE << 12) != capture):
+            continue
+        if from_file and SQUARE_NAMES[fr][0] != from_file:
+            continue
+        if from_rank and SQUARE_NAMES[fr][1] != from_rank:
+            continue
+        candidates.append(move)
+    if len(candidates) != 1:
+        raise ValueError(f"{'Ambiguous' if candidates else 'Illegal'} move: {san}")
+    return candidates[0]
+
+
+def build_book(pgn_text, output_path, max_plies=DEFAULT_MAX_PLIES):
+    """Compile PGN games into a sorted book file
+
+    Every (position, move) pair within the first max_plies plies of a game
+    becomes a record weighted by how many games played it. A game stops
+    counting at its first unreadable or illegal move.
+
+    Returns:
+        int: Number of records written
+    """
+    counts = {}
+    position = Position()
+    for tags, moves in read_pgn_games(pgn_text):
+        position.set_fen(tags.get('FEN', START_FEN))
+        for san in moves[:max_plies]:
+            try:
+                move = parse_san(position, san)
+            except ValueError as e:
+                print(f"Skipping rest of game: {e}")
+                break
+            entry = (position.key, move)
+            counts[entry] = counts.get(entry, 0) + 1
+            position.make(move)
+
+    with open(output_path, 'wb') as f:
+        for (key, move), weight in sorted(counts.items()):
+            f.write(RECORD.pack(key, move, min(weight, 0xFFFF)))
+    return len(counts)
+
+
+class OpeningBook:
+    """
+    Read-only view of a book file through mmap
+    """
+    def __init__(self, path):
+        """
+        Args:
+            path: Book file written by build_book
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        size = os.fstat(self._file.fileno()).st_size
+        # mmap cannot map an empty file
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ) if size else b''
+        self.count = size // RECORD.size
+
+    def close(self):
+        """Release the mapping and the file"""
+        if isinstance(self._data, mmap.mmap):
+            self._data.close()
+        self._file.close()
+
+    def lookup(self, key):
+        """All book moves for a position
+
+        Returns:
+            list: (packed move, weight) pairs, empty when the position is not in the book
+        """
+        data = self._data
+        size = RECORD.size
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) >> 1
+            if _KEY.unpack_from(data, middle * size)[0] < key:
+                low = middle + 1
+            else:
+                high = middle
+        entries = []
+        while low < self.count:
+            record_key, move, weight = RECORD.unpack_from(data, low * size)
+            if record_key != key:
+                break
+            entries.append((move, weight))
+            low += 1
+        return entries
+
+    def choose_move(self, position, rng=random):
+        """Pick a book move for the position, weighted by how often it was played
+
+        Returns:
+            int: Packed move, or None when the book has nothing legal here
+        """
+        entries = self.lookup(position.key)
+        if not entries:
+            return None
+        legal = position.legal_moves()
+        # A key collision could map a foreign move here; never trust it blindly
+        entries = [(move, weight) for move, weight in entries if move in legal]
+        if not entries:
+            return None
+        return rng.choices([move for move, _ in entries],
+                           weights=[weight for _, weight in entries])[0]
+
+
+_default_book = None
+
+
+def get_default_book():
+    """The book shipped in data/, opened once per process, or None when missing"""
+    global _default_book
+    if _default_book is None and os.path.exists(DEFAULT_BOOK_PATH):
+        _default_book = OpeningBook(DEFAULT_BOOK_PATH)
+    return _default_book
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compile PGN games into a chess opening book')
+    parser.add_argument('pgn', type=str, help='PGN file with the opening lines')
+    parser.add_argument('output', type=str, nargs='?', default=DEFAULT_BOOK_PATH,
+                        help='Book file to write')
+    parser.add_argument('--max-plies', type=int, default=DEFAULT_MAX_PLIES,
+                        help='Number of plies of every game to put in the book')
+    args = parser.parse_args()
+
+    with open(args.pgn, 'r', encoding='utf-8') as f:
+        count = build_book(f.read(), args.output, args.max_plies)
+    print(f"Wrote {count} book entries to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,356 @@
+"""
+Material and piece-square tables for the Chess evaluation
+
+Everything is folded into one flat table, ``PST[piece * 64 + square]``
+(piece = color * 6 + piece type, squares numbered as in chess_bitboard),
+holding the signed contribution of that piece on that square to the
+score from white's point of view. Black entries are mirrored and negated
+here once, so chess_bitboard.Position can keep the score up to date in
+make()/unmake() with a couple of lookups per move.
+
+Pawn structure (doubled, isolated, backward and passed pawns) is scored
+separately and cached in a PawnHashTable keyed by the pawn-only Zobrist
+key the position also keeps.
+
+The values below are the hand-set defaults. Weights tuned by chess_tune.py
+are saved to data/chess_eval_weights.json and replace them when this
+module is imported.
+"""
+import json
+import os
+from array import array
+
+# Piece values in pawns: P, N, B, R, Q, K (the king is not counted)
+PIECE_VALUES = (1, 3, 3, 5, 9, 0)
+
+# Piece-square tables from white's point of view, row 0 is rank 8
+PAWN_TABLE = [
+    0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+    5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0, 5.0,
+    1.0, 1.0, 2.0, 3.0, 3.0, 2.0, 1.0, 1.0,
+    0.5, 0.5, 1.0, 2.5, 2.5, 1.0, 0.5, 0.5,
+    0.0, 0.0, 0.0, 2.0, 2.0, 0.0, 0.0, 0.0,
+    0.5, -0.5, -1.0, 0.0, 0.0, -1.0, -0.5, 0.5,
+    0.5, 1.0, 1.0, -2.0, -2.0, 1.0, 1.0, 0.5,
+    0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+]
+
+KNIGHT_TABLE = [
+    -5.0, -4.0, -3.0, -3.0, -3.0, -3.0, -4.0, -5.0,
+    -4.0, -2.0, 0.0, 0.0, 0.0, 0.0, -2.0, -4.0,
+    -3.0, 0.0, 1.0, 1.5, 1.5, 1.0, 0.0, -3.0,
+    -3.0, 0.5, 1.5, 2.0, 2.0, 1.5, 0.5, -3.0,
+    -3.0, 0.0, 1.5, 2.0, 2.0, 1.5, 0.0, -3.0,
+    -3.0, 0.5, 1.0, 1.5, 1.5, 1.0, 0.5, -3.0,
+    -4.0, -2.0, 0.0, 0.5, 0.5, 0.0, -2.0, -4.0,
+    -5.0, -4.0, -3.0, -3.0, -3.0, -3.0, -4.0, -5.0,
+]
+
+BISHOP_TABLE = [
+    -2.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -2.0,
+    -1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -1.0,
+    -1.0, 0.0, 0.5, 1.0, 1.0, 0.5, 0.0, -1.0,
+    -1.0, 0.5, 0.5, 1.0, 1.0, 0.5, 0.5, -1.0,
+    -1.0, 0.0, 1.0, 1.0, 1.0, 1.0, 0.0, -1.0,
+    -1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, -1.0,
+    -1.0, 0.5, 0.0, 0.0, 0.0, 0.0, 0.5, -1.0,
+    -2.0, -1.0, -1.0, -1.0, -1.0, -1.0, -1.0, -2.0,
+]
+
+ROOK_TABLE = [
+    0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0,
+    0.5, 1.0, 1.0, 1.0, 1.0, 1.0, 1.0, 0.5,
+    -0.5, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -0.5,
+    -0.5, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -0.5,
+    -0.5, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -0.5,
+    -0.5, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -0.5,
+    -0.5, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -0.5,
+    0.0, 0.0, 0.0, 0.5, 0.5, 0.0, 0.0, 0.0,
+]
+
+QUEEN_TABLE = [
+    -2.0, -1.0, -1.0, -0.5, -0.5, -1.0, -1.0, -2.0,
+    -1.0, 0.0, 0.0, 0.0, 0.0, 0.0, 0.0, -1.0,
+    -1.0, 0.0, 0.5, 0.5, 0.5, 0.5, 0.0, -1.0,
+    -0.5, 0.0, 0.5, 0.5, 0.5, 0.5, 0.0, -0.5,
+    0.0, 0.0, 0.5, 0.5, 0.5, 0.5, 0.0, -0.5,
+    -1.0, 0.5, 0.5, 0.5, 0.5, 0.5, 0.0, -1.0,
+    -1.0, 0.0, 0.5, 0.0, 0.0, 0.0, 0.0, -1.0,
+    -2.0, -1.0, -1.0, -0.5, -0.5, -1.0, -1.0, -2.0,
+]
+
+KING_TABLE_MIDDLEGAME = [
+    -3.0, -4.0, -4.0, -5.0, -5.0, -4.0, -4.0, -3.0,
+    -3.0, -4.0, -4.0, -5.0, -5.0, -4.0, -4.0, -3.0,
+    -3.0, -4.0, -4.0, -5.0, -5.0, -4.0, -4.0, -3.0,
+    -3.0, -4.0, -4.0, -5.0, -5.0, -4.0, -4.0, -3.0,
+    -2.0, -3.0, -3.0, -4.0, -4.0, -3.0, -3.0, -2.0,
+    -1.0, -2.0, -2.0, -2.0, -2.0, -2.0, -2.0, -1.0,
+    2.0, 2.0, 0.0, 0.0, 0.0, 0.0, 2.0, 2.0,
+    2.0, 3.0, 1.0, 0.0, 0.0, 1.0, 3.0, 2.0,
+]
+
+PIECE_TABLES = (PAWN_TABLE, KNIGHT_TABLE, BISHOP_TABLE, ROOK_TABLE, QUEEN_TABLE,
+                KING_TABLE_MIDDLEGAME)
+
+# Position bonuses count half while a piece is still on its own half of the board
+OWN_HALF_WEIGHT = 0.5
+
+
+def build_pst(piece_values, piece_tables):
+    """Fold material and pre-mirrored piece-square values into one signed table
+
+    The table is linear in the values and tables, which chess_tune.py relies on.
+    """
+    pst = array('d', [0.0]) * (12 * 64)
+    for piece_type, table in enumerate(piece_tables):
+        value = piece_values[piece_type]
+        for sq in range(64):
+            row = sq >> 3
+            # White reads the table as is; black reads the square mirrored top to bottom
+            white_weight = 1.0 if row < 4 else OWN_HALF_WEIGHT
+            black_weight = 1.0 if row >= 4 else OWN_HALF_WEIGHT
+            pst[piece_type * 64 + sq] = value + table[sq] * white_weight
+            pst[(6 + piece_type) * 64 + sq] = -(value + table[sq ^ 56] * black_weight)
+    return pst
+
+
+def evaluate_squares(squares):
+    """Material + piece-square score from white's point of view, computed from scratch
+
+    Args:
+        squares: Piece index on each of the 64 squares, negative when empty
+    """
+    score = 0.0
+    for sq, piece in enumerate(squares):
+        if piece >= 0:
+            score += PST[piece * 64 + sq]
+    return score
+
+
+# Pawn structure terms, in pawns, from the pawn owner's point of view
+DOUBLED_PAWN_PENALTY = 0.2     # For every extra pawn on a file
+ISOLATED_PAWN_PENALTY = 0.15   # No friendly pawn on either neighbouring file
+BACKWARD_PAWN_PENALTY = 0.1    # Cannot be defended by a pawn and cannot safely advance
+PASSED_PAWN_BONUS = (0.0, 0.1, 0.15, 0.25, 0.4, 0.6, 0.9, 0.0)  # By rank, 1 = starting rank
+
+_FULL = (1 << 64) - 1
+FILE_MASKS = [0x0101010101010101 << col for col in range(8)]
+_NOT_FILE_A = _FULL ^ FILE_MASKS[0]
+_NOT_FILE_H = _FULL ^ FILE_MASKS[7]
+ADJACENT_FILE_MASKS = [(FILE_MASKS[col - 1] if col > 0 else 0) |
+                       (FILE_MASKS[col + 1] if col < 7 else 0) for col in range(8)]
+
+
+def _pawn_span_masks():
+    """Per colour and square: the squares in front of a pawn on its own and
+    neighbouring files (passed pawn test) and the squares beside or behind
+    it on the neighbouring files (pawns that could still defend it)"""
+    front = [[0] * 64, [0] * 64]
+    support = [[0] * 64, [0] * 64]
+    for sq in range(64):
+        row, col = divmod(sq, 8)
+        files = FILE_MASKS[col] | ADJACENT_FILE_MASKS[col]
+        for r in range(8):
+            rank = 0xFF << (8 * r)
+            # White pawns move towards row 0, black pawns towards row 7
+            if r < row:
+                front[0][sq] |= files & rank
+            if r > row:
+                front[1][sq] |= files & rank
+            if r >= row:
+                support[0][sq] |= ADJACENT_FILE_MASKS[col] & rank
+            if r <= row:
+                support[1][sq] |= ADJACENT_FILE_MASKS[col] & rank
+    return front, support
+
+
+PASSED_PAWN_MASKS, PAWN_SUPPORT_MASKS = _pawn_span_masks()
+
+
+# Pawn structure terms counted by pawn_terms(): doubled, isolated and
+# backward pawns, then passed pawns by rank
+PAWN_TERMS = 3 + len(PASSED_PAWN_BONUS)
+
+
+def _count_pawn_terms(terms, sign, pawns, enemy_pawns, color, enemy_attacks):
+    """Add one side's pawn structure counts to terms with the given sign"""
+    for col in range(8):
+        on_file = pawns & FILE_MASKS[col]
+        if on_file:
+            count = bin(on_file).count('1')
+            terms[0] += sign * (count - 1)
+            if not pawns & ADJACENT_FILE_MASKS[col]:
+                terms[1] += sign * count
+
+    remaining = pawns
+    while remaining:
+        bit = remaining & -remaining
+        remaining ^= bit
+        sq = bit.bit_length() - 1
+        if not enemy_pawns & PASSED_PAWN_MASKS[color][sq]:
+            row = sq >> 3
+            terms[3 + (7 - row if color == 0 else row)] += sign
+        elif not pawns & PAWN_SUPPORT_MASKS[color][sq]:
+            stop = sq - 8 if color == 0 else sq + 8
+            if 0 <= stop < 64 and enemy_attacks >> stop & 1:
+                terms[2] += sign
+
+
+def pawn_terms(white_pawns, black_pawns):
+    """Pawn structure counts, white's minus black's, in PAWN_TERMS order
+
+    Args:
+        white_pawns, black_pawns: Pawn bitboards (bit sq set when a pawn is on sq)
+    """
+    white_attacks = ((white_pawns & _NOT_FILE_A) >> 9) | ((white_pawns & _NOT_FILE_H) >> 7)
+    black_attacks = ((black_pawns & _NOT_FILE_A) << 7) | ((black_pawns & _NOT_FILE_H) << 9)
+    terms = [0] * PAWN_TERMS
+    _count_pawn_terms(terms, 1, white_pawns, black_pawns, 0, black_attacks)
+    _count_pawn_terms(terms, -1, black_pawns, white_pawns, 1, white_attacks)
+    return terms
+
+
+def pawn_weights():
+    """Signed score of one unit of each pawn_terms() count"""
+    return (-DOUBLED_PAWN_PENALTY, -ISOLATED_PAWN_PENALTY, -BACKWARD_PAWN_PENALTY) + tuple(
+        PASSED_PAWN_BONUS)
+
+
+def evaluate_pawns(white_pawns, black_pawns):
+    """Doubled, isolated, backward and passed pawn terms from white's point of view
+
+    Args:
+        white_pawns, black_pawns: Pawn bitboards (bit sq set when a pawn is on sq)
+    """
+    score = 0.0
+    for weight, count in zip(PAWN_WEIGHTS, pawn_terms(white_pawns, black_pawns)):
+        if count:
+            score += weight * count
+    return score
+
+
+DEFAULT_WEIGHTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data',
+                                    'chess_eval_weights.json')
+
+
+def save_weights(path, piece_values, piece_tables, pawn_term_weights):
+    """Write evaluation weights as JSON, in the form load_weights() reads
+
+    Args:
+        piece_values: Six piece values in pawns, P to K
+        piece_tables: Six 64-entry piece-square tables, row 0 is rank 8
+        pawn_term_weights: Signed weights in PAWN_TERMS order, as pawn_weights()
+    """
+    weights = {
+        'piece_values': [round(float(v), 4) for v in piece_values],
+        'piece_tables': [[round(float(v), 4) for v in table] for table in piece_tables],
+        'doubled_pawn_penalty': round(-float(pawn_term_weights[0]), 4),
+        'isolated_pawn_penalty': round(-float(pawn_term_weights[1]), 4),
+        'backward_pawn_penalty': round(-float(pawn_term_weights[2]), 4),
+        'passed_pawn_bonus': [round(float(v), 4) for v in pawn_term_weights[3:]]
+    }
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(weights, f)
+
+
+def load_weights(path=DEFAULT_WEIGHTS_PATH):
+    """Replace the evaluation weights with the ones saved in a JSON file
+
+    PST is updated in place. Positions created before the call keep their
+    old incremental score until set_fen() is called on them.
+    """
+    global PIECE_VALUES, PIECE_TABLES, DOUBLED_PAWN_PENALTY, ISOLATED_PAWN_PENALTY
+    global BACKWARD_PAWN_PENALTY, PASSED_PAWN_BONUS, PAWN_WEIGHTS
+    with open(path, 'r', encoding='utf-8') as f:
+        weights = json.load(f)
+    PIECE_VALUES = tuple(weights['piece_values'])
+    PIECE_TABLES = tuple(list(table) for table in weights['piece_tables'])
+    DOUBLED_PAWN_PENALTY = weights['doubled_pawn_penalty']
+    ISOLATED_PAWN_PENALTY = weights['isolated_pawn_penalty']
+    BACKWARD_PAWN_PENALTY = weights['backward_pawn_penalty']
+    PASSED_PAWN_BONUS = tuple(weights['passed_pawn_bonus'])
+    PAWN_WEIGHTS = pawn_weights()
+    PST[:] = build_pst(PIECE_VALUES, PIECE_TABLES)
+
+
+PST = build_pst(PIECE_VALUES, PIECE_TABLES)
+PAWN_WEIGHTS = pawn_weights()
+if os.path.exists(DEFAULT_WEIGHTS_PATH):
+    load_weights()
+
+
+class PawnHashTable:
+    """
+    Small cache of pawn structure scores keyed by the pawn-only Zobrist key
+
+    Sibling nodes nearly always share their pawns, so almost every
+    evaluation is answered from here and the pawn terms cost next to nothing.
+    """
+    def __init__(self, size_bits=14):
+        """
+        Args:
+            size_bits: log2 of the number of entries
+        """
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        self.keys = array('Q', [0]) * self.size
+        self.scores = array('d', [0.0]) * self.size
+        self.filled = array('b', [0]) * self.size
+        self.hits = 0
+        self.misses = 0
+
+    def probe(self, pawn_key, white_pawns, black_pawns):
+        """Pawn structure score from white's point of view, computed on a miss"""
+        index = pawn_key & self.mask
+        if self.keys[index] == pawn_key and self.filled[index]:
+            self.hits += 1
+            return self.scores[index]
+        self.misses += 1
+        score = evaluate_pawns(white_pawns, black_pawns)
+        self.keys[index] = pawn_key
+        self.scores[index] = score
+        self.filled[index] = 1
+        return score
+
+    def stats(self):
+        """Counters for monitoring the cache
+
+        Returns:
+            dict: hits, misses and hit_rate
+        """
+        probes = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / probes if probes else 0.0
+        }
+
+
+def evaluate_position(position, pawn_table):
+    """Full static score of a chess_bitboard.Position from white's point of view
+
+    Args:
+        position: Position keeping its material + piece-square score and pawn key
+        pawn_table: PawnHashTable for the pawn structure term
+    """
+    bb = position.bb
+    return position.score + pawn_table.probe(position.pawn_key, bb[0], bb[6])
+
+
+def side_to_move_evaluator(position, pawn_table, network=None):
+    """Evaluation callable for ChessSearch, scoring for the side to move
+
+    With a chess_nnue.Network an Accumulator is attached to the position
+    and the network scores it. Otherwise material, piece-square tables and
+    pawn structure are used and any attached accumulator is dropped.
+    """
+    if network is not None:
+        from chess_nnue import Accumulator
+        return Accumulator(position, network).evaluate
+    position.accumulator = None
+
+    def evaluate():
+        score = evaluate_position(position, pawn_table)
+        return -score if position.side else score  # side 1 is black
+    return evaluate
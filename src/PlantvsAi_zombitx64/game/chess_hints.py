@@ -0,0 +1,197 @@
+"""
+Hints and multi-line analysis for the Chess web UI
+
+analyse() searches a position with ChessSearch.search_multipv and returns
+its best lines, with scores and principal variations, ready to be sent as
+JSON. Results go into an AnalysisCache, a small LRU cache keyed by the
+position's Zobrist key and the depth searched. Players often ask for a
+hint several times in the same position, and every repeat after the first
+is a dictionary lookup. A result searched deeper, or with more lines, also
+answers shallower requests, so only the deepest result per position is
+kept.
+
+All requests share one search with its transposition table, behind a
+lock, because the web server may handle requests on several threads.
+"""
+import threading
+from collections import OrderedDict
+
+from chess_bitboard import Position, WHITE, BLACK, KING, move_from, move_to, move_to_uci
+from chess_eval import PawnHashTable, side_to_move_evaluator
+from chess_search import ChessSearch, MATE_SCORE, MATE_BOUND
+from chess_tablebase import get_default_tablebase
+from transposition import TranspositionTable
+
+DEFAULT_HINT_DEPTH = 5
+DEFAULT_ANALYSIS_DEPTH = 6
+DEFAULT_LINES = 3
+MAX_DEPTH = 10
+MAX_LINES = 5
+SEARCH_TIME_LIMIT = 5.0  # Seconds per request; the last finished depth is returned
+CACHE_SIZE = 1024  # Positions kept
+
+
+class AnalysisCache:
+    """
+    LRU cache of analysis results by position key, deepest result only
+    """
+    def __init__(self, size=CACHE_SIZE):
+        """
+        Args:
+            size: Positions kept before the least recently used is dropped
+        """
+        self.size = size
+        self.entries = OrderedDict()  # key -> (depth, lines, result)
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, key, depth, lines):
+        """Cached result searched at least this deep with at least this many lines, or None"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < depth or entry[1] < lines:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key, depth, lines, result):
+        """Store a result unless the cache already holds one that answers more"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] < depth or (entry[0] == depth and entry[1] < lines):
+                self.entries[key] = (depth, lines, result)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        """Forget every result, after the evaluation has changed for instance"""
+        with self._lock:
+            self.entries.clear()
+
+    def stats(self):
+        """Counters for monitoring the cache
+
+        Returns:
+            dict: entries, hits, misses and hit_rate
+        """
+        lookups = self.hits + self.misses
+        return {
+            'entries': len(self.entries),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': self.hits / lookups if lookups else 0.0
+        }
+
+
+_cache = AnalysisCache()
+_search_lock = threading.Lock()
+_searcher = None  # Created on first use
+
+
+def _get_searcher():
+    """The search shared by all requests"""
+    global _searcher
+    if _searcher is None:
+        position = Position()
+        _searcher = ChessSearch(position, side_to_move_evaluator(position, PawnHashTable()),
+                                TranspositionTable(), get_default_tablebase())
+        _searcher.configure(null_move_pruning=True, late_move_reductions=True,
+                            principal_variation_search=True)
+    return _searcher
+
+
+def _load(position, fen):
+    """Set up the position, refusing FENs the search cannot work with
+
+    Raises:
+        ValueError: When the FEN is malformed or the position is not legal
+    """
+    try:
+        position.set_fen(fen)
+    except (ValueError, IndexError, AttributeError) as e:
+        raise ValueError(f"Invalid FEN: {fen}") from e
+    if sum(1 for piece in position.squares if piece >= 0) > 32 or any(
+            bin(position.bb[color * 6 + KING]).count('1') != 1 for color in (WHITE, BLACK)):
+        raise ValueError(f"Invalid FEN: {fen}")
+    king = (position.bb[(1 - position.side) * 6 + KING]).bit_length() - 1
+    if position.is_attacked(king, position.side):
+        raise ValueError(f"Side not to move is in check: {fen}")
+
+
+def _line(position, score, pv):
+    """One analysis line in JSON form, scored from white's point of view"""
+    if position.side == BLACK:
+        score = -score
+    mate = None
+    if abs(score) > MATE_BOUND:
+        # Moves until mate, negative when black mates
+        moves = (MATE_SCORE - abs(score) + 1) // 2
+        mate = moves if score > 0 else -moves
+    move = pv[0]
+    return {
+        'move': move_to_uci(move),
+        'from': list(divmod(move_from(move), 8)),
+        'to': list(divmod(move_to(move), 8)),
+        'score': round(score, 2),
+        'mate': mate,
+        'pv': [move_to_uci(m) for m in pv]
+    }
+
+
+def analyse(fen, depth=DEFAULT_ANALYSIS_DEPTH, lines=DEFAULT_LINES):
+    """Best lines of a position, from the cache when it has them
+
+    Args:
+        fen: Position to analyse
+        depth: Search depth, capped at MAX_DEPTH
+        lines: Number of best moves wanted, capped at MAX_LINES
+
+    Returns:
+        dict: fen, depth (last finished), nodes (0 for a cached result),
+              cached, and lines: best first, each with the move (UCI and
+              (row, col) squares), score in pawns for white, mate in moves
+              or None, and the principal variation in UCI
+
+    Raises:
+        ValueError: For an invalid FEN
+    """
+    depth = max(1, min(int(depth), MAX_DEPTH))
+    lines = max(1, min(int(lines), MAX_LINES))
+    position = Position()
+    _load(position, fen)
+    key = position.key
+    result = _cache.get(key, depth, lines)
+    if result is None:
+        with _search_lock:
+            # Another request may have searched it while this one waited
+            result = _cache.get(key, depth, lines)
+            if result is None:
+                searcher = _get_searcher()
+                searcher.position.set_fen(fen)
+                found = searcher.search_multipv(depth, lines, time_limit=SEARCH_TIME_LIMIT)
+                result = {
+                    'fen': fen,
+                    'depth': searcher.completed_depth,
+                    'nodes': searcher.nodes,
+                    'lines': [_line(position, score, pv) for score, pv in found]
+                }
+                # A search cut short by the clock only answers the depth it finished
+                if searcher.completed_depth:
+                    _cache.put(key, searcher.completed_depth, lines, result)
+                return dict(result, cached=False)
+    return dict(result, nodes=0, cached=True, lines=result['lines'][:lines])
+
+
+def hint(fen, depth=DEFAULT_HINT_DEPTH):
+    """Best move of a position, as the first line of analyse(), or None when the game is over"""
+    found = analyse(fen, depth, 1)['lines']
+    return found[0] if found else None
+
+
+def cache_stats():
+    """Counters of the shared analysis cache"""
+    return _cache.stats()
@@ -0,0 +1,367 @@
+"""
+Efficiently updatable neural network (NNUE) evaluation for the Chess engine
+
+Network layout::
+
+    768 inputs per side   one per (piece, square), seen from white and
+                          from black (board flipped, colours swapped)
+    feature transformer   768 x H int16 weights shared by both sides,
+                          summed into one accumulator of H values per side
+    hidden layer          [side to move, other side] clipped to 0..1
+                          (2H values) x 32, float32, then clipped ReLU
+    output                linear, 32 x 1, float32, in pawns for the
+                          side to move
+
+Only the feature transformer is large, and a move changes just two to four
+of its inputs, so the accumulator is updated by adding and subtracting a
+few weight rows instead of being recomputed. Position.make() and unmake()
+report every move to the attached Accumulator, which only records it; the
+rows are applied when a position is actually evaluated, so interior nodes
+of the search that are never evaluated cost almost nothing.
+
+Weights are stored with safetensors, like the poker models. A network is
+trained from positions scored by chess_analysis.py:
+
+    python chess_analysis.py games.pgn labels.jsonl --depth 6
+    python chess_nnue.py labels.jsonl data/chess_nnue.safetensors --epochs 20
+"""
+import argparse
+import json
+import os
+
+import numpy as np
+import safetensors.numpy
+
+from chess_bitboard import (
+    Position, NO_PIECE, NULL_MOVE, KNIGHT, ROOK, EP_CAPTURE, KING_CASTLE,
+    QUEEN_CASTLE, PROMOTION
+)
+
+FEATURES = 768
+HIDDEN_1 = 32
+QA = 255  # Feature transformer weights are stored as round(weight * QA)
+DEFAULT_HIDDEN = 64
+DEFAULT_NETWORK_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data',
+                                    'chess_nnue.safetensors')
+
+# Scores are compared on a win-probability scale while training, so a
+# five-pawn and a fifty-pawn advantage count as almost the same thing
+SCORE_SCALE = 4.0
+MAX_TARGET = 20.0
+
+
+def _feature_pairs():
+    """FEATURE_PAIRS[piece * 64 + sq]: input index from white's and from black's side"""
+    pairs = np.zeros((FEATURES, 2), dtype=np.int64)
+    for piece in range(12):
+        for sq in range(64):
+            pairs[piece * 64 + sq] = (piece * 64 + sq, ((piece + 6) % 12) * 64 + (sq ^ 56))
+    return pairs
+
+
+FEATURE_PAIRS = _feature_pairs()
+
+
+class Network:
+    """
+    Quantised network weights and the dense layers after the accumulator
+    """
+    def __init__(self, weights):
+        """
+        Args:
+            weights: Dict of arrays as stored in the safetensors file
+        """
+        self.weights = weights
+        ft_weight = weights['ft.weight'].astype(np.int32)
+        self.hidden = ft_weight.shape[1]
+        # rows[piece * 64 + sq] holds the (white side, black side) rows of a feature
+        self.rows = np.ascontiguousarray(ft_weight[FEATURE_PAIRS])
+        self.bias = np.tile(weights['ft.bias'].astype(np.int32), (2, 1))
+
+        # Accumulators are kept as [white side, black side]; the hidden layer
+        # wants [side to move, other side], so keep its rows in both orders
+        l1_weight = weights['l1.weight'].astype(np.float32) / QA
+        top, bottom = l1_weight[:self.hidden], l1_weight[self.hidden:]
+        self.l1_weight = (np.concatenate((top, bottom)), np.concatenate((bottom, top)))
+        self.l1_bias = weights['l1.bias'].astype(np.float32)
+        self.out_weight = weights['out.weight'].astype(np.float32).reshape(-1)
+        self.out_bias = float(weights['out.bias'].reshape(-1)[0])
+
+    @classmethod
+    def load(cls, path=DEFAULT_NETWORK_PATH):
+        """Read a network from a safetensors file"""
+        return cls(safetensors.numpy.load_file(path))
+
+    def save(self, path):
+        """Write the network to a safetensors file"""
+        safetensors.numpy.save_file(self.weights, path)
+
+    def forward(self, accumulator, side):
+        """Score for the side to move from a (2, H) accumulator"""
+        hidden = np.clip(accumulator, 0, QA).reshape(-1) @ self.l1_weight[side] + self.l1_bias
+        np.clip(hidden, 0.0, 1.0, out=hidden)
+        return float(hidden @ self.out_weight) + self.out_bias
+
+    def evaluate(self, position):
+        """Score for the side to move, with the accumulator computed from scratch"""
+        accumulator = self.bias.copy()
+        for sq, piece in enumerate(position.squares):
+            if piece != NO_PIECE:
+                accumulator += self.rows[piece * 64 + sq]
+        return self.forward(accumulator, position.side)
+
+
+class Accumulator:
+    """
+    Incrementally updated first-layer sums for one Position
+
+    Attaching it sets position.accumulator, after which the position calls
+    push() from make() and make_null(), pop() from unmake() and
+    unmake_null(), and refresh() from set_fen().
+    """
+    def __init__(self, position, network):
+        self.position = position
+        self.network = network
+        self.stack = []    # Accumulator per move played since the last refresh, None until needed
+        self.changes = []  # (move, moving piece, captured piece) that led to each entry
+        position.accumulator = self
+        self.refresh()
+
+    def detach(self):
+        """Stop following the position"""
+        if self.position.accumulator is self:
+            self.position.accumulator = None
+
+    def refresh(self):
+        """Recompute the accumulator from the board"""
+        network = self.network
+        accumulator = network.bias.copy()
+        for sq, piece in enumerate(self.position.squares):
+            if piece != NO_PIECE:
+                accumulator += network.rows[piece * 64 + sq]
+        self.stack = [accumulator]
+        self.changes = [None]
+
+    def push(self, move, piece, captured):
+        """Record a move; the rows are applied when the position is evaluated"""
+        self.stack.append(None)
+        self.changes.append((move, piece, captured))
+
+    def pop(self):
+        """Forget the last move"""
+        self.stack.pop()
+        self.changes.pop()
+
+    def current(self):
+        """Accumulator of the current position, bringing the stack up to date"""
+        stack = self.stack
+        top = len(stack) - 1
+        if stack[top] is not None:
+            return stack[top]
+        index = top
+        while stack[index] is None:
+            index -= 1
+        accumulator = stack[index]
+        for index in range(index + 1, top + 1):
+            accumulator = self._apply(accumulator, self.changes[index])
+            stack[index] = accumulator
+        return accumulator
+
+    def _apply(self, accumulator, change):
+        """Accumulator after one move, as a new array"""
+        move, piece, captured = change
+        if move == NULL_MOVE:
+            return accumulator
+        rows = self.network.rows
+        fr = move & 63
+        to = (move >> 6) & 63
+        flag = move >> 12
+        color_base = piece - piece % 6
+
+        if flag & PROMOTION:
+            added = color_base + KNIGHT + (flag & 3)
+        else:
+            added = piece
+        accumulator = accumulator + rows[added * 64 + to]
+        accumulator -= rows[piece * 64 + fr]
+        if flag == EP_CAPTURE:
+            accumulator -= rows[captured * 64 + (to + 8 if piece < 6 else to - 8)]
+        elif captured != NO_PIECE:
+            accumulator -= rows[captured * 64 + to]
+        elif flag == KING_CASTLE or flag == QUEEN_CASTLE:
+            rook = color_base + ROOK
+            if flag == KING_CASTLE:
+                rook_from, rook_to = to + 1, to - 1
+            else:
+                rook_from, rook_to = to - 2, to + 1
+            accumulator += rows[rook * 64 + rook_to]
+            accumulator -= rows[rook * 64 + rook_from]
+        return accumulator
+
+    def evaluate(self):
+        """Score for the side to move in pawns"""
+        return self.network.forward(self.current(), self.position.side)
+
+
+_default_network = None
+
+
+def load_default_network():
+    """The network in data/, loaded once per process, or None when there is none"""
+    global _default_network
+    if _default_network is None and os.path.exists(DEFAULT_NETWORK_PATH):
+        _default_network = Network.load(DEFAULT_NETWORK_PATH)
+    return _default_network
+
+
+def load_training_data(path):
+    """Read positions scored by chess_analysis.py
+
+    Records chess_analysis.py could not analyse (error set, no score) are
+    skipped.
+
+    Returns:
+        tuple: (side-to-move features, other-side features, targets): two
+               (N, 32) index arrays padded with FEATURES and the scores for
+               the side to move, clipped to +-MAX_TARGET pawns
+    """
+    own_rows, other_rows, targets = [], [], []
+    position = Position()
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if not line.strip():
+                continue
+            record = json.loads(line)
+            if record.get('error') is not None or record.get('score') is None:
+                continue
+            position.set_fen(record['fen'])
+            own = [FEATURES] * 32
+            other = [FEATURES] * 32
+            count = 0
+            for sq, piece in enumerate(position.squares):
+                if piece != NO_PIECE:
+                    white, black = FEATURE_PAIRS[piece * 64 + sq]
+                    own[count], other[count] = (white, black) if position.side == 0 else (black, white)
+                    count += 1
+            score = record['score'] if position.side == 0 else -record['score']
+            own_rows.append(own)
+            other_rows.append(other)
+            targets.append(max(-MAX_TARGET, min(MAX_TARGET, score)))
+    return (np.array(own_rows, dtype=np.int64), np.array(other_rows, dtype=np.int64),
+            np.array(targets, dtype=np.float32))
+
+
+def _sigmoid(x):
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+def train(own, other, targets, hidden=DEFAULT_HIDDEN, epochs=20, batch_size=1024,
+          learning_rate=1e-3, seed=0):
+    """Fit a network to engine scores with mini-batch Adam
+
+    The loss is the squared difference of predicted and target scores on
+    the win-probability scale sigmoid(score / SCORE_SCALE). The feature
+    transformer has an extra all-zero row at index FEATURES for padding.
+
+    Returns:
+        Network: Quantised network
+    """
+    rng = np.random.default_rng(seed)
+    params = {
+        'ft.weight': rng.normal(0.0, 0.1, (FEATURES + 1, hidden)).astype(np.float32),
+        'ft.bias': np.zeros(hidden, dtype=np.float32),
+        'l1.weight': rng.normal(0.0, 1.0 / np.sqrt(2 * hidden), (2 * hidden, HIDDEN_1)).astype(np.float32),
+        'l1.bias': np.zeros(HIDDEN_1, dtype=np.float32),
+        'out.weight': rng.normal(0.0, 1.0 / np.sqrt(HIDDEN_1), HIDDEN_1).astype(np.float32),
+        'out.bias': np.zeros(1, dtype=np.float32)
+    }
+    params['ft.weight'][FEATURES] = 0.0
+    moments = {name: (np.zeros_like(value), np.zeros_like(value)) for name, value in params.items()}
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    step = 0
+
+    count = len(targets)
+    for epoch in range(epochs):
+        order = rng.permutation(count)
+        total_loss = 0.0
+        for start in range(0, count, batch_size):
+            batch = order[start:start + batch_size]
+            own_batch, other_batch, target = own[batch], other[batch], targets[batch]
+            size = len(batch)
+
+            # Forward
+            w1 = params['ft.weight']
+            acc_own = w1[own_batch].sum(axis=1) + params['ft.bias']
+            acc_other = w1[other_batch].sum(axis=1) + params['ft.bias']
+            pre0 = np.concatenate((acc_own, acc_other), axis=1)
+            h0 = np.clip(pre0, 0.0, 1.0)
+            pre1 = h0 @ params['l1.weight'] + params['l1.bias']
+            h1 = np.clip(pre1, 0.0, 1.0)
+            output = h1 @ params['out.weight'] + params['out.bias'][0]
+
+            predicted = _sigmoid(output / SCORE_SCALE)
+            expected = _sigmoid(target / SCORE_SCALE)
+            error = predicted - expected
+            total_loss += float((error ** 2).sum())
+
+            # Backward
+            d_output = 2.0 * error * predicted * (1.0 - predicted) / SCORE_SCALE / size
+            d_h1 = np.outer(d_output, params['out.weight']) * ((pre1 > 0.0) & (pre1 < 1.0))
+            d_h0 = d_h1 @ params['l1.weight'].T * ((pre0 > 0.0) & (pre0 < 1.0))
+            d_own, d_other = d_h0[:, :hidden], d_h0[:, hidden:]
+            d_w1 = np.zeros_like(w1)
+            np.add.at(d_w1, own_batch, np.repeat(d_own[:, None, :], own_batch.shape[1], axis=1))
+            np.add.at(d_w1, other_batch, np.repeat(d_other[:, None, :], other_batch.shape[1], axis=1))
+            d_w1[FEATURES] = 0.0
+            grads = {
+                'ft.weight': d_w1,
+                'ft.bias': d_own.sum(axis=0) + d_other.sum(axis=0),
+                'l1.weight': h0.T @ d_h1,
+                'l1.bias': d_h1.sum(axis=0),
+                'out.weight': h1.T @ d_output,
+                'out.bias': np.array([d_output.sum()], dtype=np.float32)
+            }
+
+            # Adam
+            step += 1
+            for name, grad in grads.items():
+                m, v = moments[name]
+                m *= beta1
+                m += (1 - beta1) * grad
+                v *= beta2
+                v += (1 - beta2) * grad * grad
+                m_hat = m / (1 - beta1 ** step)
+                v_hat = v / (1 - beta2 ** step)
+                params[name] -= (learning_rate * m_hat / (np.sqrt(v_hat) + eps)).astype(np.float32)
+        print(f"Epoch {epoch + 1}/{epochs}: loss {total_loss / count:.6f}")
+
+    return Network({
+        'ft.weight': np.clip(np.round(params['ft.weight'][:FEATURES] * QA), -32768, 32767).astype(np.int16),
+        'ft.bias': np.clip(np.round(params['ft.bias'] * QA), -32768, 32767).astype(np.int16),
+        'l1.weight': params['l1.weight'].astype(np.float32),
+        'l1.bias': params['l1.bias'].astype(np.float32),
+        'out.weight': params['out.weight'].astype(np.float32),
+        'out.bias': params['out.bias'].astype(np.float32)
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Train the chess NNUE evaluation from scored positions')
+    parser.add_argument('data', type=str, help='JSONL file written by chess_analysis.py')
+    parser.add_argument('output', type=str, nargs='?', default=DEFAULT_NETWORK_PATH,
+                        help='safetensors file to write')
+    parser.add_argument('--hidden', type=int, default=DEFAULT_HIDDEN, help='Accumulator size per side')
+    parser.add_argument('--epochs', type=int, default=20, help='Passes over the data')
+    parser.add_argument('--batch-size', type=int, default=1024, help='Positions per gradient step')
+    parser.add_argument('--learning-rate', type=float, default=1e-3, help='Adam step size')
+    args = parser.parse_args()
+
+    own, other, targets = load_training_data(args.data)
+    print(f"Loaded {len(targets)} positions")
+    network = train(own, other, targets, args.hidden, args.epochs, args.batch_size, args.learning_rate)
+    network.save(args.output)
+    print(f"Saved network to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
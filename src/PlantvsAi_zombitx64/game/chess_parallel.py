@@ -0,0 +1,245 @@
+"""
+Parallel root search for the Chess engine
+
+The GIL keeps threads from speeding up a Python search, so the root moves
+are split over worker processes instead. The pool is created once, by
+start_pool at startup or else the first time it is needed, and reused for
+every search in this process. Each worker keeps its own Position,
+transposition table and pawn hash table alive between requests, so
+nothing is re-started or re-allocated per move and later searches start
+from a warm table. Workers are started with 'forkserver' (or 'spawn'),
+never a plain fork: forking a web server from inside a request thread
+would copy locks other threads happen to hold.
+
+Every worker runs iterative deepening over its share of the root moves,
+using the best score found so far among them as alpha, and the parent
+picks the best move over all workers. Workers send back the line they
+expect after each root move, and the parent stores the root result and
+those replies in its own transposition table, so pondering and the next
+search's hash moves see the result as if the search had run in the
+game's process.
+"""
+import atexit
+import multiprocessing
+import os
+
+from chess_bitboard import Position
+from chess_eval import PawnHashTable, side_to_move_evaluator
+from chess_search import ChessSearch, INFINITY, _score_to_tt
+from chess_tablebase import get_default_tablebase
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, NO_MOVE
+
+_pool = None
+_pool_size = 0
+_max_processes = 0  # Cap on the pool size set by start_pool, 0 for none
+_worker = None  # ChessSearch owned by a worker process
+_worker_pawn_table = None
+_worker_nnue = False  # Whether the worker evaluates with the NNUE
+
+
+def _init_worker():
+    """Set up the search state a worker keeps for its whole life"""
+    global _worker, _worker_pawn_table
+    position = Position()
+    _worker_pawn_table = PawnHashTable()
+    _worker = ChessSearch(position, side_to_move_evaluator(position, _worker_pawn_table),
+                          TranspositionTable(), get_default_tablebase())
+
+
+def _use_nnue(enabled):
+    """Switch the worker's evaluation between the NNUE and the hand-made terms"""
+    global _worker_nnue
+    if enabled != _worker_nnue:
+        from chess_nnue import load_default_network
+        network = load_default_network() if enabled else None
+        _worker.evaluate = side_to_move_evaluator(_worker.position, _worker_pawn_table, network)
+        _worker_nnue = enabled
+
+
+def _search_root_moves(task):
+    """Worker side: search a share of the root moves with iterative deepening
+
+    Args:
+        task: (start FEN, moves played since it, root moves, depth, search options,
+               whether to evaluate with the NNUE)
+
+    Returns:
+        tuple: ([(move, score, principal variation), ...] best first,
+                nodes, quiescence nodes)
+    """
+    start_fen, played, moves, depth, options, nnue = task
+    _use_nnue(nnue)
+    searcher = _worker
+    position = searcher.position
+    # Replay the game so repetitions before the root are known
+    position.set_fen(start_fen)
+    for move in played:
+        position.make(move)
+    searcher.configure(**options)
+    searcher.new_search()
+
+    scores = {}
+    order = list(moves)
+    for iteration in range(1, depth + 1):
+        alpha = -INFINITY
+        for move in order:
+            position.make(move)
+            score = -searcher.negamax(iteration - 1, -INFINITY, -alpha, 1)
+            position.unmake()
+            scores[move] = score
+            if score > alpha:
+                alpha = score
+        order.sort(key=scores.__getitem__, reverse=True)
+    results = [(move, scores[move], searcher.principal_variation(move)) for move in order]
+    return results, searcher.nodes, searcher.qnodes
+
+
+def _pool_context():
+    """Start workers from a clean process rather than forking the caller"""
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+def worker_count(processes):
+    """Number of workers a search gets, within the cap set by start_pool
+
+    Args:
+        processes: Workers asked for, 0 for one per CPU core
+    """
+    count = processes or os.cpu_count() or 1
+    return min(count, _max_processes) if _max_processes else count
+
+
+def start_pool(processes):
+    """Create the worker pool up front and cap every later search at its size
+
+    A web server calls this once at startup, so no request pays for
+    starting the workers and no search asks for more of them.
+
+    Args:
+        processes: Size of the pool, 0 for one worker per CPU core
+    """
+    global _max_processes
+    _max_processes = processes or os.cpu_count() or 1
+    return get_pool(_max_processes)
+
+
+def get_pool(processes):
+    """Return the shared worker pool, (re)creating it only when the size changes"""
+    global _pool, _pool_size
+    if _pool is None or _pool_size != processes:
+        shutdown_pool()
+        _pool = _pool_context().Pool(processes, initializer=_init_worker)
+        _pool_size = processes
+    return _pool
+
+
+def shutdown_pool():
+    """Stop the worker processes"""
+    global _pool, _pool_size
+    if _pool is not None:
+        _pool.terminate()
+        _pool.join()
+        _pool = None
+        _pool_size = 0
+
+
+atexit.register(shutdown_pool)
+
+
+class ParallelSearch:
+    """
+    Root-split search over the shared worker pool
+    """
+    def __init__(self, processes=0):
+        """
+        Args:
+            processes: Number of worker processes, 0 for one per CPU core
+                (see worker_count)
+        """
+        self.processes = worker_count(processes)
+        self.nodes = 0
+        self.qnodes = 0
+
+    def search(self, position, moves, depth, options=None, nnue=False, tt=None):
+        """Search the root moves of a position in parallel
+
+        Args:
+            position: chess_bitboard.Position at the root (not modified)
+            moves: Legal root moves, best first so good moves spread over workers
+            depth: Search depth
+            options: Keyword arguments for ChessSearch.configure
+            nnue: Evaluate with the default NNUE network instead of the hand-made terms
+            tt: TranspositionTable of the caller, given the root result and
+                the expected replies (see store_results)
+
+        Returns:
+            tuple: (packed best move or NO_MOVE, score for the side to move)
+        """
+        self.nodes = 0
+        self.qnodes = 0
+        moves = list(moves)
+        if not moves:
+            return NO_MOVE, None
+
+        workers = min(self.processes, len(moves))
+        played = [record[0] for record in position.history]
+        tasks = [(position.start_fen, played, moves[index::workers], depth, options or {}, nnue)
+                 for index in range(workers)]
+        results = get_pool(self.processes).map(_search_root_moves, tasks)
+
+        best_move, best_score, best_line = NO_MOVE, -INFINITY, ()
+        for scored, nodes, qnodes in results:
+            self.nodes += nodes
+            self.qnodes += qnodes
+            move, score, line = scored[0]
+            if score > best_score:
+                best_move, best_score, best_line = move, score, line
+        if tt is not None:
+            self.store_results(tt, position, depth, results, best_score, best_line)
+        return best_move, best_score
+
+    @staticmethod
+    def store_results(tt, position, depth, results, best_score, best_line):
+        """Store what the workers found in the caller's transposition table
+
+        The best root move was searched with an open window, so the root
+        score and the score after it are exact. Further down the line the
+        worker's own pruning and reductions decided the moves, so those are
+        kept as hash moves only, at depth 0 with a lower bound no search
+        can cut on. Every other root move only failed low, which gives the
+        opponent a lower bound after it, stored with the reply the worker
+        found.
+        """
+        tt.new_search()
+        played = 0
+        for ply, move in enumerate(best_line):
+            if depth - ply <= 0:
+                break
+            if ply < 2:
+                score = best_score if ply == 0 else -best_score
+                tt.store(position.key, depth - ply, EXACT, _score_to_tt(score, ply), move)
+            elif tt.best_move(position.key) == NO_MOVE:
+                tt.store(position.key, 0, LOWER_BOUND, -INFINITY, move)
+            position.make(move)
+            played += 1
+        for _ in range(played):
+            position.unmake()
+
+        if depth < 2:
+            return
+        for scored, _, _ in results:
+            for move, score, line in scored:
+                if line is best_line or len(line) < 2:
+                    continue
+                position.make(move)
+                tt.store(position.key, depth - 1, LOWER_BOUND, _score_to_tt(-score, 1), line[1])
+                position.unmake()
+
+    def stats(self):
+        """Node counters of the last search, summed over the workers"""
+        return {
+            'nodes': self.nodes,
+            'qnodes': self.qnodes,
+            'processes': self.processes
+        }
@@ -0,0 +1,158 @@
+"""
+Perft (performance test) for the Chess move generator
+
+perft counts the leaf nodes of the full legal move tree to a fixed depth.
+The counts for the positions in PERFT_SUITE are well known, so any
+difference after a change to chess_bitboard means the move generator is
+broken. Timing the same walk gives a nodes/second throughput number.
+
+Usage:
+    python chess_perft.py                      # run the whole suite
+    python chess_perft.py --depth 5            # start position to depth 5
+    python chess_perft.py --fen "<FEN>" --depth 3 --divide
+"""
+import argparse
+import time
+
+from chess_bitboard import Position, START_FEN, move_to_uci
+
+KIWIPETE_FEN = 'r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1'
+
+# (name, FEN, node counts for depth 1, 2, 3, ...)
+PERFT_SUITE = [
+    ('start', START_FEN, [20, 400, 8902, 197281, 4865609]),
+    # Castling both ways, pins, en passant and promotions in the tree
+    ('kiwipete', KIWIPETE_FEN, [48, 2039, 97862, 4085603]),
+    # Horizontal en-passant pins and discovered checks in an endgame
+    ('endgame-ep', '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+     [14, 191, 2812, 43238, 674624]),
+    # Capture-promotions, checks and castling rights lost to captures
+    ('promotions', 'r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1',
+     [6, 264, 9467, 422333]),
+    ('promotions-mirrored', 'r2q1rk1/pP1p2pp/Q4n2/bbp1p3/Np6/1B3NBn/pPPP1PPP/R3K2R b KQ - 0 1',
+     [6, 264, 9467, 422333]),
+    ('underpromotion', 'rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8',
+     [44, 1486, 62379, 2103487]),
+    ('middlegame', 'r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10',
+     [46, 2079, 89890, 3894594]),
+]
+
+
+def perft(position, depth):
+    """Count leaf nodes of the legal move tree
+
+    Args:
+        position: chess_bitboard.Position, restored before returning
+        depth: Number of plies to walk
+
+    Returns:
+        int: Number of leaf nodes
+    """
+    if depth == 0:
+        return 1
+    moves = position.legal_moves()
+    if depth == 1:
+        # Bulk counting: the leaves are the legal moves themselves
+        return len(moves)
+    nodes = 0
+    for move in moves:
+        position.make(move)
+        nodes += perft(position, depth - 1)
+        position.unmake()
+    return nodes
+
+
+def divide(position, depth):
+    """Leaf counts below every root move, for finding a faulty move
+
+    Returns:
+        dict: UCI move -> number of leaf nodes
+    """
+    counts = {}
+    for move in position.legal_moves():
+        position.make(move)
+        counts[move_to_uci(move)] = perft(position, depth - 1) if depth > 1 else 1
+        position.unmake()
+    return counts
+
+
+def benchmark(fen=START_FEN, depth=4):
+    """Run perft once and time it
+
+    Returns:
+        dict: nodes, seconds and nodes_per_second
+    """
+    position = Position(fen)
+    start = time.perf_counter()
+    nodes = perft(position, depth)
+    seconds = time.perf_counter() - start
+    return {
+        'nodes': nodes,
+        'seconds': seconds,
+        'nodes_per_second': nodes / seconds if seconds > 0 else 0.0
+    }
+
+
+def run_suite(max_nodes=1000000):
+    """Check every suite position at each depth whose count is at most max_nodes
+
+    Returns:
+        bool: True when every count matched
+    """
+    passed = True
+    total_nodes = 0
+    total_seconds = 0.0
+    for name, fen, counts in PERFT_SUITE:
+        for depth, expected in enumerate(counts, 1):
+            if expected > max_nodes:
+                break
+            result = benchmark(fen, depth)
+            ok = result['nodes'] == expected
+            passed = passed and ok
+            total_nodes += result['nodes']
+            total_seconds += result['seconds']
+            print(f"{name:<20} depth {depth}  {result['nodes']:>9} / {expected:<9} "
+                  f"{'OK  ' if ok else 'FAIL'} {result['nodes_per_second']:>10.0f} nodes/s")
+    if total_seconds > 0:
+        print(f"Total: {total_nodes} nodes in {total_seconds:.2f}s "
+              f"({total_nodes / total_seconds:.0f} nodes/s)")
+    return passed
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Perft for the Chess move generator')
+    parser.add_argument('--fen', type=str, default=None,
+                        help='Position to count (runs the whole suite when omitted)')
+    parser.add_argument('--depth', type=int, default=None,
+                        help='Depth to count to')
+    parser.add_argument('--divide', action='store_true',
+                        help='Print the count below every root move')
+    parser.add_argument('--max-nodes', type=int, default=1000000,
+                        help='Largest expected count the suite will run')
+    args = parser.parse_args()
+
+    if args.fen is None and args.depth is None and not args.divide:
+        return 0 if run_suite(args.max_nodes) else 1
+
+    fen = args.fen or START_FEN
+    depth = args.depth or 4
+    if args.divide:
+        position = Position(fen)
+        start = time.perf_counter()
+        counts = divide(position, depth)
+        seconds = time.perf_counter() - start
+        for move in sorted(counts):
+            print(f"{move}: {counts[move]}")
+        nodes = sum(counts.values())
+        print(f"\nMoves: {len(counts)}")
+        print(f"Nodes: {nodes}")
+        print(f"Time: {seconds:.2f}s ({nodes / seconds if seconds > 0 else 0.0:.0f} nodes/s)")
+    else:
+        result = benchmark(fen, depth)
+        print(f"Nodes: {result['nodes']}")
+        print(f"Time: {result['seconds']:.2f}s ({result['nodes_per_second']:.0f} nodes/s)")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
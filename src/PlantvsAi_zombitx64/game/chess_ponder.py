@@ -0,0 +1,128 @@
+"""
+Pondering for the Chess engine
+
+After the AI moves, the reply it expects from the player (the second move
+of its principal variation) is played on a private board and searched in
+a background thread while the player thinks. The search shares the game's
+transposition table, so even a wrong guess leaves useful entries behind,
+and a right guess leaves a finished answer that ai_move_minimax can play
+at once.
+
+Pondering runs only while the player is thinking: every search on the
+game's own board stops it first, so the two never touch the shared table
+at the same time. Each ponder is capped in time, each game in total
+pondering time, and only a few games in the process may ponder at once,
+so one game cannot starve the others.
+"""
+import threading
+import time
+
+from chess_bitboard import Position
+from chess_eval import PawnHashTable, side_to_move_evaluator
+from chess_search import ChessSearch
+from chess_tablebase import get_default_tablebase
+from transposition import NO_MOVE
+
+PONDER_TIME_LIMIT = 10.0       # Seconds for one ponder
+SESSION_PONDER_BUDGET = 120.0  # Seconds of pondering for one game
+MAX_PONDERING_GAMES = 2        # Games in this process that may ponder at the same time
+
+_pondering_slots = threading.BoundedSemaphore(MAX_PONDERING_GAMES)
+
+
+class Ponderer:
+    """
+    Background search of the position after the expected reply
+    """
+    def __init__(self, tt, time_limit=PONDER_TIME_LIMIT, budget=SESSION_PONDER_BUDGET):
+        """
+        Args:
+            tt: TranspositionTable of the game, filled while pondering
+            time_limit: Seconds for one ponder
+            budget: Seconds of pondering for one game
+        """
+        self.position = Position()
+        self.pawn_table = PawnHashTable()
+        self.network = None
+        evaluate = side_to_move_evaluator(self.position, self.pawn_table)
+        self.searcher = ChessSearch(self.position, evaluate, tt, get_default_tablebase())
+        self.time_limit = time_limit
+        self.budget = budget
+        self.used = 0.0
+        self.answer = None  # (position key, depth, move, score) of the last finished ponder
+        self._thread = None
+
+    def new_session(self):
+        """Stop pondering and give a new game its full budget"""
+        self.stop()
+        self.used = 0.0
+        self.answer = None
+
+    def start(self, position, predicted_move, depth, options=None, network=None):
+        """Start pondering the position after the predicted move
+
+        Args:
+            position: chess_bitboard.Position of the game (not modified)
+            predicted_move: Packed move the player is expected to play
+            depth: Depth to search the position after it to
+            options: Keyword arguments for ChessSearch.configure
+            network: chess_nnue.Network the game evaluates with, or None
+
+        Returns:
+            bool: True if pondering started, False when the budget is spent
+                  or too many games are pondering already
+        """
+        self.stop()
+        remaining = self.budget - self.used
+        if remaining <= 0 or not _pondering_slots.acquire(blocking=False):
+            return False
+
+        if network is not self.network:
+            # Score like the game does, the two share one transposition table
+            self.searcher.evaluate = side_to_move_evaluator(self.position, self.pawn_table, network)
+            self.network = network
+        ponder_position = self.position
+        ponder_position.set_fen(position.start_fen)
+        for record in position.history:
+            ponder_position.make(record[0])
+        ponder_position.make(predicted_move)
+        self.answer = None
+        self.searcher.configure(**(options or {}))
+        self.searcher.stop_requested = False
+        self._thread = threading.Thread(target=self._run, args=(depth, min(self.time_limit, remaining)),
+                                        daemon=True)
+        self._thread.start()
+        return True
+
+    def _run(self, depth, time_limit):
+        """Thread body: search until done, stopped or out of time"""
+        started = time.perf_counter()
+        try:
+            move, score = self.searcher.search(depth, time_limit=time_limit)
+            if self.searcher.completed_depth and move != NO_MOVE:
+                self.answer = (self.position.key, self.searcher.completed_depth, move, score)
+        finally:
+            self.used += time.perf_counter() - started
+            _pondering_slots.release()
+
+    def stop(self):
+        """Stop pondering and wait until the thread has let go of the table"""
+        if self._thread is not None:
+            self.searcher.stop()
+            self._thread.join()
+            self._thread = None
+
+    def is_pondering(self):
+        """True while the background search is running"""
+        return self._thread is not None and self._thread.is_alive()
+
+    def get_answer(self, key, depth):
+        """Move found while pondering, if it was for this position and searched deep enough
+
+        Returns:
+            tuple: (packed move, score for the side to move) or None
+        """
+        answer = self.answer
+        if answer is not None and answer[0] == key and answer[1] >= depth:
+            return answer[2], answer[3]
+        return None
@@ -0,0 +1,518 @@
+"""
+Alpha-beta search for the Chess engine
+
+ChessSearch runs a negamax alpha-beta search with iterative deepening on a
+chess_bitboard.Position, playing and taking back moves in place. Scores
+inside the search are always from the point of view of the side to move;
+Chess.minimax converts them to the AI's (black's) point of view.
+
+Moves are searched in this order so cutoffs come early:
+
+    1. the hash move stored in the transposition table
+    2. captures, most valuable victim first, then least valuable attacker
+       (MVV-LVA), and queen promotions
+    3. the two killer moves of the current ply (quiet moves that caused a
+       cutoff in a sibling node)
+    4. the remaining quiet moves by butterfly history score
+
+At depth 0 a quiescence search keeps playing captures until the position
+is quiet, so the static evaluation is never taken in the middle of an
+exchange. Quiescence nodes are counted apart from main-search nodes.
+A position that repeats one seen earlier in the game or the search, or
+that reaches the fifty-move limit, scores as a draw.
+
+Three selective-search features can be switched on per difficulty:
+
+    null_move_pruning           let the opponent move twice; if a shallow
+                                search still fails high, cut the node
+    late_move_reductions        search late quiet moves shallower and
+                                re-search them only when they fail high
+    principal_variation_search  search moves after the first with a zero
+                                window and re-search only the ones that
+                                turn out better
+"""
+import time
+from array import array
+
+from chess_bitboard import PAWN, KING, NO_PIECE, SEE_VALUES, NULL_MOVE
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
+
+# Score for delivering checkmate (piece values are in pawns)
+MATE_SCORE = 1000
+# Scores beyond this are mates and are stored relative to the node in the TT
+MATE_BOUND = MATE_SCORE - 500
+INFINITY = float('inf')
+MAX_PLY = 64
+
+# Move ordering scores, packed above the 16 move bits so a plain integer
+# sort orders the moves
+HASH_MOVE_ORDER = 1 << 30
+CAPTURE_ORDER = 1 << 28
+KILLER_ORDER = (1 << 27, (1 << 27) - 1)
+HISTORY_MAX = 1 << 20  # History scores are halved when one reaches this
+
+# Quiescence search: skip captures that cannot lift the score to alpha even
+# when the captured piece is won for free plus this margin (in pawns)
+DELTA_MARGIN = 2
+
+# Width of a zero window; scores are in pawns, in steps far coarser than this
+ZERO_WINDOW = 0.001
+NULL_MOVE_MIN_DEPTH = 3
+LMR_MIN_DEPTH = 3
+LMR_MIN_MOVES = 3  # Moves searched at full depth before reductions start
+CLOCK_CHECK_NODES = 1024  # Nodes between two looks at the time and node limits
+
+
+class SearchStopped(Exception):
+    """Raised inside the search when it has been told to stop"""
+
+
+def _score_to_tt(score, ply):
+    """Make a mate score relative to the node before storing it"""
+    if score > MATE_BOUND:
+        return score + ply
+    if score < -MATE_BOUND:
+        return score - ply
+    return score
+
+
+def _score_from_tt(score, ply):
+    """Turn a stored mate score back into one relative to the root"""
+    if score > MATE_BOUND:
+        return score - ply
+    if score < -MATE_BOUND:
+        return score + ply
+    return score
+
+
+def _tablebase_score(result, ply):
+    """Search score of an endgame table result (outcome, plies to mate)"""
+    outcome, plies = result
+    if outcome == 0:
+        return 0
+    return outcome * (MATE_SCORE - ply - plies)
+
+
+class ChessSearch:
+    """
+    Negamax alpha-beta search with a transposition table and move ordering
+
+    The search owns the state that lives across nodes and searches:
+    killer moves per ply, the butterfly history table (indexed by side,
+    from square and to square) and node counters for the main and the
+    quiescence search. Positions covered by the endgame tables are scored
+    exactly instead of searched.
+    """
+    def __init__(self, position, evaluate, tt=None, tablebase=None):
+        """
+        Args:
+            position: chess_bitboard.Position to search (modified in place and restored)
+            evaluate: Callable returning the static score for the side to move
+            tt: TranspositionTable to share, a new one by default
+            tablebase: chess_tablebase.Tablebase to probe, or None
+        """
+        self.position = position
+        self.evaluate = evaluate
+        self.tt = tt if tt is not None else TranspositionTable()
+        self.tablebase = tablebase
+        self.killers = [[NO_MOVE, NO_MOVE] for _ in range(MAX_PLY)]
+        self.history = array('l', [0]) * (2 * 4096)
+        self.nodes = 0
+        self.qnodes = 0
+        self.tb_hits = 0
+        self.root_move = NO_MOVE
+        self.excluded_root_moves = ()  # Root moves left out, for multi-PV
+        self.completed_depth = 0
+        self.stop_requested = False  # Set from another thread to end the search early
+        self.deadline = None
+        self.node_limit = None
+        self.null_move_pruning = False
+        self.late_move_reductions = False
+        self.principal_variation_search = False
+
+    def configure(self, null_move_pruning=False, late_move_reductions=False,
+                  principal_variation_search=False):
+        """Switch the selective-search features on or off"""
+        self.null_move_pruning = null_move_pruning
+        self.late_move_reductions = late_move_reductions
+        self.principal_variation_search = principal_variation_search
+
+    def new_search(self):
+        """Prepare for a new search from the current position"""
+        self.tt.new_search()
+        for killers in self.killers:
+            killers[0] = killers[1] = NO_MOVE
+        # Keep what history learned last move, but let the new position outweigh it
+        history = self.history
+        for index in range(len(history)):
+            history[index] >>= 1
+        self.nodes = 0
+        self.qnodes = 0
+        self.tb_hits = 0
+        self.root_move = NO_MOVE
+
+    def search(self, depth, alpha=-INFINITY, beta=INFINITY, time_limit=None, node_limit=None):
+        """Search the position with iterative deepening
+
+        Each iteration leaves its best moves in the transposition table,
+        where the next, deeper iteration picks them up as hash moves.
+        When stop() is called or the time or node limit runs out, the
+        unfinished iteration is dropped and the last finished one is
+        returned (completed_depth tells which).
+
+        Args:
+            depth: Depth of the last iteration
+            alpha, beta: Search window for the side to move
+            time_limit: Seconds the search may take, or None for no limit
+            node_limit: Main-search nodes the search may visit, or None for no limit
+
+        Returns:
+            tuple: (packed best move or NO_MOVE, score for the side to move)
+        """
+        self.new_search()
+        self.completed_depth = 0
+        self.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        self.node_limit = node_limit
+        history_length = len(self.position.history)
+        best_move = NO_MOVE
+        score = self.evaluate()
+        try:
+            for iteration in range(1, depth + 1):
+                self.root_move = NO_MOVE
+                score = self.negamax(iteration, alpha, beta, 0)
+                if self.root_move != NO_MOVE:
+                    best_move = self.root_move
+                self.completed_depth = iteration
+        except SearchStopped:
+            self._take_back(history_length)
+        finally:
+            self.deadline = None
+            self.node_limit = None
+        return best_move, score
+
+    def search_multipv(self, depth, lines, time_limit=None, node_limit=None):
+        """Search for the best few root moves, each with its own score and line
+
+        Every iteration searches the root once per line with a full window,
+        leaving out the root moves already found in that iteration, so the
+        n-th line is the best move after the first n - 1. Limits work as in
+        search(); the last finished iteration is returned.
+
+        Args:
+            depth: Depth of the last iteration
+            lines: Number of root moves wanted
+            time_limit: Seconds the search may take, or None for no limit
+            node_limit: Main-search nodes the search may visit, or None for no limit
+
+        Returns:
+            list: (score for the side to move, principal variation as a list of
+                  packed moves) per line, best first; shorter when there are
+                  fewer legal moves
+        """
+        self.new_search()
+        self.completed_depth = 0
+        self.deadline = time.perf_counter() + time_limit if time_limit is not None else None
+        self.node_limit = node_limit
+        history_length = len(self.position.history)
+        found = []
+        try:
+            for iteration in range(1, depth + 1):
+                current = []
+                excluded = set()
+                self.excluded_root_moves = excluded
+                for _ in range(lines):
+                    self.root_move = NO_MOVE
+                    score = self.negamax(iteration, -INFINITY, INFINITY, 0)
+                    move = self.root_move
+                    if move == NO_MOVE:
+                        break
+                    # Read the line now, before later searches overwrite its entries
+                    current.append((score, self.principal_variation(move)))
+                    excluded.add(move)
+                # Reductions can score a later line a little above an earlier one
+                current.sort(key=lambda line: -line[0])
+                found = current
+                self.completed_depth = iteration
+        except SearchStopped:
+            self._take_back(history_length)
+        finally:
+            self.excluded_root_moves = ()
+            self.deadline = None
+            self.node_limit = None
+        return found
+
+    def principal_variation(self, move, max_length=MAX_PLY):
+        """The move followed by the best moves stored in the transposition table
+
+        The line ends at a missing or illegal stored move and at a repeated
+        position.
+        """
+        position = self.position
+        line = [move]
+        position.make(move)
+        while len(line) < max_length and not position.is_repetition():
+            reply = self.tt.best_move(position.key)
+            if reply == NO_MOVE or reply not in position.legal_moves():
+                break
+            line.append(reply)
+            position.make(reply)
+        for _ in line:
+            position.unmake()
+        return line
+
+    def _take_back(self, history_length):
+        """Unmake the moves an interrupted search left on the board"""
+        history = self.position.history
+        while len(history) > history_length:
+            if history[-1][0] == NULL_MOVE:
+                self.position.unmake_null()
+            else:
+                self.position.unmake()
+
+    def stop(self):
+        """Ask a running search to return as soon as possible"""
+        self.stop_requested = True
+
+    def _out_of_budget(self):
+        """True once the time or node limit of the search is used up"""
+        return ((self.deadline is not None and time.perf_counter() >= self.deadline) or
+                (self.node_limit is not None and self.nodes >= self.node_limit))
+
+    def probe_root(self):
+        """Best move straight from the endgame tables
+
+        Returns:
+            tuple: (packed move, score for the side to move), or None when
+                   the position is not in the tables
+        """
+        if self.tablebase is None:
+            return None
+        found = self.tablebase.probe_root(self.position)
+        if found is None:
+            return None
+        move, result = found
+        return move, _tablebase_score(result, 0)
+
+    def negamax(self, depth, alpha, beta, ply, allow_null=True):
+        """Score the position for the side to move"""
+        position = self.position
+        if ply > 0 and (position.halfmove >= 100 or position.is_repetition()):
+            # A repeated position is a draw; searching the cycle again finds nothing new
+            return 0
+        if ply > 0 and self.tablebase is not None:
+            result = self.tablebase.probe(position)
+            if result is not None:
+                self.tb_hits += 1
+                return _tablebase_score(result, ply)
+        if depth <= 0:
+            return self.quiesce(alpha, beta, ply)
+        self.nodes += 1
+        if self.stop_requested or (not self.nodes % CLOCK_CHECK_NODES and self._out_of_budget()):
+            raise SearchStopped
+
+        key = position.key
+        alpha_orig = alpha
+
+        # Transposition table: reuse results for positions reached before
+        hash_move = NO_MOVE
+        entry = self.tt.probe(key)
+        if entry is not None:
+            tt_depth, tt_flag, tt_score, hash_move = entry
+            if ply > 0 and tt_depth >= depth:
+                tt_score = _score_from_tt(tt_score, ply)
+                if (tt_flag == EXACT or
+                        (tt_flag == LOWER_BOUND and tt_score >= beta) or
+                        (tt_flag == UPPER_BOUND and tt_score <= alpha)):
+                    return tt_score
+
+        in_check = position.in_check()
+
+        # Null move: if passing still leaves us above beta, a real move will too.
+        # With only king and pawns left passing may be the better move
+        # (zugzwang), so the test would lie there.
+        if (self.null_move_pruning and allow_null and ply > 0 and not in_check and
+                depth >= NULL_MOVE_MIN_DEPTH and beta < MATE_BOUND and
+                position.occ[position.side] & ~(position.bb[position.side * 6 + PAWN] |
+                                                 position.bb[position.side * 6 + KING]) and
+                self.evaluate() >= beta):
+            reduction = 3 if depth > 6 else 2
+            position.make_null()
+            score = -self.negamax(depth - 1 - reduction, -beta, -beta + ZERO_WINDOW, ply + 1, False)
+            position.unmake_null()
+            if score >= beta:
+                return beta if score > MATE_BOUND else score
+
+        moves = position.legal_moves()
+        if not moves:
+            # Checkmate or stalemate; prefer faster mates and slower losses
+            return -(MATE_SCORE - ply) if in_check else 0
+        if ply == 0 and self.excluded_root_moves:
+            moves = [move for move in moves if move not in self.excluded_root_moves]
+            if not moves:
+                return -INFINITY
+
+        killers = self.killers[ply] if ply < MAX_PLY else ()
+        best_score = -INFINITY
+        best_move = NO_MOVE
+        searched = 0
+        for move in self.order_moves(moves, hash_move, ply):
+            position.make(move)
+            if searched == 0:
+                score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            else:
+                # Late quiet moves that do not give check are searched shallower
+                reduction = 0
+                if (self.late_move_reductions and depth >= LMR_MIN_DEPTH and
+                        searched >= LMR_MIN_MOVES and move < 0x4000 and not in_check and
+                        move not in killers and not position.in_check()):
+                    reduction = 1 if searched < 2 * LMR_MIN_MOVES else 2
+
+                if self.principal_variation_search:
+                    window = min(alpha + ZERO_WINDOW, beta)
+                    score = -self.negamax(depth - 1 - reduction, -window, -alpha, ply + 1)
+                    if reduction and score > alpha:
+                        score = -self.negamax(depth - 1, -window, -alpha, ply + 1)
+                    if alpha < score < beta:
+                        score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+                else:
+                    score = -self.negamax(depth - 1 - reduction, -beta, -alpha, ply + 1)
+                    if reduction and score > alpha:
+                        score = -self.negamax(depth - 1, -beta, -alpha, ply + 1)
+            position.unmake()
+            searched += 1
+
+            if score > best_score:
+                best_score = score
+                best_move = move
+                if ply == 0:
+                    self.root_move = move
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        if move < 0x4000:  # Quiet move: no capture, no promotion
+                            self._update_quiet_cutoff(move, depth, ply)
+                        break
+
+        if best_score <= alpha_orig:
+            flag = UPPER_BOUND
+        elif best_score >= beta:
+            flag = LOWER_BOUND
+        else:
+            flag = EXACT
+        if ply == 0 and self.excluded_root_moves:
+            return best_score  # Not the score of the whole position
+        self.tt.store(key, depth, flag, _score_to_tt(best_score, ply), best_move)
+        return best_score
+
+    def quiesce(self, alpha, beta, ply):
+        """Search captures only until the position is quiet
+
+        The side to move may stand pat on the static evaluation instead of
+        capturing. In check there is no standing pat: every evasion is
+        searched so mates are still found.
+        """
+        self.qnodes += 1
+        position = self.position
+        if ply >= MAX_PLY:
+            return self.evaluate()
+
+        in_check = position.in_check()
+        if in_check:
+            moves = position.legal_moves()
+            if not moves:
+                return -(MATE_SCORE - ply)
+            best_score = -INFINITY
+            stand_pat = None
+        else:
+            stand_pat = self.evaluate()
+            if stand_pat >= beta:
+                return stand_pat
+            if stand_pat > alpha:
+                alpha = stand_pat
+            best_score = stand_pat
+            moves = position.legal_moves(captures_only=True)
+
+        squares = position.squares
+        for move in self.order_moves(moves, NO_MOVE, ply):
+            if not in_check:
+                if move & 0x8000 and (move >> 12) & 3 != 3:
+                    continue  # Under-promotions never matter here
+                # Delta pruning: even winning the piece for free stays below alpha
+                victim = squares[(move >> 6) & 63]
+                gain = SEE_VALUES[victim % 6] if victim != NO_PIECE else SEE_VALUES[PAWN]
+                if not move & 0x8000 and stand_pat + gain + DELTA_MARGIN <= alpha:
+                    continue
+                # Losing captures only lose more material
+                if position.see(move) < 0:
+                    continue
+
+            position.make(move)
+            score = -self.quiesce(-beta, -alpha, ply + 1)
+            position.unmake()
+
+            if score > best_score:
+                best_score = score
+                if score > alpha:
+                    alpha = score
+                    if alpha >= beta:
+                        break
+        return best_score
+
+    def stats(self):
+        """Counters of the last search
+
+        Returns:
+            dict: nodes, qnodes, endgame table hits and the transposition table counters
+        """
+        return {
+            'nodes': self.nodes,
+            'qnodes': self.qnodes,
+            'tb_hits': self.tb_hits,
+            'tt': self.tt.stats()
+        }
+
+    def order_moves(self, moves, hash_move, ply):
+        """Return the moves sorted best-first for searching"""
+        squares = self.position.squares
+        killer_1, killer_2 = self.killers[ply] if ply < MAX_PLY else (NO_MOVE, NO_MOVE)
+        history = self.history
+        side = self.position.side << 12
+        keyed = []
+        for move in moves:
+            if move == hash_move:
+                order = HASH_MOVE_ORDER
+            elif move & 0x4000:
+                # MVV-LVA; en passant leaves the target square empty
+                victim = squares[(move >> 6) & 63]
+                victim_type = victim % 6 if victim != NO_PIECE else PAWN
+                order = CAPTURE_ORDER + ((victim_type + 1) << 3) - squares[move & 63] % 6
+                if move & 0x8000:
+                    order += (move >> 12) & 3  # Prefer the capture that promotes to a queen
+            elif move & 0x8000:
+                # Quiet promotions: a queen promotion ranks with the captures,
+                # under-promotions go last
+                order = CAPTURE_ORDER + 40 if (move >> 12) & 3 == 3 else 0
+            elif move == killer_1:
+                order = KILLER_ORDER[0]
+            elif move == killer_2:
+                order = KILLER_ORDER[1]
+            else:
+                order = history[side | (move & 0xFFF)]
+            keyed.append((order << 16) | move)
+        keyed.sort(reverse=True)
+        return [entry & 0xFFFF for entry in keyed]
+
+    def _update_quiet_cutoff(self, move, depth, ply):
+        """Remember a quiet move that refuted the previous move"""
+        if ply < MAX_PLY:
+            killers = self.killers[ply]
+            if killers[0] != move:
+                killers[1] = killers[0]
+                killers[0] = move
+
+        history = self.history
+        index = (self.position.side << 12) | (move & 0xFFF)
+        history[index] += depth * depth
+        if history[index] >= HISTORY_MAX:
+            for i in range(len(history)):
+                history[i] >>= 1
@@ -0,0 +1,130 @@
+"""
+Live Chess games of the web server
+
+The /api/chess/* routes keep one Chess object per browser session instead
+of rebuilding a game from the board the client sends. A Chess object is
+costly to build (game settings, stats file, transposition table), and its
+transposition table, pawn hash table and pondering only pay off when the
+same object sees the whole game.
+
+A game that has not been used for IDLE_TTL seconds is evicted, and so is
+the least recently used game once more than MAX_GAMES are live.
+Each game has its own lock, so two requests for one game (a double click,
+say) take turns instead of corrupting the board.
+"""
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+
+from chess import Chess
+
+IDLE_TTL = 30 * 60.0  # Seconds a game may sit unused
+MAX_GAMES = 64         # Live games before the least recently used one is evicted
+DEFAULT_DIFFICULTY = 'medium'
+
+
+class _Entry:
+    """A live game with its lock and the time it was last used"""
+    __slots__ = ('game', 'lock', 'last_used')
+
+    def __init__(self, game):
+        self.game = game
+        self.lock = threading.Lock()
+        self.last_used = time.monotonic()
+
+
+class ChessSessionRegistry:
+    """
+    Session id -> live Chess game, with idle-TTL and LRU eviction
+    """
+    def __init__(self, ttl=IDLE_TTL, max_games=MAX_GAMES):
+        """
+        Args:
+            ttl: Seconds a game may sit unused before it is evicted
+            max_games: Live games kept at most
+        """
+        self.ttl = ttl
+        self.max_games = max_games
+        self.entries = OrderedDict()  # Least recently used first
+        self.created = 0
+        self.reused = 0
+        self.evicted = 0
+        self._lock = threading.Lock()
+
+    def new_game(self, session_id, difficulty=DEFAULT_DIFFICULTY):
+        """Start a new game for the session, reusing its engine when it has one
+
+        Returns:
+            Chess: The game, reset and set to the difficulty
+        """
+        with self._lock:
+            self._evict_idle()
+            entry = self.entries.get(session_id)
+            if entry is None:
+                entry = self.entries[session_id] = _Entry(Chess())
+                self.created += 1
+            else:
+                self.reused += 1
+            self.entries.move_to_end(session_id)
+            entry.last_used = time.monotonic()
+            while len(self.entries) > self.max_games:
+                self._evict(next(iter(self.entries)))
+
+        with entry.lock:
+            game = entry.game
+            game.reset_game()
+            game.set_difficulty(difficulty)
+        return game
+
+    @contextmanager
+    def use(self, session_id):
+        """Hold the session's game for one request
+
+        Yields:
+            Chess: The game, or None when the session has none (never
+                   started, or evicted)
+        """
+        with self._lock:
+            self._evict_idle()
+            entry = self.entries.get(session_id)
+            if entry is not None:
+                self.entries.move_to_end(session_id)
+                entry.last_used = time.monotonic()
+        if entry is None:
+            yield None
+            return
+        with entry.lock:
+            yield entry.game
+        entry.last_used = time.monotonic()
+
+    def remove(self, session_id):
+        """End a session's game"""
+        with self._lock:
+            if session_id in self.entries:
+                self._evict(session_id)
+
+    def _evict_idle(self):
+        """Drop the games unused for longer than the TTL; the caller holds the lock"""
+        expired = time.monotonic() - self.ttl
+        for session_id in [key for key, entry in self.entries.items() if entry.last_used < expired]:
+            self._evict(session_id)
+
+    def _evict(self, session_id):
+        """Drop one game and stop its background search"""
+        entry = self.entries.pop(session_id)
+        entry.game.ponderer.stop()
+        self.evicted += 1
+
+    def stats(self):
+        """Counters for monitoring the registry
+
+        Returns:
+            dict: live, created, reused and evicted games
+        """
+        return {
+            'live': len(self.entries),
+            'created': self.created,
+            'reused': self.reused,
+            'evicted': self.evicted
+        }
@@ -0,0 +1,695 @@
+"""
+Endgame tables for the Chess engine
+
+Retrograde analysis solves every position of a small ending exactly: the
+three-man KQK, KRK and KPK and the four-man KBNK shipped in
+data/tablebase, and other four-man endings such as KQKR and KRKP
+(``make tablebase``). Captures and promotions leave the ending, so the
+endings they lead to are solved first and their results are simply
+read. Within the ending the solver starts from the checkmates and the
+positions whose result is already known, and walks moves backwards one
+ply at a time: a position is won for the side to move as soon as one
+move reaches a position lost for the other side, and lost once every
+move reaches a won one. Whatever is left unresolved is a draw.
+
+An ending is named after its men, the stronger side first (``KRKP``:
+king and rook against king and pawn), and its table has the stronger
+side as white; a position with the colours the other way round is
+flipped top to bottom, with the colours swapped, before probing.
+Pawnless positions are also turned and mirrored until the white king
+stands in the a1-d1-d4 triangle, positions with pawns mirrored until it
+is on files a-d. A position is numbered by the white king's place among
+those squares, then the squares of the black king and of the other men,
+white's before black's and strongest first (pawns only on ranks 2 to 7).
+
+Each ending is one file, holding an entry per index with white to move,
+then one per index with black to move, packed into as few bits as the
+longest result needs::
+
+    header  8 bytes  b'CETB', bits per entry, format version, 2 bytes padding
+    data    little-endian bits
+
+An entry is the number of plies until mate plus one, 0 for a draw: an
+odd number of plies is a win for the side to move, an even one a loss
+(as in checkers_endgame). Castling, en passant and the fifty-move rule
+are not modelled.
+
+Generate the tables (three men take a few seconds, four men about an
+hour in all) with:
+    python chess_tablebase.py data/tablebase --pieces 4
+"""
+import argparse
+import mmap
+import os
+import struct
+import time
+
+from chess_bitboard import (
+    WHITE, BLACK, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, PIECE_TYPES,
+    KING_ATTACKS, KNIGHT_ATTACKS, PAWN_ATTACKS, rook_attacks, bishop_attacks
+)
+
+HEADER = struct.Struct('<4sBB2x')
+MAGIC = b'CETB'
+FORMAT_VERSION = 2
+_WORD = struct.Struct('<H')
+
+DEFAULT_PIECES = 3
+# The endings generate_all() writes for each number of men; the endings
+# their captures and promotions lead to are written along with them
+ENDINGS = {
+    3: ('KQK', 'KRK', 'KPK'),
+    4: ('KQKR', 'KRKP', 'KBNK'),
+}
+DRAWN_ENDINGS = ('KK', 'KBK', 'KNK')  # Neither side can ever mate
+DEFAULT_TABLE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'tablebase')
+
+WIN, DRAW, LOSS = 1, 0, -1
+
+_PROMOTIONS = (QUEEN, ROOK, BISHOP, KNIGHT)
+_MATERIAL = (1, 3, 3, 5, 9)  # Ranks the two sides of an ending
+_NEVER_LOST = 128  # More than the moves any position has
+
+
+def _transform(sq, flip_files, flip_ranks, transpose):
+    """Square sq under a symmetry of the board"""
+    row, col = divmod(sq, 8)
+    if flip_files:
+        col = 7 - col
+    if flip_ranks:
+        row = 7 - row
+    if transpose:
+        # Reflect in the a1-h8 diagonal
+        row, col = 7 - col, 7 - row
+    return row * 8 + col
+
+
+def _symmetry(transforms, region):
+    """Per white king square, the square map that brings it into region"""
+    maps = [[_transform(sq, *transform) for sq in range(64)] for transform in transforms]
+    return [next(square_map for square_map in maps if square_map[sq] in region) for sq in range(64)]
+
+
+# The a1-d1-d4 triangle (square 0 is a8), and files a-d
+_TRIANGLE = [row * 8 + col for row in range(8) for col in range(4) if 7 - row <= col]
+_QUEENSIDE = [row * 8 + col for row in range(8) for col in range(4)]
+_PAWNLESS_SYMMETRY = _symmetry([(files, ranks, transpose) for transpose in (False, True)
+                                for ranks in (False, True) for files in (False, True)], _TRIANGLE)
+_PAWN_SYMMETRY = _symmetry([(False, False, False), (True, False, False)], _QUEENSIDE)
+# A king on the a1-h8 diagonal stays in the triangle when the board is reflected in it
+_DIAGONAL = [sq for sq in _TRIANGLE if 7 - (sq >> 3) == sq & 7]
+_REFLECTED = [_transform(sq, False, False, True) for sq in range(64)]
+
+
+def _side_name(types):
+    return 'K' + ''.join(PIECE_TYPES[piece_type] for piece_type in sorted(types, reverse=True))
+
+
+def ending_name(white, black):
+    """Name of the ending with these men besides the kings
+
+    Args:
+        white, black: Piece types of each side's other men
+
+    Returns:
+        tuple: (name, True when the table has the colours swapped)
+    """
+    white_rank = (sum(_MATERIAL[piece_type] for piece_type in white), sorted(white, reverse=True))
+    black_rank = (sum(_MATERIAL[piece_type] for piece_type in black), sorted(black, reverse=True))
+    if black_rank > white_rank:
+        return _side_name(black) + _side_name(white), True
+    return _side_name(white) + _side_name(black), False
+
+
+def _name_types(name):
+    """Piece types of white's and black's other men in an ending name"""
+    white, black = name[1:].split('K', 1)
+    return [PIECE_TYPES.index(char) for char in white], [PIECE_TYPES.index(char) for char in black]
+
+
+def is_ending_name(name):
+    """True for a well-formed ending name such as 'KRKP'"""
+    if name.count('K') != 2 or not name.startswith('K'):
+        return False
+    white, black = name[1:].split('K', 1)
+    return all(char in 'QRBNP' for char in white + black) and ending_name(*_name_types(name))[0] == name
+
+
+def _attacks(piece_type, color, sq, occupied):
+    """Squares a piece on sq attacks"""
+    if piece_type == KING:
+        return KING_ATTACKS[sq]
+    if piece_type == KNIGHT:
+        return KNIGHT_ATTACKS[sq]
+    if piece_type == BISHOP:
+        return bishop_attacks(sq, occupied)
+    if piece_type == ROOK:
+        return rook_attacks(sq, occupied)
+    if piece_type == QUEEN:
+        return rook_attacks(sq, occupied) | bishop_attacks(sq, occupied)
+    return PAWN_ATTACKS[color][sq]
+
+
+class Ending:
+    """
+    The men of one table and the numbering of their positions
+
+    ``men`` lists (colour, piece type) per man: the white king, the black
+    king, then white's and black's other men, strongest first. A placement
+    is a list with the square of every man in that order, -1 once the man
+    has been captured.
+    """
+    def __init__(self, name):
+        """
+        Args:
+            name: Ending name with the stronger side first, e.g. 'KRKP'
+        """
+        white, black = _name_types(name)
+        self.name = name
+        self.men = ([(WHITE, KING), (BLACK, KING)] + [(WHITE, piece_type) for piece_type in white] +
+                    [(BLACK, piece_type) for piece_type in black])
+        pawns = PAWN in white or PAWN in black
+        self.diagonal = () if pawns else _DIAGONAL
+        self.symmetry = _PAWN_SYMMETRY if pawns else _PAWNLESS_SYMMETRY
+        self.king_squares = _QUEENSIDE if pawns else _TRIANGLE
+        self.king_index = {sq: index for index, sq in enumerate(self.king_squares)}
+        # Pawns stand on squares 8 to 55 only
+        self.offsets = [8 if piece_type == PAWN else 0 for _, piece_type in self.men[1:]]
+        self.radixes = [48 if piece_type == PAWN else 64 for _, piece_type in self.men[1:]]
+        self.size = len(self.king_squares)
+        for radix in self.radixes:
+            self.size *= radix
+        # Men of the same kind are interchangeable: their squares are sorted
+        self.twins = []
+        start = 2
+        for end in range(3, len(self.men) + 1):
+            if end == len(self.men) or self.men[end] != self.men[start]:
+                if end - start > 1:
+                    self.twins.append((start, end))
+                start = end
+
+    def index(self, squares):
+        """Index of a placement, after bringing it to its symmetric standard form
+
+        Every placement the symmetries turn into one another gets the same
+        index; placement(index) gives that standard form back.
+        """
+        square_map = self.symmetry[squares[0]]
+        squares = [square_map[sq] for sq in squares]
+        index = self._number(squares)
+        if squares[0] in self.diagonal:
+            # Both this placement and its reflection have the king in the triangle
+            index = min(index, self._number([_REFLECTED[sq] for sq in squares]))
+        return index
+
+    def _number(self, squares):
+        """Index of a placement with the white king in its region"""
+        for start, end in self.twins:
+            squares[start:end] = sorted(squares[start:end])
+        index = self.king_index[squares[0]]
+        for sq, offset, radix in zip(squares[1:], self.offsets, self.radixes):
+            index = index * radix + sq - offset
+        return index
+
+    def placement(self, index):
+        """Placement numbered index, or None when men share a square
+
+        Indices that are not a standard form (see index()) decode to
+        placements whose index() is another number.
+        """
+        squares = []
+        for offset, radix in zip(reversed(self.offsets), reversed(self.radixes)):
+            index, sq = divmod(index, radix)
+            squares.append(sq + offset)
+        squares.append(self.king_squares[index])
+        squares.reverse()
+        if len(set(squares)) != len(squares):
+            return None
+        return squares
+
+
+def _occupancy(squares):
+    occupied = 0
+    for sq in squares:
+        if sq >= 0:
+            occupied |= 1 << sq
+    return occupied
+
+
+def _attacked(men, squares, target, by_color, occupied):
+    """True if a man of by_color attacks the target square"""
+    for (color, piece_type), sq in zip(men, squares):
+        if color == by_color and sq >= 0 and _attacks(piece_type, color, sq, occupied) >> target & 1:
+            return True
+    return False
+
+
+def _legal_moves(men, squares, side):
+    """Legal moves of side in a placement
+
+    Returns:
+        list: (man, to square, captured man or -1, promotion piece type or None)
+    """
+    occupied = _occupancy(squares)
+    own = 0
+    for (color, _), sq in zip(men, squares):
+        if color == side and sq >= 0:
+            own |= 1 << sq
+    moves = []
+    for man, (color, piece_type) in enumerate(men):
+        sq = squares[man]
+        if color != side or sq < 0:
+            continue
+        if piece_type == PAWN:
+            push = sq - 8 if side == WHITE else sq + 8
+            targets = PAWN_ATTACKS[side][sq] & occupied & ~own
+            if not occupied >> push & 1:
+                targets |= 1 << push
+                double = sq - 16 if side == WHITE else sq + 16
+                if (sq >> 3) == (6 if side == WHITE else 1) and not occupied >> double & 1:
+                    targets |= 1 << double
+        else:
+            targets = _attacks(piece_type, side, sq, occupied) & ~own
+        while targets:
+            to = (targets & -targets).bit_length() - 1
+            targets &= targets - 1
+            captured = -1
+            if occupied >> to & 1:
+                captured = squares.index(to)
+            after = list(squares)
+            after[man] = to
+            if captured >= 0:
+                after[captured] = -1
+            if _attacked(men, after, after[side], side ^ 1, (occupied ^ 1 << sq) | 1 << to):
+                continue
+            if piece_type == PAWN and (to >> 3) in (0, 7):
+                for promotion in _PROMOTIONS:
+                    moves.append((man, to, captured, promotion))
+            else:
+                moves.append((man, to, captured, None))
+    return moves
+
+
+def _lookup(solved, endings, men, side):
+    """Value (plies + 1, 0 for a draw) of a position in a solved ending
+
+    Args:
+        solved: name -> (white-to-move, black-to-move) values of the solved endings
+        endings: name -> Ending, filled in as endings are met
+        men: (colour, piece type, square) of every man on the board
+        side: Side to move
+    """
+    white = [piece_type for color, piece_type, _ in men if color == WHITE and piece_type != KING]
+    black = [piece_type for color, piece_type, _ in men if color == BLACK and piece_type != KING]
+    name, flipped = ending_name(white, black)
+    if name in DRAWN_ENDINGS:
+        return 0
+    if flipped:
+        men = [(color ^ 1, piece_type, sq ^ 56) for color, piece_type, sq in men]
+        side ^= 1
+    ending = endings.get(name)
+    if ending is None:
+        ending = endings[name] = Ending(name)
+    squares = []
+    for kind in ending.men:
+        for color, piece_type, sq in men:
+            if (color, piece_type) == kind and sq not in squares:
+                squares.append(sq)
+                break
+    return solved[name][side][ending.index(squares)]
+
+
+def dependencies(name):
+    """Names of the endings one capture or promotion in this ending leads to"""
+    white, black = _name_types(name)
+    found = set()
+    for own, other, color in ((white, black, WHITE), (black, white, BLACK)):
+        for i, piece_type in enumerate(own):
+            fewer = own[:i] + own[i + 1:]
+            # Taken by the other side
+            sides = (fewer, other) if color == WHITE else (other, fewer)
+            found.add(ending_name(*sides)[0])
+            if piece_type != PAWN:
+                continue
+            for promotion in _PROMOTIONS:
+                promoted = fewer + [promotion]
+                # Promoting, possibly with a capture
+                for after in [other] + [other[:j] + other[j + 1:] for j in range(len(other))]:
+                    sides = (promoted, after) if color == WHITE else (after, promoted)
+                    found.add(ending_name(*sides)[0])
+    found.discard(name)
+    return sorted(found - set(DRAWN_ENDINGS))
+
+
+def _solve(ending, solved, endings):
+    """Solve one ending
+
+    Args:
+        ending: Ending to solve
+        solved: name -> (white-to-move, black-to-move) values of every
+                ending captures and promotions lead to
+        endings: name -> Ending cache for _lookup()
+
+    Returns:
+        tuple: (white-to-move, black-to-move) bytearrays of plies + 1, 0 for a draw
+    """
+    men = ending.men
+    size = ending.size
+    values = (bytearray(size), bytearray(size))
+    remaining = (bytearray(size), bytearray(size))
+    longest = (bytearray(size), bytearray(size))
+    buckets = {}
+
+    for side in (WHITE, BLACK):
+        pending = remaining[side]
+        longest_here = longest[side]
+        for index in range(size):
+            squares = ending.placement(index)
+            if squares is None or ending.index(squares) != index:
+                continue  # Solved under the index of its standard form
+            occupied = _occupancy(squares)
+            # The side that just moved may not have left its king in check
+            if _attacked(men, squares, squares[side ^ 1], side, occupied):
+                continue
+            moves = _legal_moves(men, squares, side)
+            if not moves:
+                if _attacked(men, squares, squares[side], side ^ 1, occupied):
+                    buckets.setdefault(1, []).append(side << 32 | index)  # Mated
+                else:
+                    pending[index] = _NEVER_LOST  # Stalemate
+                continue
+            children = set()
+            best_win = 0
+            escape = False
+            lost_in = 0
+            for man, to, captured, promotion in moves:
+                if captured < 0 and promotion is None:
+                    # Moves to placements the symmetries turn into one another count once
+                    after = list(squares)
+                    after[man] = to
+                    children.add(ending.index(after))
+                    continue
+                after = []
+                for other, ((color, piece_type), sq) in enumerate(zip(men, squares)):
+                    if other == man:
+                        after.append((color, promotion if promotion is not None else piece_type, to))
+                    elif other != captured:
+                        after.append((color, piece_type, sq))
+                child = _lookup(solved, endings, after, side ^ 1)
+                if not child:
+                    escape = True
+                elif child & 1:
+                    # Even plies for the other side: it loses
+                    if not best_win or child + 1 < best_win:
+                        best_win = child + 1
+                elif child + 1 > lost_in:
+                    lost_in = child + 1
+            if best_win:
+                buckets.setdefault(best_win, []).append(side << 32 | index)
+                pending[index] = _NEVER_LOST
+            elif escape:
+                pending[index] = _NEVER_LOST
+            elif children:
+                pending[index] = len(children)
+                longest_here[index] = lost_in
+            else:
+                buckets.setdefault(lost_in, []).append(side << 32 | index)
+
+    # Walk moves backwards, one ply at a time
+    value = 0
+    while any(level > value for level in buckets):
+        value += 1
+        if value > 255:
+            raise ValueError("Results longer than 254 plies do not fit the table entries")
+        for entry in buckets.pop(value, ()):
+            side = entry >> 32
+            index = entry & 0xFFFFFFFF
+            table = values[side]
+            if table[index]:
+                continue
+            table[index] = value
+            mover = side ^ 1
+            other_values = values[mover]
+            other_pending = remaining[mover]
+            for before in _unmoves(ending, ending.placement(index), side):
+                if other_values[before]:
+                    continue
+                if value & 1:
+                    # Lost for the side to move here: the move into it wins
+                    buckets.setdefault(value + 1, []).append(mover << 32 | before)
+                else:
+                    other_pending[before] -= 1
+                    if not other_pending[before]:
+                        level = max(value + 1, longest[mover][before])
+                        buckets.setdefault(level, []).append(mover << 32 | before)
+    return values
+
+
+def _unmoves(ending, squares, side):
+    """Indices of the positions whose move, neither a capture nor a
+    promotion, leads to this placement with side to move
+
+    Each index comes once, as _solve() counts each position's distinct
+    children once.
+    """
+    men = ending.men
+    mover = side ^ 1
+    occupied = _occupancy(squares)
+    before = set()
+    for man, (color, piece_type) in enumerate(men):
+        if color != mover:
+            continue
+        sq = squares[man]
+        if piece_type == PAWN:
+            # Pawns only move forward, so they came from behind
+            back = 8 if mover == WHITE else -8
+            origins = 0
+            if 8 <= sq + back < 56 and not occupied >> (sq + back) & 1:
+                origins = 1 << (sq + back)
+                if (sq >> 3) == (4 if mover == WHITE else 3) and not occupied >> (sq + 2 * back) & 1:
+                    origins |= 1 << (sq + 2 * back)
+        else:
+            origins = _attacks(piece_type, mover, sq, occupied) & ~occupied
+        while origins:
+            origin = (origins & -origins).bit_length() - 1
+            origins &= origins - 1
+            previous = list(squares)
+            previous[man] = origin
+            # The side to move here may not have been left in check before the move
+            if _attacked(men, previous, previous[side], mover, occupied ^ 1 << sq ^ 1 << origin):
+                continue
+            before.add(ending.index(previous))
+    return before
+
+
+def write_table(path, values):
+    """Bit-pack a solved ending into a table file
+
+    Args:
+        path: File to write
+        values: (white-to-move, black-to-move) bytearrays of plies + 1, 0 for a draw
+    """
+    bits = max(max(max(side_values, default=0) for side_values in values).bit_length(), 1)
+    data = bytearray()
+    pending = pending_bits = 0
+    for side_values in values:
+        for value in side_values:
+            pending |= value << pending_bits
+            pending_bits += bits
+            while pending_bits >= 8:
+                data.append(pending & 0xFF)
+                pending >>= 8
+                pending_bits -= 8
+    data.append(pending)
+    data.append(0)  # Spare byte so every entry can be read with one two-byte word
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, bits, FORMAT_VERSION))
+        f.write(data)
+
+
+def generate_all(directory, pieces=DEFAULT_PIECES, names=None):
+    """Solve endings and write their tables into directory
+
+    Args:
+        directory: Folder to write the tables into
+        pieces: Solve the ENDINGS with up to this many men
+        names: Endings to solve instead, e.g. ['KQKR']
+    """
+    os.makedirs(directory, exist_ok=True)
+    if names is None:
+        names = [name for men in sorted(ENDINGS) if men <= pieces for name in ENDINGS[men]]
+    solved = {}
+    endings = {}
+
+    def solve(name):
+        if name in solved:
+            return
+        for dependency in dependencies(name):
+            solve(dependency)
+        start = time.perf_counter()
+        ending = endings.get(name) or Ending(name)
+        endings[name] = ending
+        solved[name] = values = _solve(ending, solved, endings)
+        write_table(os.path.join(directory, name + '.bin'), values)
+        won = sum(1 for side_values in values for value in side_values if value and not value & 1)
+        lost = sum(1 for side_values in values for value in side_values if value & 1)
+        print(f"{name}: {2 * ending.size} positions, {won} won, {lost} lost, "
+              f"longest {max(max(side_values) for side_values in values) - 1} plies "
+              f"({time.perf_counter() - start:.1f}s)")
+
+    for name in names:
+        solve(name)
+
+
+class _Table:
+    """
+    One memory-mapped table file
+    """
+    def __init__(self, path, ending):
+        self.ending = ending
+        self._file = open(path, 'rb')
+        self._data = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.bits, version = HEADER.unpack_from(self._data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            self.close()
+            raise ValueError(f"Not an endgame table of this version: {path}")
+        self.mask = (1 << self.bits) - 1
+
+    def value(self, side, index):
+        """Plies until mate plus one for the side to move, 0 for a draw"""
+        bit = (side * self.ending.size + index) * self.bits
+        word = _WORD.unpack_from(self._data, HEADER.size + (bit >> 3))[0]
+        return word >> (bit & 7) & self.mask
+
+    def close(self):
+        self._data.close()
+        self._file.close()
+
+
+class Tablebase:
+    """
+    Probe interface over the tables found in a directory
+    """
+    def __init__(self, directory=DEFAULT_TABLE_DIR):
+        """
+        Args:
+            directory: Folder holding the table files written by generate_all()
+        """
+        self.tables = {}
+        self.max_men = 0
+        if os.path.isdir(directory):
+            for file_name in os.listdir(directory):
+                name, extension = os.path.splitext(file_name)
+                if extension != '.bin' or not is_ending_name(name):
+                    continue
+                self.tables[name] = _Table(os.path.join(directory, file_name), Ending(name))
+                self.max_men = max(self.max_men, len(name))
+
+    def probe(self, position):
+        """Exact result of a position, if a table covers it
+
+        Returns:
+            tuple: (WIN, DRAW or LOSS for the side to move, plies to mate),
+                   or None when the position is not in the tables
+        """
+        occupied = position.occ[WHITE] | position.occ[BLACK]
+        for _ in range(self.max_men):
+            occupied &= occupied - 1
+        if occupied or not self.max_men or position.castling:
+            return None
+        side = position.side
+        if position.ep >= 0 and PAWN_ATTACKS[side ^ 1][position.ep] & position.bb[side * 6 + PAWN]:
+            return None  # En passant is not modelled
+
+        men = []
+        white, black = [], []
+        for piece, bb in enumerate(position.bb):
+            color, piece_type = divmod(piece, 6)
+            while bb:
+                sq = (bb & -bb).bit_length() - 1
+                bb &= bb - 1
+                men.append((color, piece_type, sq))
+                if piece_type != KING:
+                    (black if color else white).append(piece_type)
+        name, flipped = ending_name(white, black)
+        if name in DRAWN_ENDINGS:
+            return DRAW, 0
+        table = self.tables.get(name)
+        if table is None:
+            return None
+        if flipped:
+            men = [(color ^ 1, piece_type, sq ^ 56) for color, piece_type, sq in men]
+            side ^= 1
+        squares = []
+        for kind in table.ending.men:
+            for color, piece_type, sq in men:
+                if (color, piece_type) == kind and sq not in squares:
+                    squares.append(sq)
+                    break
+        value = table.value(side, table.ending.index(squares))
+        if not value:
+            return DRAW, 0
+        return (LOSS if value & 1 else WIN), value - 1
+
+    def probe_root(self, position):
+        """Best move by the tables: quickest win, else a draw, else the longest defence
+
+        Returns:
+            tuple: (packed move, (result, plies to mate)) or None when not in the tables
+        """
+        if self.probe(position) is None:
+            return None
+        best_move, best_result, best_rank = None, None, None
+        for move in position.legal_moves():
+            position.make(move)
+            reply = self.probe(position)
+            position.unmake()
+            if reply is None:
+                return None  # The move leaves the tables, only a search can tell
+            result = (-reply[0], reply[1] + 1 if reply[0] else 0)
+            rank = result[0] * (1000 - result[1]) if result[0] else 0
+            if best_rank is None or rank > best_rank:
+                best_move, best_result, best_rank = move, result, rank
+        if best_move is None:
+            return None
+        return best_move, best_result
+
+    def close(self):
+        """Release every table"""
+        for table in self.tables.values():
+            table.close()
+        self.tables = {}
+        self.max_men = 0
+
+
+_default_tablebase = None
+
+
+def get_default_tablebase():
+    """The tables shipped in data/tablebase, opened once per process, or None when missing"""
+    global _default_tablebase
+    if _default_tablebase is None:
+        tablebase = Tablebase(DEFAULT_TABLE_DIR)
+        if tablebase.tables:
+            _default_tablebase = tablebase
+    return _default_tablebase
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate chess endgame tables by retrograde analysis')
+    parser.add_argument('directory', type=str, nargs='?', default=DEFAULT_TABLE_DIR,
+                        help='Folder to write the tables into')
+    parser.add_argument('--pieces', type=int, default=DEFAULT_PIECES,
+                        help='Largest number of men on the board (3 or 4)')
+    parser.add_argument('--endings', type=str, nargs='+',
+                        help='Endings to solve instead, e.g. KQKR KRKP')
+    args = parser.parse_args()
+    if args.endings:
+        for name in args.endings:
+            if not is_ending_name(name):
+                parser.error(f"Not an ending name with the stronger side first: {name}")
+    generate_all(args.directory, args.pieces, args.endings)
+
+
+if __name__ == "__main__":
+    main()
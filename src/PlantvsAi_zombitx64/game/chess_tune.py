@@ -0,0 +1,267 @@
+"""
+Texel tuning of the Chess evaluation weights
+
+The hand-made evaluation (chess_eval) is linear in its weights: piece
+values, piece-square tables and pawn structure terms. Each labelled
+position is therefore turned into features once:
+
+    pieces  the PST slot (piece * 64 + square) of every piece on the board
+    pawns   the pawn_terms() counts of its pawn structure
+
+and the score of every position is a gather-and-sum over those arrays.
+The weights are fitted to game results by minimising the logistic loss
+of sigmoid(K * score) against the result (1 white win, 0.5 draw, 0 black
+win) with full-batch Adam, every step being a few NumPy operations over
+all positions at once. K is fitted to the starting weights first.
+
+Input is a PGN file (every position of every finished game, labelled with
+the game's result) or a text file with one "<FEN> <result>" per line,
+where the result is 1-0, 0-1, 1/2-1/2 or a number such as [0.5].
+Extracted features can be saved to .npz and tuned again without parsing.
+
+Example:
+    python chess_tune.py games.pgn --save-features games.npz
+    python chess_tune.py games.npz --iterations 500
+
+The tuned weights are written to data/chess_eval_weights.json, which
+chess_eval loads at startup.
+"""
+import argparse
+import time
+
+import numpy as np
+
+from chess_bitboard import Position, START_FEN, NO_PIECE
+from chess_book import iter_pgn_games, parse_san
+import chess_eval
+
+SLOTS = 12 * 64
+RESULTS = {'1-0': 1.0, '0-1': 0.0, '1/2-1/2': 0.5}
+DEFAULT_SKIP_PLIES = 8  # Opening positions from the book say little about the weights
+# Parameter vector: values P to Q, the six tables, then the pawn term weights
+PST_PARAMETERS = 5 + 6 * 64
+
+
+def _parse_result(text):
+    """Game result from white's point of view, or None when unknown"""
+    text = text.strip().strip('[]";').strip()
+    if text in RESULTS:
+        return RESULTS[text]
+    try:
+        return float(text)
+    except ValueError:
+        return None
+
+
+def _iter_labelled(path, skip_plies):
+    """Stream (position, result) pairs; the position object is reused"""
+    position = Position()
+    with open(path, 'r', encoding='utf-8') as f:
+        if path.lower().endswith('.pgn'):
+            for tags, moves in iter_pgn_games(f):
+                result = RESULTS.get(tags.get('Result'))
+                if result is None:
+                    continue
+                position.set_fen(tags.get('FEN', START_FEN))
+                for ply, san in enumerate(moves, 1):
+                    try:
+                        position.make(parse_san(position, san))
+                    except ValueError:
+                        break
+                    if ply >= skip_plies:
+                        yield position, result
+        else:
+            for line in f:
+                fields = line.split()
+                if len(fields) < 7 or line.startswith('#'):
+                    continue
+                result = _parse_result(' '.join(fields[6:]))
+                if result is not None:
+                    position.set_fen(' '.join(fields[:6]))
+                    yield position, result
+
+
+def extract_features(path, skip_plies=DEFAULT_SKIP_PLIES):
+    """Load labelled positions and turn them into feature arrays
+
+    Positions in check are left out; their static score means little.
+
+    Returns:
+        dict: 'slots' (int16 PST slot of every piece, position after position),
+              'counts' (uint8 pieces per position), 'pawns' (float32 pawn_terms
+              rows) and 'results' (float32)
+    """
+    slots = []
+    counts = []
+    pawns = []
+    results = []
+    pawn_cache = {}
+    for position, result in _iter_labelled(path, skip_plies):
+        if position.in_check():
+            continue
+        count = 0
+        for sq, piece in enumerate(position.squares):
+            if piece != NO_PIECE:
+                slots.append(piece * 64 + sq)
+                count += 1
+        terms = pawn_cache.get(position.pawn_key)
+        if terms is None:
+            terms = pawn_cache[position.pawn_key] = chess_eval.pawn_terms(position.bb[0],
+                                                                          position.bb[6])
+        counts.append(count)
+        pawns.append(terms)
+        results.append(result)
+    return {
+        'slots': np.array(slots, dtype=np.int16),
+        'counts': np.array(counts, dtype=np.uint8),
+        'pawns': np.array(pawns, dtype=np.float32).reshape(-1, chess_eval.PAWN_TERMS),
+        'results': np.array(results, dtype=np.float32)
+    }
+
+
+def current_parameters():
+    """The evaluation weights in chess_eval as one vector"""
+    return np.concatenate((np.array(chess_eval.PIECE_VALUES[:5], dtype=np.float64),
+                           np.array(chess_eval.PIECE_TABLES, dtype=np.float64).ravel(),
+                           np.array(chess_eval.pawn_weights(), dtype=np.float64)))
+
+
+def pst_basis():
+    """Matrix mapping the value and table parameters to the 768 PST entries
+
+    build_pst is linear, so its columns are read off unit parameter vectors
+    and the tuner scores exactly as the engine does.
+    """
+    basis = np.zeros((SLOTS, PST_PARAMETERS))
+    for column in range(PST_PARAMETERS):
+        unit = np.zeros(PST_PARAMETERS)
+        unit[column] = 1.0
+        values = list(unit[:5]) + [0.0]
+        tables = unit[5:].reshape(6, 64)
+        basis[:, column] = chess_eval.build_pst(values, tables)
+    return basis
+
+
+class TexelTuner:
+    """
+    Vectorized logistic-loss fit of the evaluation weights
+    """
+    def __init__(self, features):
+        """
+        Args:
+            features: dict from extract_features()
+        """
+        self.slots = features['slots'].astype(np.intp)
+        self.counts = features['counts'].astype(np.intp)
+        self.offsets = np.concatenate(([0], np.cumsum(self.counts)[:-1]))
+        self.pawns = features['pawns']
+        self.results = features['results']
+        self.basis = pst_basis()
+
+    def scores(self, params):
+        """Static scores in pawns, white's point of view, of all positions"""
+        pst = (self.basis @ params[:PST_PARAMETERS]).astype(np.float32)
+        pawn_weights = params[PST_PARAMETERS:].astype(np.float32)
+        return np.add.reduceat(pst[self.slots], self.offsets) + self.pawns @ pawn_weights
+
+    def loss(self, params, scale):
+        """Mean logistic loss of the results against sigmoid(scale * score)"""
+        z = scale * self.scores(params)
+        # log(1 + e^z) - y z, written to stay finite for large |z|
+        return float(np.mean(np.logaddexp(0.0, z) - self.results * z))
+
+    def fit_scale(self, params, low=0.01, high=5.0, steps=40):
+        """K minimising the loss of the given weights, by golden-section search"""
+        scores = self.scores(params)
+        ratio = (5 ** 0.5 - 1) / 2
+
+        def loss(scale):
+            z = scale * scores
+            return float(np.mean(np.logaddexp(0.0, z) - self.results * z))
+
+        a, b = low, high
+        for _ in range(steps):
+            c = b - ratio * (b - a)
+            d = a + ratio * (b - a)
+            if loss(c) < loss(d):
+                b = d
+            else:
+                a = c
+        return (a + b) / 2
+
+    def gradient(self, params, scale):
+        """Loss and its gradient with respect to params"""
+        z = scale * self.scores(params)
+        probability = 1.0 / (1.0 + np.exp(-z))
+        loss = float(np.mean(np.logaddexp(0.0, z) - self.results * z))
+        d_score = (probability - self.results) * (scale / len(self.results))
+        d_pst = np.bincount(self.slots, weights=np.repeat(d_score, self.counts), minlength=SLOTS)
+        return loss, np.concatenate((self.basis.T @ d_pst,
+                                     self.pawns.T.astype(np.float64) @ d_score))
+
+    def tune(self, params, scale, iterations=300, learning_rate=0.01, report_every=25):
+        """Adam on the full data set
+
+        Returns:
+            numpy.ndarray: Tuned parameters
+        """
+        params = params.astype(np.float64).copy()
+        m = np.zeros_like(params)
+        v = np.zeros_like(params)
+        beta1, beta2, eps = 0.9, 0.999, 1e-8
+        for step in range(1, iterations + 1):
+            loss, grad = self.gradient(params, scale)
+            m = beta1 * m + (1 - beta1) * grad
+            v = beta2 * v + (1 - beta2) * grad * grad
+            params -= learning_rate * (m / (1 - beta1 ** step)) / (np.sqrt(v / (1 - beta2 ** step)) + eps)
+            if report_every and step % report_every == 0:
+                print(f"Step {step}/{iterations}: loss {loss:.6f}")
+        return params
+
+
+def save_parameters(params, path=chess_eval.DEFAULT_WEIGHTS_PATH):
+    """Write a parameter vector in the JSON form chess_eval loads"""
+    values = list(params[:5]) + [0.0]
+    tables = params[5:PST_PARAMETERS].reshape(6, 64)
+    chess_eval.save_weights(path, values, tables, params[PST_PARAMETERS:])
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Tune the chess evaluation weights on game results')
+    parser.add_argument('input', type=str,
+                        help='PGN file, "<FEN> <result>" lines, or features saved with --save-features')
+    parser.add_argument('output', type=str, nargs='?', default=chess_eval.DEFAULT_WEIGHTS_PATH,
+                        help='JSON weights file to write')
+    parser.add_argument('--skip-plies', type=int, default=DEFAULT_SKIP_PLIES,
+                        help='Leave out the first plies of every PGN game')
+    parser.add_argument('--save-features', type=str, default=None,
+                        help='Also save the extracted features to this .npz file')
+    parser.add_argument('--iterations', type=int, default=300, help='Gradient steps')
+    parser.add_argument('--learning-rate', type=float, default=0.01, help='Adam step size in pawns')
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    if args.input.lower().endswith('.npz'):
+        with np.load(args.input) as data:
+            features = {name: data[name] for name in data.files}
+    else:
+        features = extract_features(args.input, args.skip_plies)
+        if args.save_features:
+            np.savez(args.save_features, **features)
+    if not len(features['results']):
+        parser.error(f"no labelled positions in {args.input}")
+    print(f"{len(features['results'])} positions ready in {time.perf_counter() - started:.1f}s")
+
+    tuner = TexelTuner(features)
+    params = current_parameters()
+    scale = tuner.fit_scale(params)
+    print(f"K = {scale:.4f}, starting loss {tuner.loss(params, scale):.6f}")
+    started = time.perf_counter()
+    params = tuner.tune(params, scale, args.iterations, args.learning_rate)
+    print(f"Final loss {tuner.loss(params, scale):.6f} after {time.perf_counter() - started:.1f}s")
+    save_parameters(params, args.output)
+    print(f"Saved weights to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,6 +14,14 @@ class GameSettings:
                 'hint_enabled': True,
                 'undo_moves': True,
                 'ai_delay': 1.0,
+                'chess': {
+                    'null_move_pruning': False,
+                    'late_move_reductions': False,
+                    'principal_variation_search': False,
+                    'search_workers': 1,
+                    'pondering': False,
+                    'nnue_eval': False
+                },
                 'poker': {
                     'search_depth': 3,
                     'randomness': 0.2,
@@ -30,6 +38,14 @@ class GameSettings:
                 'hint_enabled': True,
                 'undo_moves': True,
                 'ai_delay': 0.5,
+                'chess': {
+                    'null_move_pruning': False,
+                    'late_move_reductions': False,
+                    'principal_variation_search': True,
+                    'search_workers': 1,
+                    'pondering': False,
+                    'nnue_eval': False
+                },
                 'poker': {
                     'search_depth': 5,
                     'randomness': 0.15,
@@ -46,6 +62,14 @@ class GameSettings:
                 'hint_enabled': False,
                 'undo_moves': False,
                 'ai_delay': 0.2,
+                'chess': {
+                    'null_move_pruning': True,
+                    'late_move_reductions': True,
+                    'principal_variation_search': True,
+                    'search_workers': 0,  # 0 = one process per CPU core
+                    'pondering': True,
+                    'nnue_eval': True  # Used when data/chess_nnue.safetensors exists
+                },
                 'poker': {
                     'search_depth': 7,
                     'randomness': 0.1,
@@ -146,6 +170,12 @@ class GameSettings:
                 'randomness': base_settings['randomness'] / 2,
                 'time_limit': base_settings['base_time_limit'] * 2,
                 'opening_book': True,
+                'null_move_pruning': base_settings['chess']['null_move_pruning'],
+                'late_move_reductions': base_settings['chess']['late_move_reductions'],
+                'principal_variation_search': base_settings['chess']['principal_variation_search'],
+                'search_workers': base_settings['chess']['search_workers'],
+                'pondering': base_settings['chess']['pondering'],
+                'nnue_eval': base_settings['chess']['nnue_eval'],
                 'hint_enabled': base_settings['hint_enabled'],
                 'undo_moves': base_settings['undo_moves'],
                 'ai_delay': base_settings['ai_delay']
@@ -5,6 +5,7 @@ import time
 import json
 import os
 from pygame.locals import *
+from transposition import ZobristKeys, TranspositionTable, EXACT
 
 # Initialize Pygame
 pygame.init()
@@ -879,7 +880,32 @@ def reset_game():
     draw_stats_panel()
     draw_ai_selector()
 
-def minimax(board, depth, is_maximizing):
+# Transposition table for minimax: keys for 'O' (0) and 'X' (1) on each square
+MINIMAX_ZOBRIST = ZobristKeys(2, BOARD_ROWS * BOARD_COLS)
+minimax_tt = TranspositionTable(size_bits=12)
+
+def board_key(board, is_maximizing):
+    """Zobrist key of a board with the side to move"""
+    placements = [(1 if board[row][col] == 'X' else 0, row * BOARD_COLS + col)
+                  for row in range(BOARD_ROWS) for col in range(BOARD_COLS)
+                  if board[row][col] is not None]
+    return MINIMAX_ZOBRIST.hash(placements, 1 if is_maximizing else 0)
+
+def minimax(board, depth, is_maximizing, key=None):
+    # Scores depend on depth, so the table stores them relative to this node
+    if key is None:
+        key = board_key(board, is_maximizing)
+    entry = minimax_tt.probe(key)
+    if entry is not None:
+        score = int(entry[2])
+        return score - depth if score > 0 else score + depth if score < 0 else 0
+    
+    best_score = _minimax_search(board, depth, is_maximizing, key)
+    stored = best_score + depth if best_score > 0 else best_score - depth if best_score < 0 else 0
+    minimax_tt.store(key, 0, EXACT, stored)
+    return best_score
+
+def _minimax_search(board, depth, is_maximizing, key):
     # Check terminal states
     result = check_win_for_board(board)
     if result == 'X':  # AI
@@ -900,13 +926,17 @@ def minimax(board, depth, is_maximizing):
     if is_full:
         return 0
     
+    # Playing a move flips the side to move as well as adding the mark
+    child_key = key ^ MINIMAX_ZOBRIST.side
+    
     if is_maximizing:
         best_score = -float('inf')
         for row in range(BOARD_ROWS):
             for col in range(BOARD_COLS):
                 if board[row][col] is None:
                     board[row][col] = 'X'  # AI
-                    score = minimax(board, depth + 1, False)
+                    score = minimax(board, depth + 1, False,
+                                    child_key ^ MINIMAX_ZOBRIST.piece(1, row * BOARD_COLS + col))
                     board[row][col] = None  # Undo move
                     best_score = max(score, best_score)
         return best_score
@@ -916,7 +946,8 @@ def minimax(board, depth, is_maximizing):
             for col in range(BOARD_COLS):
                 if board[row][col] is None:
                     board[row][col] = 'O'  # Player
-                    score = minimax(board, depth + 1, True)
+                    score = minimax(board, depth + 1, True,
+                                    child_key ^ MINIMAX_ZOBRIST.piece(0, row * BOARD_COLS + col))
                     board[row][col] = None  # Undo move
                     best_score = min(score, best_score)
         return best_score
@@ -0,0 +1,196 @@
+"""
+Zobrist hashing and a fixed-size transposition table
+
+Both pieces are game-agnostic: an engine describes its pieces as small
+integers and its squares as 0..N-1, keeps a Zobrist key up to date while
+it makes and unmakes moves, and encodes its best move as an int before
+storing it. Chess, Checkers and Tic Tac Toe all share this module.
+"""
+import random
+from array import array
+
+# Bound types stored with each score
+EXACT = 0
+LOWER_BOUND = 1  # Search failed high: the real score is at least this
+UPPER_BOUND = 2  # Search failed low: the real score is at most this
+
+NO_MOVE = -1
+_EMPTY = -1
+
+
+class ZobristKeys:
+    """
+    Random 64-bit keys for every (piece, square) pair, the side to move
+    and any extra state an engine wants to hash (castling rights, ...)
+    """
+    def __init__(self, num_pieces, num_squares, num_extra=0, seed=0x5EED):
+        """
+        Args:
+            num_pieces: Number of distinct piece codes
+            num_squares: Number of squares on the board
+            num_extra: Number of extra keys to generate
+            seed: Seed so keys are identical across processes and runs
+        """
+        rng = random.Random(seed)
+        self.num_squares = num_squares
+        # Flat table indexed by piece * num_squares + square
+        self.pieces = [rng.getrandbits(64) for _ in range(num_pieces * num_squares)]
+        self.side = rng.getrandbits(64)
+        self.extra = [rng.getrandbits(64) for _ in range(num_extra)]
+
+    def piece(self, piece, square):
+        """Key for a piece standing on a square"""
+        return self.pieces[piece * self.num_squares + square]
+
+    def hash(self, placements, side_to_move=0):
+        """Compute a key from scratch
+
+        Args:
+            placements: Iterable of (piece, square) pairs
+            side_to_move: 0 for the first player, 1 for the second
+
+        Returns:
+            int: 64-bit Zobrist key
+        """
+        pieces = self.pieces
+        num_squares = self.num_squares
+        key = 0
+        for piece, square in placements:
+            key ^= pieces[piece * num_squares + square]
+        if side_to_move:
+            key ^= self.side
+        return key
+
+
+class TranspositionTable:
+    """
+    Preallocated, array-backed transposition table
+
+    Every index owns two slots: a depth-preferred slot that keeps the
+    deepest result seen for the current search, and an always-replace
+    slot that takes everything else. Entries are spread over parallel
+    arrays so the table never allocates after construction.
+    """
+    def __init__(self, size_bits=16):
+        """
+        Args:
+            size_bits: log2 of the number of indexes (two slots each)
+        """
+        self.size = 1 << size_bits
+        self.mask = self.size - 1
+        slots = self.size * 2
+        self.keys = array('Q', [0]) * slots
+        self.depths = array('h', [0]) * slots
+        self.flags = array('b', [_EMPTY]) * slots
+        self.ages = array('B', [0]) * slots
+        self.scores = array('d', [0.0]) * slots
+        self.moves = array('q', [NO_MOVE]) * slots
+        self.age = 0
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Zero the hit/miss/store counters"""
+        self.hits = 0
+        self.misses = 0
+        self.stores = 0
+        self.overwrites = 0  # Stores that pushed another position's entry out of the table
+
+    def clear(self):
+        """Forget every entry (for a new game)"""
+        slots = self.size * 2
+        self.keys = array('Q', [0]) * slots
+        self.flags = array('b', [_EMPTY]) * slots
+        self.moves = array('q', [NO_MOVE]) * slots
+        self.age = 0
+        self.reset_stats()
+
+    def new_search(self):
+        """Start a new search so old deep entries become replaceable"""
+        self.age = (self.age + 1) & 0xFF
+
+    def probe(self, key):
+        """Look up a position
+
+        Returns:
+            tuple: (depth, flag, score, move) or None when the key is absent
+        """
+        slot = (key & self.mask) << 1
+        keys = self.keys
+        flags = self.flags
+        if keys[slot] != key or flags[slot] == _EMPTY:
+            slot += 1
+            if keys[slot] != key or flags[slot] == _EMPTY:
+                self.misses += 1
+                return None
+        self.hits += 1
+        return self.depths[slot], flags[slot], self.scores[slot], self.moves[slot]
+
+    def best_move(self, key):
+        """Stored best move for a position without touching the counters"""
+        slot = (key & self.mask) << 1
+        for index in (slot, slot + 1):
+            if self.keys[index] == key and self.flags[index] != _EMPTY:
+                return self.moves[index]
+        return NO_MOVE
+
+    def store(self, key, depth, flag, score, move=NO_MOVE):
+        """Save a search result
+
+        Args:
+            key: Zobrist key of the position
+            depth: Remaining depth the score was searched to
+            flag: EXACT, LOWER_BOUND or UPPER_BOUND
+            score: Score of the position
+            move: Best move encoded as an int, or NO_MOVE
+        """
+        self.stores += 1
+        slot = (key & self.mask) << 1
+        keys = self.keys
+        flags = self.flags
+
+        if (flags[slot] == _EMPTY or keys[slot] == key or
+                depth >= self.depths[slot] or self.ages[slot] != self.age):
+            if flags[slot] != _EMPTY and keys[slot] != key:
+                if flags[slot + 1] != _EMPTY and keys[slot + 1] != key:
+                    self.overwrites += 1
+                # Keep the old deep entry around in the always-replace slot
+                self._copy(slot, slot + 1)
+        else:
+            slot += 1
+            if flags[slot] != _EMPTY and keys[slot] != key:
+                self.overwrites += 1
+
+        if move == NO_MOVE and keys[slot] == key and flags[slot] != _EMPTY:
+            # Keep the move we already know for this position
+            move = self.moves[slot]
+
+        keys[slot] = key
+        self.depths[slot] = depth
+        flags[slot] = flag
+        self.ages[slot] = self.age
+        self.scores[slot] = score
+        self.moves[slot] = move
+
+    def _copy(self, source, target):
+        """Copy one slot over another"""
+        self.keys[target] = self.keys[source]
+        self.depths[target] = self.depths[source]
+        self.flags[target] = self.flags[source]
+        self.ages[target] = self.ages[source]
+        self.scores[target] = self.scores[source]
+        self.moves[target] = self.moves[source]
+
+    def stats(self):
+        """Counters for monitoring how well the table works
+
+        Returns:
+            dict: hits, misses, stores, overwrites and hit_rate
+        """
+        probes = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'stores': self.stores,
+            'overwrites': self.overwrites,
+            'hit_rate': self.hits / probes if probes else 0.0
+        }
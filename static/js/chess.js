@@ -8,6 +8,8 @@ let gameState = {
     winner: null,
     playerTurn: true,
     aiMode: 1,                // เริ่มต้นที่ระดับปานกลาง
+    difficulty: 'medium',     // ระดับความยากของเอนจินฝั่งเซิร์ฟเวอร์
+    legalMoves: {},           // การเดินที่ถูกต้องทั้งหมดของผู้เล่น {"row,col": {"row,col": info}}
     selectedPiece: null,
     validMoves: {},
     promotionMove: null,
@@ -556,15 +558,14 @@ function playSound(soundName) {
 // เริ่มเกมใหม่
 function startNewGame() {
     // ส่งคำขอ API เพื่อเริ่มเกมใหม่
-    fetch('/api/new_game', {
+    fetch('/api/chess/new_game', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
         body: JSON.stringify({
             session_id: gameState.sessionId,
-            ai_mode: gameState.aiMode,
-            game_type: 'Chess'
+            difficulty: gameState.difficulty
         })
     })
     .then(response => response.json())
@@ -575,10 +576,12 @@ function startNewGame() {
         }
         
         // อัปเดตสถานะเกม
+        gameState.sessionId = data.session_id;
         gameState.board = data.board;
         gameState.playerTurn = data.player_turn;
         gameState.gameOver = data.game_over;
         gameState.winner = data.winner;
+        gameState.legalMoves = data.legal_moves || {};
         gameState.selectedPiece = null;
         gameState.validMoves = {};
         gameState.promotionMove = null;
@@ -685,47 +688,24 @@ function getSquare(row, col) {
     return gameBoard ? gameBoard.querySelector(`[data-row="${row}"][data-col="${col}"]`) : null;
 }
 
-// ขอการเคลื่อนที่ที่ถูกต้องจาก API
+// ดึงการเคลื่อนที่ที่ถูกต้องจากแผนที่การเดินที่เซิร์ฟเวอร์ส่งมาพร้อมสถานะเกม (ไม่ต้องเรียก API)
 function getValidMoves(row, col) {
-    fetch('/api/get_valid_moves', {
-        method: 'POST',
-        headers: {
-            'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-            session_id: gameState.sessionId,
-            row: row,
-            col: col,
-            game_type: 'Chess'
-        })
-    })
-    .then(response => response.json())
-    .then(data => {
-        if (data.error) {
-            console.error('Error getting valid moves:', data.error);
-            return;
-        }
-        
-        // บันทึกการเคลื่อนที่ที่ถูกต้อง
-        gameState.validMoves = data.valid_moves || {};
-        
-        // ไฮไลต์การเคลื่อนที่ที่ถูกต้อง
-        for (const moveKey in gameState.validMoves) {
-            const [moveRow, moveCol] = moveKey.split(',').map(Number);
-            const square = getSquare(moveRow, moveCol);
-            square.classList.add('valid-move');
-        }
-        
-        updateGameStatus();
-    })
-    .catch(error => {
-        console.error('Error getting valid moves:', error);
-    });
+    // บันทึกการเคลื่อนที่ที่ถูกต้อง
+    gameState.validMoves = gameState.legalMoves[`${row},${col}`] || {};
+    
+    // ไฮไลต์การเคลื่อนที่ที่ถูกต้อง
+    for (const moveKey in gameState.validMoves) {
+        const [moveRow, moveCol] = moveKey.split(',').map(Number);
+        const square = getSquare(moveRow, moveCol);
+        square.classList.add('valid-move');
+    }
+    
+    updateGameStatus();
 }
 
 // ทำการเคลื่อนที่
 function makeMove(fromRow, fromCol, toRow, toCol, promotionPiece = null) {
-    fetch('/api/make_move', {
+    fetch('/api/chess/move', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
@@ -736,8 +716,7 @@ function makeMove(fromRow, fromCol, toRow, toCol, promotionPiece = null) {
             from_col: fromCol,
             to_row: toRow,
             to_col: toCol,
-            promotion_piece: promotionPiece,
-            game_type: 'Chess'
+            promotion_piece: promotionPiece
         })
     })
     .then(response => response.json())
@@ -752,6 +731,7 @@ function makeMove(fromRow, fromCol, toRow, toCol, promotionPiece = null) {
         gameState.playerTurn = data.player_turn;
         gameState.gameOver = data.game_over;
         gameState.winner = data.winner;
+        gameState.legalMoves = data.legal_moves || {};
         gameState.selectedPiece = null;
         gameState.validMoves = {};
         
@@ -782,15 +762,13 @@ function makeMove(fromRow, fromCol, toRow, toCol, promotionPiece = null) {
 
 // AI เดินหมาก
 function aiMove() {
-    fetch('/api/ai_move', {
+    fetch('/api/chess/ai_move', {
         method: 'POST',
         headers: {
             'Content-Type': 'application/json',
         },
         body: JSON.stringify({
-            session_id: gameState.sessionId,
-            game_type: 'Chess',
-            ai_mode: gameState.aiMode
+            session_id: gameState.sessionId
         })
     })
     .then(response => response.json())
@@ -805,6 +783,7 @@ function aiMove() {
         gameState.playerTurn = data.player_turn;
         gameState.gameOver = data.game_over;
         gameState.winner = data.winner;
+        gameState.legalMoves = data.legal_moves || {};
         
         // อัปเดต UI
         updateBoard();
@@ -908,6 +887,13 @@ function setupEventListeners() {
         gameState.aiMode = parseInt(aiModeSelect.value);
     });
     
+    // ปุ่มเลือกระดับความยาก (มีผลเมื่อเริ่มเกมใหม่)
+    document.querySelectorAll('.ai-algorithm').forEach(button => {
+        button.addEventListener('click', () => {
+            gameState.difficulty = button.dataset.value;
+        });
+    });
+    
     // ปุ่มเปิด/ปิดแอนิเมชัน
     animationToggle.addEventListener('click', toggleAnimations);
     
@@ -0,0 +1,113 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src', 'PlantvsAi_zombitx64', 'game'))
+sys.path.insert(0, ROOT)
+
+flask_app = pytest.importorskip('app')
+from chess_sessions import ChessSessionRegistry
+
+START_FEN = 'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1'
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    games = ChessSessionRegistry(ttl=60, max_games=2)
+    monkeypatch.setattr(flask_app, 'chess_games', games)
+    yield games
+    for session_id in list(games.entries):
+        games.remove(session_id)
+
+
+@pytest.fixture
+def client(registry):
+    flask_app.app.config['TESTING'] = True
+    with flask_app.app.test_client() as client:
+        yield client
+
+
+def post(client, route, **data):
+    response = client.post(f'/api/chess/{route}', json=data)
+    return response.status_code, response.get_json()
+
+
+def test_chess_page(client):
+    response = client.get('/chess')
+    assert response.status_code == 200
+    assert b'Chess' in response.data
+
+
+def test_a_game_through_the_api(client):
+    status, state = post(client, 'new_game', difficulty='easy')
+    assert status == 200
+    assert state['fen'] == START_FEN and state['player_turn']
+    assert set(state['legal_moves']['6,4']) == {'5,4', '4,4'}
+
+    status, moves = post(client, 'legal_moves')
+    assert status == 200 and moves['legal_moves'] == state['legal_moves']
+
+    status, state = post(client, 'move', from_row=6, from_col=4, to_row=4, to_col=4)
+    assert status == 200
+    assert not state['player_turn'] and state['legal_moves'] == {}
+
+    status, state = post(client, 'ai_move')
+    assert status == 200
+    assert state['player_turn'] and state['move'] is not None
+    assert len(state['move_history']) == 2
+
+    status, found = post(client, 'hint', depth=2)
+    assert status == 200
+    from_row, from_col = found['hint']['from']
+    to_row, to_col = found['hint']['to']
+    assert f'{to_row},{to_col}' in state['legal_moves'][f'{from_row},{from_col}']
+
+    status, analysis = post(client, 'analysis', fen=state['fen'], depth=2, lines=2)
+    assert status == 200
+    assert len(analysis['lines']) == 2
+    assert analysis['lines'][0]['score'] >= analysis['lines'][1]['score']
+
+
+def test_bad_requests(client):
+    assert post(client, 'new_game', difficulty='impossible')[0] == 400
+    # Nothing started in this session yet
+    assert post(client, 'legal_moves')[0] == 404
+    assert post(client, 'hint')[0] == 404
+
+    post(client, 'new_game', difficulty='easy')
+    assert post(client, 'move', from_row=6, from_col=4)[0] == 400
+    assert post(client, 'move', from_row='e', from_col=4, to_row=4, to_col=4)[0] == 400
+    assert post(client, 'move', from_row=6, from_col=4, to_row=3, to_col=4)[0] == 400
+    assert post(client, 'ai_move')[0] == 400  # The player moves first
+    assert post(client, 'analysis')[0] == 400
+    assert post(client, 'analysis', fen='not a fen')[0] == 400
+    assert post(client, 'analysis', fen=START_FEN, depth='deep')[0] == 400
+
+    post(client, 'move', from_row=6, from_col=4, to_row=4, to_col=4)
+    assert post(client, 'move', from_row=6, from_col=3, to_row=4, to_col=3)[0] == 400
+
+    # No hints at the hard difficulty, even with a FEN in the request
+    post(client, 'new_game', difficulty='hard')
+    assert post(client, 'hint', fen=START_FEN)[0] == 403
+
+
+def test_sessions_expire_and_are_evicted(client, registry):
+    for session_id in ('a', 'b'):
+        assert post(client, 'new_game', session_id=session_id, difficulty='easy')[0] == 200
+    assert post(client, 'legal_moves', session_id='a')[0] == 200
+
+    # 'b' is now the least recently used game and makes room for 'c'
+    post(client, 'new_game', session_id='c', difficulty='easy')
+    assert post(client, 'legal_moves', session_id='b')[0] == 404
+    assert post(client, 'legal_moves', session_id='a')[0] == 200
+
+    # An idle game expires
+    registry.entries['c'].last_used -= registry.ttl + 1
+    assert post(client, 'legal_moves', session_id='c')[0] == 404
+    assert registry.stats() == {'live': 1, 'created': 3, 'reused': 0, 'evicted': 2}
+
+    # A new game for an evicted session starts over
+    status, state = post(client, 'new_game', session_id='b', difficulty='easy')
+    assert status == 200 and state['fen'] == START_FEN
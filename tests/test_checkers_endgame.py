@@ -0,0 +1,101 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from checkers import Checkers, WIN_BOUND
+from checkers_bitboard import Position, O, X
+from checkers_endgame import (
+    EndgameDatabase, WIN, DRAW, LOSS, all_slices, generate_all, get_default_database,
+    index_position, mirror, position_index, slice_size
+)
+
+database = get_default_database()
+needs_database = pytest.mark.skipif(database is None, reason='endgame database not generated')
+
+
+def placed(o, x, kings, side):
+    position = Position('O:O:X')
+    position.pieces = [o, x]
+    position.kings = kings
+    position.side = side
+    position.key = position.compute_key()
+    position.counts = position.compute_counts()
+    return position
+
+
+def test_index_round_trip():
+    rng = random.Random(5)
+    for key in all_slices(4):
+        size = slice_size(key)
+        for index in rng.sample(range(size), min(200, size)):
+            placement = index_position(key, index)
+            if placement is not None:
+                assert position_index(key, *placement) == index
+
+
+def test_small_database_matches_the_shipped_one(tmp_path):
+    generate_all(str(tmp_path), max_pieces=2, distance=False)
+    small = EndgameDatabase(str(tmp_path))
+    assert small.max_pieces == 2
+    # Two kings in the double corners
+    assert small.probe(Position('O:OK4:XK29')) == (DRAW, 0)
+    assert small.probe(Position('X:O31:X2')) == (WIN, None)
+    if database is not None:
+        for fen in ('O:O14:X5', 'X:O22:XK9', 'O:OK18:X9', 'X:O31:X2'):
+            result = database.probe(Position(fen))
+            assert small.probe(Position(fen)) == (result[0], None if result[0] else 0)
+    small.close()
+
+
+@needs_database
+def test_results_agree_with_the_moves():
+    # A result must follow from the results one move later
+    rng = random.Random(11)
+    for key in all_slices(database.max_pieces):
+        size = slice_size(key)
+        for index in rng.sample(range(size), min(40, size)):
+            placement = index_position(key, index)
+            if placement is None:
+                continue
+            o, x, kings = placement
+            for position in (placed(o, x, kings, O), placed(mirror(x), mirror(o), mirror(kings), X)):
+                children = []
+                for move in position.legal_moves():
+                    position.make(move)
+                    children.append(database.probe(position) or (LOSS, 0))
+                    position.unmake()
+                wins = [plies for result, plies in children if result == LOSS]
+                if not children:
+                    expected = (LOSS, 0)
+                elif wins:
+                    expected = (WIN, min(wins) + 1)
+                elif all(result == WIN for result, _ in children):
+                    expected = (LOSS, max(plies for _, plies in children) + 1)
+                else:
+                    expected = (DRAW, 0)
+                assert database.probe(position) == expected, position.fen()
+
+
+@needs_database
+def test_known_endings():
+    assert database.probe(Position('O:OK1,K2:XK32'))[0] == WIN
+    assert database.probe(Position('X:OK1,K2:XK32'))[0] == LOSS
+    assert database.probe(Position('O:OK4:XK29')) == (DRAW, 0)
+    # The king is caught in its single corner
+    assert database.probe(Position('O:OK1:XK32')) == (WIN, 11)
+
+
+@needs_database
+def test_search_plays_the_database_move():
+    game = Checkers()
+    game.position.set_fen('X:OK15:XK1,K2')
+    game._sync_board()
+    move, score = game.minimax(3, float('-inf'), float('inf'), True)
+    assert move is not None
+    assert score > WIN_BOUND
+    found = database.probe_root(game.position)
+    assert found[1][0] == WIN
@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from checkers_bitboard import Position, move_to_text, squares_of
+from checkers_perft import PERFT_SUITE, perft, divide
+
+# Keep the default run quick; `python checkers_perft.py` walks the deeper levels
+MAX_NODES = 100000
+
+CASES = [
+    pytest.param(fen, depth, expected, id=f"{name}-d{depth}")
+    for name, fen, counts in PERFT_SUITE
+    for depth, expected in enumerate(counts, 1)
+    if expected <= MAX_NODES
+]
+
+
+@pytest.mark.parametrize('fen, depth, expected', CASES)
+def test_perft_suite(fen, depth, expected):
+    position = Position(fen)
+    assert perft(position, depth) == expected
+    # make/unmake must leave the position exactly as it was
+    assert position.fen() == fen
+    assert position.key == position.compute_key()
+
+
+def legal(fen):
+    return {(move_to_text(move), tuple(sq + 1 for sq in squares_of(move >> 10)))
+            for move in Position(fen).legal_moves()}
+
+
+def test_capture_is_mandatory():
+    assert legal('O:O22,30:X18') == {('22x13', (18,))}
+
+
+def test_multi_jump_is_played_to_the_end():
+    assert legal('O:O29:X26,19,12') == {('29x8', (12, 19, 26))}
+
+
+def test_men_do_not_capture_backwards():
+    assert legal('O:O14:X18') == {('14-10', ()), ('14-11', ())}
+
+
+def test_crowning_ends_the_move():
+    # Crowned on 2, the new king may not go on to jump 5
+    assert legal('O:O11:X5,6') == {('11x2', (6,))}
+
+
+def test_king_jump_back_to_its_own_square():
+    position = Position('X:O10,11,18,19:XK13')
+    moves = position.legal_moves()
+    # Both directions round the loop take the same pieces: one move
+    assert len(moves) == 1
+    position.make(moves[0])
+    assert position.fen() == 'O:O:XK13'
+    assert position.key == position.compute_key()
+    position.unmake()
+    assert position.fen() == 'X:O10,11,18,19:XK13'
+
+
+def test_divide_matches_perft():
+    position = Position(PERFT_SUITE[0][1])
+    counts = divide(position, 3)
+    assert len(counts) == 7
+    assert sum(counts.values()) == 302
@@ -0,0 +1,104 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from checkers import Checkers, WIN_BOUND
+from checkers_bitboard import Position, squares_of
+from checkers_eval import compile_weights, evaluate
+
+MIDGAME = 'X:O17,21,22,23,24,25,26,27,28,29,30,31,32:X1,2,3,4,5,6,7,8,9,10,11,14'
+
+
+def load(game, fen):
+    game.position.set_fen(fen)
+    game._sync_board()
+    game.tt.clear()
+
+
+def test_make_unmake_restores_random_games():
+    rng = random.Random(7)
+    for _ in range(50):
+        position = Position()
+        played = []
+        while len(played) < 120:
+            moves = position.legal_moves()
+            if not moves:
+                break
+            played.append((position.fen(), position.key))
+            position.make(rng.choice(moves))
+            assert position.key == position.compute_key()
+            assert position.counts == position.compute_counts()
+        # Crowned men turn back into men, captured kings come back as kings
+        while played:
+            position.unmake()
+            assert (position.fen(), position.key) == played.pop()
+
+
+def mirrored(position):
+    """The same position with the board turned round and the colours swapped"""
+    names = []
+    for side in (1, 0):
+        names.append(','.join(('K' if position.kings >> sq & 1 else '') + str(32 - sq)
+                              for sq in reversed(squares_of(position.pieces[side]))))
+    return Position(f"{'XO'[position.side]}:O{names[0]}:X{names[1]}")
+
+
+def test_evaluation_is_symmetric():
+    weights = compile_weights({'pattern_weight': 0.84})
+    rng = random.Random(11)
+    for _ in range(100):
+        position = Position()
+        for _ in range(rng.randint(0, 80)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make(rng.choice(moves))
+        assert abs(evaluate(position, weights) + evaluate(mirrored(position), weights)) < 1e-9
+
+
+def test_evaluate_board_matches_the_search_evaluation():
+    game = Checkers()
+    load(game, MIDGAME)
+    weights = compile_weights(game.game_settings.adjust_settings('checkers'))
+    assert game.evaluate_board(game.board) == evaluate(game.position, weights)
+
+
+def test_search_leaves_the_game_unchanged():
+    game = Checkers()
+    load(game, MIDGAME)
+    board = [row[:] for row in game.board]
+    game.minimax(5, float('-inf'), float('inf'), True)
+    assert game.position.fen() == MIDGAME
+    assert game.position.ply == 0
+    assert game.board == board
+    assert not game.player_turn
+
+
+def test_search_is_deterministic():
+    results = []
+    for _ in range(2):
+        game = Checkers()
+        load(game, MIDGAME)
+        results.append(game.minimax(5, float('-inf'), float('inf'), True))
+    assert results[0] == results[1]
+
+
+def test_lost_position_still_gets_a_move():
+    game = Checkers()
+    load(game, 'X:OK15,K22:X5')
+    move, score = game.minimax(6, float('-inf'), float('inf'), True)
+    assert move is not None
+    assert score < -WIN_BOUND
+    assert game.ai_move_minimax()
+    assert game.player_turn and not game.game_over
+
+
+def test_search_takes_the_win():
+    game = Checkers()
+    # X to move wins at once by taking the last O piece
+    load(game, 'X:O18:X14,1')
+    move, score = game.minimax(4, float('-inf'), float('inf'), True)
+    assert move == ((3, 3), (5, 1))
+    assert score > WIN_BOUND
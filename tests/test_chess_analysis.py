@@ -0,0 +1,60 @@
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess_analysis import analyse_file
+
+FENS = [
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1',
+    'rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP w KQkq - 0 1',  # Seven ranks
+    '# a comment',
+    '6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1',
+    'not a fen',
+]
+
+
+def read_records(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f]
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_malformed_lines_are_recorded_and_skipped_on_resume(tmp_path, workers):
+    source = tmp_path / 'positions.fen'
+    source.write_text('\n'.join(FENS) + '\n', encoding='utf-8')
+    output = str(tmp_path / 'scores.jsonl')
+
+    summary = analyse_file(str(source), output, depth=2, workers=workers)
+    assert (summary['positions'], summary['errors'], summary['skipped']) == (4, 2, 0)
+    records = {record['id']: record for record in read_records(output)}
+    assert sorted(records) == ['1', '2', '4', '5']
+    assert records['2']['error'] and records['2']['best'] is None
+    assert records['5']['error']
+    assert records['4']['error'] is None and records['4']['best'] == 'a1a8'
+
+    # Interrupt the run in the middle of the last record, then resume
+    with open(output, 'rb+') as f:
+        data = f.read()
+        f.truncate(len(data) - 5)
+    summary = analyse_file(str(source), output, depth=2, workers=workers)
+    assert (summary['positions'], summary['skipped']) == (1, 3)
+    assert sorted(record['id'] for record in read_records(output)) == ['1', '2', '4', '5']
+
+    summary = analyse_file(str(source), output, depth=2, workers=workers)
+    assert (summary['positions'], summary['errors'], summary['skipped']) == (0, 0, 4)
+
+
+def test_csv_output_has_an_error_column(tmp_path):
+    source = tmp_path / 'positions.fen'
+    source.write_text(FENS[1] + '\n' + FENS[3] + '\n', encoding='utf-8')
+    output = str(tmp_path / 'scores.csv')
+    analyse_file(str(source), output, depth=1, workers=1)
+    with open(output, encoding='utf-8') as f:
+        header, first, second = f.read().splitlines()
+    assert header.endswith(',error')
+    assert 'Invalid FEN' in first
+    assert second.endswith(',')
@@ -0,0 +1,86 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess_bitboard import (
+    BETWEEN, CAPTURE, KING_ATTACKS, KNIGHT_ATTACKS, KNIGHT, PAWN_ATTACKS, PROMOTION, QUEEN,
+    QUIET, DOUBLE_PUSH, EP_CAPTURE, Position, bishop_attacks, encode_move, move_flag,
+    move_from, move_promotion, move_to, move_to_uci, rook_attacks
+)
+
+
+def naive_slider(sq, occupied, directions):
+    """Walk each ray square by square up to the first piece"""
+    attacks = 0
+    row, col = divmod(sq, 8)
+    for dr, dc in directions:
+        r, c = row + dr, col + dc
+        while 0 <= r < 8 and 0 <= c < 8:
+            attacks |= 1 << (r * 8 + c)
+            if occupied >> (r * 8 + c) & 1:
+                break
+            r, c = r + dr, c + dc
+    return attacks
+
+
+def naive_leaper(sq, deltas):
+    row, col = divmod(sq, 8)
+    return sum(1 << ((row + dr) * 8 + col + dc) for dr, dc in deltas
+               if 0 <= row + dr < 8 and 0 <= col + dc < 8)
+
+
+def test_slider_tables_match_ray_walks():
+    rng = random.Random(2)
+    for sq in range(64):
+        for _ in range(30):
+            occupied = rng.getrandbits(64) & rng.getrandbits(64)
+            assert rook_attacks(sq, occupied) == \
+                naive_slider(sq, occupied, ((-1, 0), (1, 0), (0, -1), (0, 1)))
+            assert bishop_attacks(sq, occupied) == \
+                naive_slider(sq, occupied, ((-1, -1), (-1, 1), (1, -1), (1, 1)))
+
+
+def test_leaper_tables():
+    knight = [(dr, dc) for dr in (-2, -1, 1, 2) for dc in (-2, -1, 1, 2) if abs(dr) != abs(dc)]
+    king = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+    for sq in range(64):
+        assert KNIGHT_ATTACKS[sq] == naive_leaper(sq, knight)
+        assert KING_ATTACKS[sq] == naive_leaper(sq, king)
+        # Square 0 is a8: white pawns move up the board, to lower rows
+        assert PAWN_ATTACKS[0][sq] == naive_leaper(sq, ((-1, -1), (-1, 1)))
+        assert PAWN_ATTACKS[1][sq] == naive_leaper(sq, ((1, -1), (1, 1)))
+
+
+def test_between():
+    # a1 (56) to h8 (7): the long diagonal's six inner squares
+    assert BETWEEN[56 * 64 + 7] == sum(1 << (56 - 7 * step) for step in range(1, 7))
+    assert BETWEEN[0 * 64 + 3] == (1 << 1) | (1 << 2)
+    assert BETWEEN[0 * 64 + 1] == 0
+    assert BETWEEN[0 * 64 + 10] == 0  # Not on a line
+
+
+def test_move_encoding_round_trip():
+    for from_sq in range(64):
+        for to_sq in range(64):
+            for flag in (QUIET, DOUBLE_PUSH, CAPTURE, EP_CAPTURE):
+                move = encode_move(from_sq, to_sq, flag)
+                assert move < 1 << 16
+                assert (move_from(move), move_to(move), move_flag(move)) == (from_sq, to_sq, flag)
+                assert move_promotion(move) is None
+    for piece in range(KNIGHT, QUEEN + 1):
+        for flag in (PROMOTION, PROMOTION | CAPTURE):
+            move = encode_move(12, 4, flag | (piece - KNIGHT))
+            assert move_promotion(move) == piece
+    assert move_to_uci(encode_move(52, 36, DOUBLE_PUSH)) == 'e2e4'
+    assert move_to_uci(encode_move(12, 4, PROMOTION | (QUEEN - KNIGHT))) == 'e7e8q'
+
+
+def test_fen_round_trip():
+    for fen in ['r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1',
+                '8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1',
+                'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3']:
+        position = Position(fen)
+        assert position.fen() == fen
+        assert position.key == position.compute_key()
@@ -0,0 +1,134 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess import Chess
+from chess_bitboard import Position, move_to_uci
+from chess_book import RECORD, OpeningBook, build_book, get_default_book, parse_san, read_pgn_games
+
+PGN = """
+[Event "One"]
+[Result "1-0"]
+
+1. e4 e5 {The open game} 2. Nf3 (2. f4 exf4) Nc6 3. Bb5 a6 1-0
+
+[Event "Two"]
+
+1. e4 e5 2. Nf3 Nf6 1/2-1/2
+
+[Event "Three"]
+1. e4 c5 2. Nf3 d6 $1 3. d4 cxd4 4. Nxd4 Nf6 5. Nc3 a6 *
+
+[Event "Bad"]
+1. e4 e5 2. Ke3 Nc6 0-1
+"""
+
+
+@pytest.fixture
+def book(tmp_path):
+    path = tmp_path / 'book.bin'
+    build_book(PGN, str(path), max_plies=8)
+    book = OpeningBook(str(path))
+    yield book
+    book.close()
+
+
+def book_moves(book, position):
+    return {move_to_uci(move): weight for move, weight in book.lookup(position.key)}
+
+
+def play(*sans):
+    position = Position()
+    for san in sans:
+        position.make(parse_san(position, san))
+    return position
+
+
+def test_read_pgn_games_drops_comments_and_variations():
+    games = read_pgn_games(PGN)
+    assert len(games) == 4
+    tags, moves = games[0]
+    assert tags == {'Event': 'One', 'Result': '1-0'}
+    assert moves == ['e4', 'e5', 'Nf3', 'Nc6', 'Bb5', 'a6']
+    assert games[2][1][:4] == ['e4', 'c5', 'Nf3', 'd6']
+
+
+def test_parse_san():
+    position = play('e4', 'e5', 'Nf3', 'Nc6', 'Bc4', 'Nf6')
+    assert move_to_uci(parse_san(position, 'O-O')) == 'e1g1'
+    assert move_to_uci(parse_san(position, 'Nxe5')) == 'f3e5'
+    assert move_to_uci(parse_san(position, 'Bxf7+')) == 'c4f7'
+    with pytest.raises(ValueError):
+        parse_san(position, 'Nxe4')  # Nothing to take there
+    with pytest.raises(ValueError):
+        parse_san(position, 'Qh9')
+
+    rooks = Position('4k3/8/8/8/8/8/4K3/R6R w - - 0 1')
+    with pytest.raises(ValueError):
+        parse_san(rooks, 'Rd1')  # Ambiguous
+    assert move_to_uci(parse_san(rooks, 'Rad1')) == 'a1d1'
+    assert move_to_uci(parse_san(Position('4k3/1P6/8/8/8/8/8/4K3 w - - 0 1'), 'b8=N')) == 'b7b8n'
+
+
+def test_records_are_sorted_and_weighted(book):
+    with open(book.path, 'rb') as f:
+        data = f.read()
+    records = [RECORD.unpack_from(data, offset) for offset in range(0, len(data), RECORD.size)]
+    assert records == sorted(records) and len(records) == book.count
+
+    # Four games open 1. e4, three of them answer 1... e5
+    assert book_moves(book, Position()) == {'e2e4': 4}
+    assert book_moves(book, play('e4')) == {'e7e5': 3, 'c7c5': 1}
+    assert book_moves(book, play('e4', 'e5', 'Nf3')) == {'b8c6': 1, 'g8f6': 1}
+    # The bad game stops counting at its illegal move; the last ply is past max_plies
+    assert book_moves(book, play('e4', 'e5')) == {'g1f3': 2}
+    assert book_moves(book, play('e4', 'c5', 'Nf3', 'd6', 'd4', 'cxd4', 'Nxd4', 'Nf6')) == {}
+    assert book.lookup(12345) == []
+
+
+def test_choose_move_follows_the_weights(book):
+    position = play('e4')
+    rng = random.Random(3)
+    picks = [move_to_uci(book.choose_move(position, rng)) for _ in range(400)]
+    assert set(picks) == {'e7e5', 'c7c5'}
+    assert 0.65 < picks.count('e7e5') / len(picks) < 0.85
+    assert book.choose_move(play('d4')) is None
+
+
+def test_an_empty_book(tmp_path):
+    path = tmp_path / 'empty.bin'
+    assert build_book('', str(path)) == 0
+    book = OpeningBook(str(path))
+    assert book.lookup(Position().key) == [] and book.choose_move(Position()) is None
+    book.close()
+
+
+def test_the_shipped_book_plays_legal_moves():
+    book = get_default_book()
+    if book is None:
+        pytest.skip('no opening book in data/')
+    position = Position()
+    for _ in range(6):
+        move = book.choose_move(position, random.Random(len(position.history)))
+        if move is None:
+            break
+        assert move in position.legal_moves()
+        position.make(move)
+    assert position.history
+
+
+def test_ai_answers_from_the_book(monkeypatch):
+    if get_default_book() is None:
+        pytest.skip('no opening book in data/')
+    game = Chess()
+    game.set_difficulty('medium')
+    game.use_opening_book = True
+    monkeypatch.setattr(game, 'minimax', lambda *args: pytest.fail('searched a book position'))
+    assert game.make_move(6, 4, 4, 4)
+    key = game.position.key
+    assert game.ai_move_minimax(2)
+    assert game.position.history[-1][0] in [move for move, _ in get_default_book().lookup(key)]
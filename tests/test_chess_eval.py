@@ -0,0 +1,118 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess import Chess
+from chess_bitboard import Position, move_promotion
+from chess_eval import (
+    PawnHashTable, evaluate_pawns, evaluate_position, pawn_terms, side_to_move_evaluator
+)
+from chess_perft import KIWIPETE_FEN, PERFT_SUITE
+from chess_search import ChessSearch
+
+
+def mirror(fen):
+    """The same position with the colours swapped"""
+    placement, side, castling, ep = fen.split()[:4]
+    placement = '/'.join(reversed(placement.split('/'))).swapcase()
+    castling = ''.join(sorted(castling.swapcase())) if castling != '-' else '-'
+    ep = ep[0] + str(9 - int(ep[1])) if ep != '-' else '-'
+    return f"{placement} {'b' if side == 'w' else 'w'} {castling} {ep} 0 1"
+
+
+def random_games(count, seed):
+    """Positions along random games, each with the moves that led to it"""
+    rng = random.Random(seed)
+    for _ in range(count):
+        position = Position()
+        for _ in range(150):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            # Promote whenever possible, so the promotion updates are exercised too
+            promotions = [move for move in moves if move_promotion(move) is not None]
+            position.make(rng.choice(promotions or moves))
+            yield position
+
+
+def test_incremental_score_matches_a_full_recompute():
+    for position in random_games(30, seed=8):
+        assert position.score == pytest.approx(position.compute_score(), abs=1e-9)
+        assert position.pawn_key == position.compute_pawn_key()
+
+
+def test_unmake_restores_the_score():
+    position = None
+    for position in random_games(1, seed=9):
+        pass
+    assert len(position.history) > 100
+    while position.history:
+        position.unmake()
+        assert position.score == pytest.approx(position.compute_score(), abs=1e-9)
+    assert position.fen() == Position().fen()
+
+
+@pytest.mark.parametrize('fen', [fen for _, fen, _ in PERFT_SUITE])
+def test_scores_are_colour_symmetric(fen):
+    assert Position(fen).score == pytest.approx(-Position(mirror(fen)).score, abs=1e-9)
+
+
+def test_debug_eval_checks_every_evaluation_of_a_game():
+    game = Chess()
+    game.set_difficulty('easy')
+    game.use_opening_book = False
+    game.debug_eval = True
+    for move in [(6, 4, 4, 4), (7, 6, 5, 5), (7, 5, 4, 2)]:
+        assert game.make_move(*move)
+        assert game.ai_move_minimax(2)
+
+
+@pytest.mark.parametrize('fen, terms', [
+    # Doubled, isolated, backward, then passed pawns by rank; white's minus black's
+    ('4k3/8/8/8/8/P7/P7/4K3 w - - 0 1', [1, 2, 0, 0, 1, 1, 0, 0, 0, 0, 0]),
+    ('4k3/2p5/8/1P1P4/8/8/8/4K3 w - - 0 1', [0, 1, 1, 0, 0, 0, 0, 0, 0, 0, 0]),
+    ('4k3/p7/8/8/8/8/PP6/4K3 w - - 0 1', [0, -1, 0, 0, 0, 0, 0, 0, 0, 0, 0]),
+    ('4k3/8/8/3p4/4P3/8/8/4K3 w - - 0 1', [0] * 11),
+    ('4k3/1P6/8/8/8/6p1/8/4K3 w - - 0 1', [0, 0, 0, 0, 0, 0, 0, 0, -1, 1, 0]),
+])
+def test_pawn_terms(fen, terms):
+    position = Position(fen)
+    assert pawn_terms(position.bb[0], position.bb[6]) == terms
+    mirrored = Position(mirror(fen))
+    assert pawn_terms(mirrored.bb[0], mirrored.bb[6]) == [-count for count in terms]
+
+
+def test_pawn_hash_hits_and_misses():
+    table = PawnHashTable(size_bits=4)
+    position = Position(KIWIPETE_FEN)
+    white, black = position.bb[0], position.bb[6]
+    expected = evaluate_pawns(white, black)
+    assert table.probe(position.pawn_key, white, black) == expected
+    assert table.probe(position.pawn_key, white, black) == expected
+    assert table.stats() == {'hits': 1, 'misses': 1, 'hit_rate': 0.5}
+
+    # Another pawn formation on the same index replaces the entry
+    other = Position()
+    other_key = (other.pawn_key & ~table.mask) | (position.pawn_key & table.mask)
+    assert table.probe(other_key, other.bb[0], other.bb[6]) == evaluate_pawns(other.bb[0], other.bb[6])
+    assert table.probe(position.pawn_key, white, black) == expected
+    assert (table.hits, table.misses) == (1, 3)
+
+
+def test_pawn_hash_answers_most_evaluations_of_a_search():
+    position = Position(KIWIPETE_FEN)
+    pawn_table = PawnHashTable()
+    searcher = ChessSearch(position, side_to_move_evaluator(position, pawn_table))
+    searcher.search(3)
+    stats = pawn_table.stats()
+    assert stats['misses'] < stats['hits'] and stats['hit_rate'] > 0.9
+    # Cached or not, the evaluation is the same
+    fresh = PawnHashTable()
+    for move in position.legal_moves():
+        position.make(move)
+        assert evaluate_position(position, pawn_table) == evaluate_position(position, fresh)
+        position.unmake()
@@ -0,0 +1,130 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+import chess_hints
+from chess_bitboard import Position, move_to_uci
+from chess_eval import PawnHashTable, side_to_move_evaluator
+from chess_hints import AnalysisCache, analyse, hint
+from chess_search import ChessSearch, MATE_SCORE
+
+OPENING_FEN = 'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3'
+# Black mates with Qh4
+FOOLS_MATE_FEN = 'rnbqkbnr/pppp1ppp/8/4p3/6P1/5P2/PPPPP2P/RNBQKBNR b KQkq g3 0 2'
+
+
+@pytest.fixture(autouse=True)
+def cache(monkeypatch):
+    fresh = AnalysisCache(size=4)
+    monkeypatch.setattr(chess_hints, '_cache', fresh)
+    return fresh
+
+
+def searcher_for(fen):
+    position = Position(fen)
+    return ChessSearch(position, side_to_move_evaluator(position, PawnHashTable()))
+
+
+def test_lines_are_distinct_and_best_first():
+    depth = 3
+    found = searcher_for(OPENING_FEN).search_multipv(depth, 4)
+    assert len(found) == 4
+    scores = [score for score, _ in found]
+    assert scores == sorted(scores, reverse=True)
+    assert len({pv[0] for _, pv in found}) == 4
+    # The first line is the ordinary search's
+    assert scores[0] == pytest.approx(searcher_for(OPENING_FEN).search(depth)[1])
+
+
+def test_lines_rank_the_captures_by_what_they_win():
+    # Pawns take the queen, the rook or the knight, each guarded
+    found = searcher_for('k7/8/8/2q2rn1/1P2P2P/8/8/7K w - - 0 1').search_multipv(3, 3)
+    assert [move_to_uci(pv[0]) for _, pv in found] == ['b4c5', 'e4f5', 'h4g5']
+
+
+def test_principal_variations_are_legal_lines():
+    searcher = searcher_for(OPENING_FEN)
+    for _, pv in searcher.search_multipv(4, 3):
+        position = Position(OPENING_FEN)
+        for move in pv:
+            assert move in position.legal_moves()
+            position.make(move)
+    assert searcher.position.fen() == OPENING_FEN
+
+
+def test_fewer_lines_than_asked_for_when_few_moves_are_legal():
+    # The king in check can take the queen or step aside
+    found = searcher_for('4k3/8/8/8/8/8/3q4/R3K3 w - - 0 1').search_multipv(2, 5)
+    assert sorted(move_to_uci(pv[0]) for _, pv in found) == ['e1d2', 'e1f1']
+    assert searcher_for('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1').search_multipv(2, 3) == []
+
+
+def test_cache_answers_shallower_requests_and_keeps_the_deepest():
+    cache = AnalysisCache(size=2)
+    assert cache.get(1, 4, 1) is None
+    cache.put(1, 4, 2, 'deep')
+    assert cache.get(1, 4, 2) == 'deep' and cache.get(1, 3, 1) == 'deep'
+    assert cache.get(1, 5, 1) is None and cache.get(1, 4, 3) is None
+    cache.put(1, 3, 5, 'shallow')  # Does not replace the deeper result
+    assert cache.get(1, 4, 1) == 'deep'
+    cache.put(1, 4, 3, 'wider')
+    assert cache.get(1, 4, 3) == 'wider'
+    assert cache.stats() == {'entries': 1, 'hits': 4, 'misses': 3, 'hit_rate': 4 / 7}
+
+
+def test_cache_drops_the_least_recently_used_position():
+    cache = AnalysisCache(size=2)
+    cache.put(1, 2, 1, 'a')
+    cache.put(2, 2, 1, 'b')
+    assert cache.get(1, 2, 1) == 'a'
+    cache.put(3, 2, 1, 'c')
+    assert cache.get(2, 2, 1) is None
+    assert cache.get(1, 2, 1) == 'a' and cache.get(3, 2, 1) == 'c'
+    cache.clear()
+    assert cache.stats()['entries'] == 0
+
+
+def test_repeated_hints_cost_no_search(cache):
+    first = analyse(OPENING_FEN, depth=3, lines=2)
+    assert not first['cached'] and first['nodes'] > 0 and len(first['lines']) == 2
+    again = analyse(OPENING_FEN, depth=3, lines=2)
+    assert again['cached'] and again['nodes'] == 0 and again['lines'] == first['lines']
+    # Shallower and narrower requests are answered by the deeper result
+    assert hint(OPENING_FEN, depth=2) == first['lines'][0]
+    assert analyse(OPENING_FEN, depth=1, lines=1)['lines'] == first['lines'][:1]
+    assert cache.stats()['hits'] == 3
+    assert not analyse(OPENING_FEN, depth=3, lines=3)['cached']
+
+
+def test_searches_cut_short_are_cached_at_the_depth_they_finished(cache, monkeypatch):
+    search_multipv = ChessSearch.search_multipv
+
+    def out_of_time_after_two(self, depth, lines, time_limit=None):
+        return search_multipv(self, min(depth, 2), lines)
+    monkeypatch.setattr(ChessSearch, 'search_multipv', out_of_time_after_two)
+    first = analyse(OPENING_FEN, depth=4, lines=2)
+    assert first['depth'] == 2 and not first['cached']
+    assert analyse(OPENING_FEN, depth=2, lines=2)['cached']
+    assert not analyse(OPENING_FEN, depth=3, lines=2)['cached']
+
+
+def test_lines_are_scored_for_white():
+    found = analyse(FOOLS_MATE_FEN, depth=2, lines=2)
+    best = found['lines'][0]
+    assert best['move'] == 'd8h4' and best['from'] == [0, 3] and best['to'] == [4, 7]
+    assert best['mate'] == -1 and best['score'] == -(MATE_SCORE - 1)
+    assert best['pv'] == ['d8h4']
+    assert found['lines'][1]['mate'] is None
+
+
+def test_bad_positions_are_refused():
+    with pytest.raises(ValueError):
+        analyse('not a fen')
+    with pytest.raises(ValueError):
+        analyse('4k3/8/8/8/8/8/8/8 w - - 0 1')  # No white king
+    with pytest.raises(ValueError):
+        analyse('4k3/4R3/8/8/8/8/8/4K3 w - - 0 1')  # Black, not to move, is in check
+    assert hint('7k/5Q2/6K1/8/8/8/8/8 b - - 0 1', depth=2) is None  # Stalemate
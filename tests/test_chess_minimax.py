@@ -0,0 +1,72 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess import Chess
+from chess_bitboard import Position
+
+
+def snapshot(position):
+    return (position.fen(), position.key, position.pawn_key, position.score,
+            list(position.squares))
+
+
+def test_unmake_restores_every_position_of_random_games():
+    rng = random.Random(1)
+    for _ in range(20):
+        position = Position()
+        snapshots = []
+        for _ in range(120):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            snapshots.append(snapshot(position))
+            position.make(rng.choice(moves))
+            assert position.key == position.compute_key()
+        while snapshots:
+            position.unmake()
+            assert snapshot(position) == snapshots.pop()
+
+
+def test_minimax_leaves_the_game_as_it_was():
+    game = Chess()
+    game.set_difficulty('easy')
+    for move in [(6, 4, 4, 4), (6, 3, 4, 3), (7, 6, 5, 5)]:
+        assert game.make_move(*move)
+        fen, board = game.position.fen(), [row[:] for row in game.board]
+        history = list(game.position.history)
+        best_move, _ = game.minimax(3, float('-inf'), float('inf'), True)
+        assert best_move is not None
+        (from_row, from_col), (to_row, to_col), promotion = best_move
+        assert promotion is None
+        assert (to_row, to_col) in game.get_valid_moves(from_row, from_col)
+        assert game.position.fen() == fen and game.board == board
+        assert game.position.history == history
+        assert game.ai_move_minimax(2)
+
+
+def test_minimax_finds_mate_for_black():
+    game = Chess()
+    game.set_difficulty('easy')
+    # 1. f3 e5 2. g4: Qh4 is mate
+    for move in [(6, 5, 5, 5), (1, 4, 3, 4), (6, 6, 4, 6)]:
+        assert game.make_move(*move)
+    best_move, score = game.minimax(2, float('-inf'), float('inf'), True)
+    assert best_move == ((0, 3), (4, 7), None)
+    assert score > 100
+
+
+def test_minimax_underpromotes_when_only_a_knight_wins():
+    # f1=Q is taken by the rook; f1=N+ forks the king and the queen
+    game = Chess()
+    game.set_difficulty('easy')
+    game.position.set_fen('6k1/8/8/8/8/4K3/5p1Q/R7 b - - 0 1')
+    game._sync_board()
+    game.player_turn = False
+    best_move, _ = game.minimax(3, float('-inf'), float('inf'), True)
+    assert best_move == ((6, 5), (7, 5), 'N')
+    assert game.ai_move_minimax(3)
+    piece = game.board[7][5]
+    assert (piece['piece'], piece['color']) == ('N', 'black')
@@ -0,0 +1,168 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess_bitboard import (
+    CAPTURE, DOUBLE_PUSH, EP_CAPTURE, KING_CASTLE, NO_PIECE, PROMOTION, QUEEN_CASTLE,
+    Position, encode_move, move_flag, move_to_uci
+)
+
+
+KNIGHT_STEPS = [(dr, dc) for dr in (-2, -1, 1, 2) for dc in (-2, -1, 1, 2) if abs(dr) != abs(dc)]
+KING_STEPS = [(dr, dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1) if dr or dc]
+ROOK_RAYS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+BISHOP_RAYS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+def pseudo_legal_moves(position):
+    """Every move by piece rules alone, ignoring the king's safety
+
+    Castling is taken from the engine: these tests are about checks and pins.
+    """
+    side = position.side
+    squares = position.squares
+    moves = [move for move in position.legal_moves()
+             if move_flag(move) in (KING_CASTLE, QUEEN_CASTLE)]
+
+    def add(from_sq, to_sq, flag):
+        if squares[to_sq] != NO_PIECE:
+            flag |= CAPTURE
+        moves.append(encode_move(from_sq, to_sq, flag))
+
+    for sq, piece in enumerate(squares):
+        if piece == NO_PIECE or piece // 6 != side:
+            continue
+        kind = piece % 6
+        row, col = divmod(sq, 8)
+        targets = []
+        if kind == 0:
+            forward = -1 if side == 0 else 1
+            promotes = row + forward in (0, 7)
+            steps = []
+            if squares[sq + 8 * forward] == NO_PIECE:
+                steps.append(sq + 8 * forward)
+                if row == (6 if side == 0 else 1) and squares[sq + 16 * forward] == NO_PIECE:
+                    moves.append(encode_move(sq, sq + 16 * forward, DOUBLE_PUSH))
+            for dc in (-1, 1):
+                if 0 <= col + dc < 8:
+                    to_sq = sq + 8 * forward + dc
+                    if to_sq == position.ep:
+                        moves.append(encode_move(sq, to_sq, EP_CAPTURE))
+                    elif squares[to_sq] != NO_PIECE and squares[to_sq] // 6 != side:
+                        steps.append(to_sq)
+            for to_sq in steps:
+                for promotion in (range(4) if promotes else [None]):
+                    add(sq, to_sq, 0 if promotion is None else PROMOTION | promotion)
+            continue
+        if kind in (1, 5):
+            for dr, dc in (KNIGHT_STEPS if kind == 1 else KING_STEPS):
+                if 0 <= row + dr < 8 and 0 <= col + dc < 8:
+                    targets.append((row + dr) * 8 + col + dc)
+        else:
+            rays = {2: BISHOP_RAYS, 3: ROOK_RAYS, 4: BISHOP_RAYS + ROOK_RAYS}[kind]
+            for dr, dc in rays:
+                r, c = row + dr, col + dc
+                while 0 <= r < 8 and 0 <= c < 8:
+                    targets.append(r * 8 + c)
+                    if squares[r * 8 + c] != NO_PIECE:
+                        break
+                    r, c = r + dr, c + dc
+        for to_sq in targets:
+            if squares[to_sq] == NO_PIECE or squares[to_sq] // 6 != side:
+                add(sq, to_sq, 0)
+    return moves
+
+
+def brute_force_legal_moves(position):
+    """Pseudo-legal moves that do not leave the mover's king attacked"""
+    side = position.side
+    legal = []
+    for move in pseudo_legal_moves(position):
+        position.make(move)
+        if not position.is_attacked(position.king_square(side), side ^ 1):
+            legal.append(move)
+        position.unmake()
+    return legal
+
+
+def engine_divide(position, depth):
+    counts = {}
+    for move in position.legal_moves():
+        position.make(move)
+        counts[move_to_uci(move)] = len(position.legal_moves()) if depth == 2 else 1
+        position.unmake()
+    return counts
+
+
+def brute_force_divide(position, depth):
+    counts = {}
+    for move in brute_force_legal_moves(position):
+        position.make(move)
+        counts[move_to_uci(move)] = len(brute_force_legal_moves(position)) if depth == 2 else 1
+        position.unmake()
+    return counts
+
+
+CHECKED_POSITIONS = [
+    '4k3/8/8/8/8/8/4r3/R3K2R w KQ - 0 1',           # Rook check, no castling out of it
+    '4k3/8/8/8/1b6/8/8/RN2K3 w Q - 0 1',            # Bishop check the knight can block
+    '4k3/8/5n2/8/8/4r3/8/4K3 w - - 0 1',            # Double check: only the king moves
+    'r3k3/8/8/8/8/3n4/8/R3K2R w KQq - 0 1',         # Knight check
+    'k7/8/8/3pP3/4K3/8/8/8 w - d6 0 1',             # Pawn check, answered en passant
+    '1k6/8/8/2q5/8/8/6PP/6K1 w - - 0 1',
+    'rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3',  # Mate
+    '8/8/8/8/8/3k4/3p4/2R1K3 w - - 0 1',
+    'r3k3/8/8/q7/8/8/3B4/4K2r w - - 0 1',           # Check with a pinned bishop
+]
+
+PINNED_POSITIONS = [
+    '4k3/4r3/8/8/8/8/4R3/4K3 w - - 0 1',            # The rook may only slide along the pin
+    '4k3/8/8/8/1b6/8/3R4/4K3 w - - 0 1',            # A rook pinned on a diagonal is stuck
+    '4k3/8/8/8/1b6/8/3Q4/4K3 w - - 0 1',            # A queen may take the pinner
+    'k7/8/8/KPp4r/8/8/8/8 w - c6 0 1',              # En passant would expose the king
+]
+
+
+def random_game_positions(count, seed, checked):
+    """FENs met in random games, all in check or none"""
+    rng = random.Random(seed)
+    fens = []
+    while len(fens) < count:
+        position = Position()
+        for _ in range(200):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make(rng.choice(moves))
+            if position.in_check() == checked:
+                fens.append(position.fen())
+    return fens[:count]
+
+
+def assert_matches_brute_force(fen):
+    position = Position(fen)
+    engine = sorted(move_to_uci(move) for move in position.legal_moves())
+    assert engine == sorted(move_to_uci(move) for move in brute_force_legal_moves(position))
+    assert position.has_legal_move() == bool(engine)
+    assert position.fen() == fen
+
+
+@pytest.mark.parametrize('fen', CHECKED_POSITIONS + random_game_positions(60, 5, True))
+def test_legal_moves_in_check_match_brute_force(fen):
+    assert Position(fen).in_check()
+    assert_matches_brute_force(fen)
+
+
+@pytest.mark.parametrize('fen', CHECKED_POSITIONS + random_game_positions(10, 6, True))
+def test_divide_in_check_matches_brute_force(fen):
+    position = Position(fen)
+    assert engine_divide(position, 2) == brute_force_divide(position, 2)
+
+
+@pytest.mark.parametrize('fen', PINNED_POSITIONS + random_game_positions(30, 7, False))
+def test_pinned_pieces_match_brute_force(fen):
+    assert_matches_brute_force(fen)
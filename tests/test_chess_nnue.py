@@ -0,0 +1,167 @@
+import json
+import os
+import random
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('safetensors')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess_bitboard import Position
+from chess_eval import PawnHashTable, side_to_move_evaluator
+from chess_nnue import FEATURES, HIDDEN_1, Accumulator, Network, load_training_data, train
+from chess_perft import KIWIPETE_FEN
+from chess_search import ChessSearch
+
+# Castling both ways, en passant and promotions with and without captures
+START_FENS = [None, KIWIPETE_FEN, 'n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1',
+              'rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3']
+
+
+def random_network(hidden=16, seed=0):
+    rng = np.random.default_rng(seed)
+    return Network({
+        'ft.weight': rng.integers(-60, 60, (FEATURES, hidden)).astype(np.int16),
+        'ft.bias': rng.integers(0, 120, hidden).astype(np.int16),
+        'l1.weight': rng.normal(0.0, 0.2, (2 * hidden, HIDDEN_1)).astype(np.float32),
+        'l1.bias': rng.normal(0.0, 0.1, HIDDEN_1).astype(np.float32),
+        'out.weight': rng.normal(0.0, 1.0, HIDDEN_1).astype(np.float32),
+        'out.bias': np.array([0.1], dtype=np.float32)
+    })
+
+
+def mirror(fen):
+    """Same position with the board flipped and the colours swapped"""
+    board, side, castling, ep = fen.split()[:4]
+    board = '/'.join(reversed(board.split('/'))).swapcase()
+    castling = ''.join(sorted(castling.swapcase(), key='KQkq'.index)) if castling != '-' else '-'
+    ep = ep[0] + str(9 - int(ep[1])) if ep != '-' else '-'
+    return f"{board} {'b' if side == 'w' else 'w'} {castling} {ep} 0 1"
+
+
+def without(fen, piece):
+    """FEN with every piece of this letter taken off the board"""
+    board, rest = fen.split(' ', 1)
+    rows = []
+    for row in board.split('/'):
+        squares = ''.join('.' * int(char) if char.isdigit() else char for char in row).replace(piece, '.')
+        for empty in range(8, 0, -1):
+            squares = squares.replace('.' * empty, str(empty))
+        rows.append(squares)
+    return '/'.join(rows) + ' ' + rest
+
+
+def test_incremental_updates_match_a_full_evaluation():
+    network = random_network()
+    rng = random.Random(3)
+    for fen in START_FENS:
+        for _ in range(8):
+            position = Position(fen) if fen else Position()
+            accumulator = Accumulator(position, network)
+            played = 0
+            for _ in range(60):
+                moves = position.legal_moves()
+                if not moves:
+                    break
+                if rng.random() < 0.1 and not position.in_check():
+                    position.make_null()
+                    position.unmake_null()
+                position.make(rng.choice(moves))
+                played += 1
+                # Evaluate now and then: pending moves are applied all at once
+                if rng.random() < 0.3:
+                    assert accumulator.evaluate() == pytest.approx(network.evaluate(position), abs=1e-4)
+            while played:
+                position.unmake()
+                played -= 1
+                if rng.random() < 0.3:
+                    assert accumulator.evaluate() == pytest.approx(network.evaluate(position), abs=1e-4)
+            assert len(accumulator.stack) == 1
+
+
+def test_set_fen_refreshes_the_accumulator():
+    network = random_network()
+    position = Position()
+    accumulator = Accumulator(position, network)
+    position.set_fen(KIWIPETE_FEN)
+    assert accumulator.evaluate() == pytest.approx(network.evaluate(Position(KIWIPETE_FEN)), abs=1e-4)
+    accumulator.detach()
+    assert position.accumulator is None
+
+
+def test_both_sides_see_the_board_alike():
+    network = random_network(seed=5)
+    for fen in START_FENS[1:]:
+        assert network.evaluate(Position(fen)) == pytest.approx(network.evaluate(Position(mirror(fen))), abs=1e-4)
+
+
+def test_weights_round_trip_through_safetensors(tmp_path):
+    network = random_network()
+    path = str(tmp_path / 'net.safetensors')
+    network.save(path)
+    loaded = Network.load(path)
+    for fen in START_FENS[1:]:
+        assert loaded.evaluate(Position(fen)) == network.evaluate(Position(fen))
+
+
+def test_search_leaves_the_accumulator_in_step():
+    network = random_network()
+    position = Position(KIWIPETE_FEN)
+    searcher = ChessSearch(position, side_to_move_evaluator(position, PawnHashTable(), network))
+    move, _ = searcher.search(3)
+    assert move
+    accumulator = position.accumulator
+    assert len(accumulator.stack) == 1 and len(position.history) == 0
+    position.make(move)
+    assert accumulator.evaluate() == pytest.approx(network.evaluate(position), abs=1e-4)
+    # The hand-made evaluation drops the accumulator again
+    side_to_move_evaluator(position, PawnHashTable())
+    assert position.accumulator is None
+
+
+def test_training_learns_which_side_is_ahead(tmp_path):
+    records = []
+    rng = random.Random(2)
+    while len(records) < 80:
+        position = Position()
+        for _ in range(rng.randrange(4, 16)):
+            position.make(rng.choice(position.legal_moves()))
+        fen = position.fen()
+        board = fen.split()[0]
+        if 'Q' not in board or 'q' not in board:
+            continue
+        # The side without its queen is well behind
+        records.append({'fen': without(fen, 'Q'), 'score': -9.0})
+        records.append({'fen': without(fen, 'q'), 'score': 9.0})
+    path = tmp_path / 'labels.jsonl'
+    path.write_text(''.join(json.dumps(record) + '\n' for record in records), encoding='utf-8')
+
+    own, other, targets = load_training_data(str(path))
+    assert own.shape == (len(records), 32) and other.shape == own.shape
+    sides = [1 if record['fen'].split()[1] == 'w' else -1 for record in records]
+    assert list(targets) == [record['score'] * side for record, side in zip(records, sides)]
+
+    network = train(own, other, targets, hidden=16, epochs=60, batch_size=16, learning_rate=1e-2)
+    correct = 0
+    for record, side in zip(records, sides):
+        score = network.evaluate(Position(record['fen'])) * side
+        correct += (score > 0) == (record['score'] > 0)
+    assert correct >= 0.9 * len(records)
+
+
+def test_training_data_skips_positions_the_analysis_could_not_score(tmp_path):
+    path = tmp_path / 'labels.jsonl'
+    lines = [
+        {'id': 0, 'fen': KIWIPETE_FEN, 'played': None, 'best': 'e2a6', 'score': 0.5,
+         'depth': 2, 'nodes': 100, 'error': None},
+        {'id': 1, 'fen': 'not a fen', 'played': None, 'best': None, 'score': None,
+         'depth': None, 'nodes': None, 'error': 'Invalid FEN: not a fen'},
+        {'id': 2, 'fen': '4k3/8/8/8/8/8/8/4K3 b - - 0 1', 'score': None, 'error': None}
+    ]
+    path.write_text(''.join(json.dumps(record) + '\n' for record in lines), encoding='utf-8')
+    own, other, targets = load_training_data(str(path))
+    assert own.shape == (1, 32) and other.shape == (1, 32)
+    assert list(targets) == [0.5]
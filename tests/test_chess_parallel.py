@@ -0,0 +1,90 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess_bitboard import Position
+from chess_eval import PawnHashTable, side_to_move_evaluator
+import chess_parallel
+from chess_parallel import ParallelSearch, start_pool, worker_count
+from chess_search import ChessSearch
+from transposition import TranspositionTable, EXACT, LOWER_BOUND, NO_MOVE
+
+FEN = 'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3'
+
+
+def sequential_search(fen, depth):
+    position = Position(fen)
+    searcher = ChessSearch(position, side_to_move_evaluator(position, PawnHashTable()))
+    return searcher.search(depth)
+
+
+def test_parallel_search_matches_the_sequential_score():
+    position = Position(FEN)
+    move, score = ParallelSearch(2).search(position, position.legal_moves(), 3)
+    assert move in position.legal_moves()
+    assert score == sequential_search(FEN, 3)[1]
+    assert position.fen() == FEN
+
+
+def test_results_are_merged_into_the_callers_table():
+    position = Position(FEN)
+    moves = position.legal_moves()
+    tt = TranspositionTable()
+    move, score = ParallelSearch(2).search(position, moves, 3, tt=tt)
+    assert position.fen() == FEN
+
+    depth, flag, stored_score, stored_move = tt.probe(position.key)
+    assert (depth, flag, stored_score, stored_move) == (3, EXACT, score, move)
+
+    # The expected reply to the chosen move is there for pondering
+    position.make(move)
+    depth, flag, stored_score, reply = tt.probe(position.key)
+    assert (depth, flag, stored_score) == (2, EXACT, -score)
+    assert reply in position.legal_moves()
+    position.unmake()
+
+    # Every other move failed low: a lower bound for the opponent after it
+    bounds = 0
+    for other in moves:
+        if other == move:
+            continue
+        position.make(other)
+        entry = tt.probe(position.key)
+        position.unmake()
+        if entry is not None and entry[1] == LOWER_BOUND:
+            assert entry[0] == 2 and entry[2] >= -score
+            bounds += 1
+    assert bounds
+
+
+def test_start_pool_caps_every_search(monkeypatch):
+    monkeypatch.setattr(chess_parallel, '_max_processes', 0)
+    pool = start_pool(2)
+    assert pool._ctx.get_start_method() != 'fork'
+    assert worker_count(8) == 2 and worker_count(1) == 1
+    assert worker_count(0) == min(os.cpu_count() or 1, 2)
+    search = ParallelSearch(8)
+    assert search.processes == 2
+    position = Position(FEN)
+    search.search(position, position.legal_moves(), 2)
+    assert chess_parallel.get_pool(search.processes) is pool
+
+
+def test_only_the_first_two_plies_of_the_line_are_exact():
+    position = Position(FEN)
+    tt = TranspositionTable()
+    move, score = ParallelSearch(2).search(position, position.legal_moves(), 4, tt=tt)
+    line = []
+    for ply in range(4):
+        entry = tt.probe(position.key)
+        if entry is None or entry[3] == NO_MOVE:
+            break
+        line.append(entry)
+        position.make(entry[3])
+    for _ in line:
+        position.unmake()
+    assert position.fen() == FEN
+    assert len(line) >= 3
+    assert [flag for _, flag, _, _ in line[:2]] == [EXACT, EXACT]
+    assert all((depth, flag) == (0, LOWER_BOUND) for depth, flag, _, _ in line[2:])
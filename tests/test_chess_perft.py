@@ -0,0 +1,69 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess_bitboard import Position, START_FEN, move_to_uci
+from chess_perft import PERFT_SUITE, KIWIPETE_FEN, perft, divide
+
+# Keep the default run quick; `python chess_perft.py` walks the deeper levels
+MAX_NODES = 100000
+
+CASES = [
+    pytest.param(fen, depth, expected, id=f"{name}-d{depth}")
+    for name, fen, counts in PERFT_SUITE
+    for depth, expected in enumerate(counts, 1)
+    if expected <= MAX_NODES
+]
+
+
+@pytest.mark.parametrize('fen, depth, expected', CASES)
+def test_perft_suite(fen, depth, expected):
+    position = Position(fen)
+    assert perft(position, depth) == expected
+    # make/unmake must leave the position exactly as it was
+    assert position.fen() == fen
+    assert position.key == position.compute_key()
+
+
+def test_divide_matches_perft():
+    position = Position(KIWIPETE_FEN)
+    counts = divide(position, 2)
+    assert len(counts) == 48
+    assert sum(counts.values()) == 2039
+    assert counts['e1g1'] == 43  # Castling king side
+    assert counts['e1c1'] == 43  # Castling queen side
+
+
+def legal_uci(fen):
+    return {move_to_uci(move) for move in Position(fen).legal_moves()}
+
+
+def test_en_passant_exposing_king_is_illegal():
+    moves = legal_uci('8/8/8/KPp4r/8/8/8/7k w - c6 0 2')
+    assert 'b5c6' not in moves
+    assert moves == {'a5a4', 'a5a6', 'a5b6', 'b5b6'}
+
+
+def test_en_passant_can_capture_the_checking_pawn():
+    moves = legal_uci('8/8/8/2k5/3Pp3/8/8/4K3 b - d3 0 1')
+    assert 'e4d3' in moves
+    assert len(moves) == 9
+
+
+def test_no_castling_through_attacked_square():
+    moves = legal_uci('4k3/8/8/8/8/5r2/8/R3K2R w KQ - 0 1')
+    assert 'e1g1' not in moves
+    assert 'e1c1' in moves
+
+
+def test_promotions():
+    fen = 'n1n5/PPPk4/8/8/8/8/4Kppp/5N1N b - - 0 1'
+    assert perft(Position(fen), 1) == 24
+    assert perft(Position(fen), 3) == 9483
+
+
+def test_start_position_round_trip():
+    assert Position(START_FEN).fen() == START_FEN
@@ -0,0 +1,62 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess import Chess
+from chess_parallel import ParallelSearch
+from transposition import NO_MOVE
+
+DEPTH = 3
+
+
+def hard_game(processes):
+    game = Chess()
+    game.set_difficulty('hard')
+    game.use_opening_book = False
+    game.parallel_search = ParallelSearch(processes) if processes > 1 else None
+    return game
+
+
+@pytest.mark.parametrize('processes', [1, 2])
+def test_ponder_hit_is_played_without_a_search(processes, monkeypatch):
+    game = hard_game(processes)
+    assert game._use_parallel_search(DEPTH) == (processes > 1)
+    assert game.make_move(6, 4, 4, 4)
+    assert game.ai_move_minimax(DEPTH)
+
+    # The reply the AI expects comes from the game's table, also after a parallel search
+    predicted = game.tt.best_move(game.position.key)
+    assert predicted != NO_MOVE
+    assert game.ponderer._thread is not None
+    game.ponderer._thread.join()
+
+    from_row, from_col = divmod(predicted & 63, 8)
+    to_row, to_col = divmod((predicted >> 6) & 63, 8)
+    assert game.make_move(from_row, from_col, to_row, to_col)
+    answer = game.ponderer.get_answer(game.position.key, DEPTH)
+    assert answer is not None
+
+    def no_search(*args, **kwargs):
+        raise AssertionError('the ponder answer should have been played')
+    monkeypatch.setattr(game, 'minimax', no_search)
+    assert game.ai_move_minimax(DEPTH)
+    assert game.position.history[-1][0] == answer[0]
+    game.ponderer.stop()
+
+
+def test_wrong_guess_searches_again():
+    game = hard_game(1)
+    assert game.make_move(6, 4, 4, 4)
+    assert game.ai_move_minimax(DEPTH)
+    predicted = game.tt.best_move(game.position.key)
+    game.ponderer.stop()
+    other = next(move for move in game.position.legal_moves() if move != predicted)
+    from_row, from_col = divmod(other & 63, 8)
+    to_row, to_col = divmod((other >> 6) & 63, 8)
+    assert game.make_move(from_row, from_col, to_row, to_col)
+    assert game.ponderer.get_answer(game.position.key, DEPTH) is None
+    assert game.ai_move_minimax(DEPTH)
+    game.ponderer.stop()
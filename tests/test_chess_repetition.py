@@ -0,0 +1,106 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess import Chess
+from chess_bitboard import Position, move_to_uci
+from chess_eval import PawnHashTable, side_to_move_evaluator
+from chess_perft import KIWIPETE_FEN
+from chess_search import ChessSearch
+
+# Ng1-f3, Ng8-f6, Nf3-g1, Nf6-g8 as (from_row, from_col, to_row, to_col)
+KNIGHT_SHUFFLE = [(7, 6, 5, 5), (0, 6, 2, 5), (5, 5, 7, 6), (2, 5, 0, 6)]
+
+
+def play_uci(position, *moves):
+    for uci in moves:
+        position.make(next(move for move in position.legal_moves() if move_to_uci(move) == uci))
+
+
+def test_has_legal_move_agrees_with_legal_moves():
+    rng = random.Random(6)
+    finished = 0
+    for start in (None, KIWIPETE_FEN):
+        for _ in range(30):
+            position = Position(start) if start else Position()
+            for _ in range(200):
+                moves = position.legal_moves()
+                assert position.has_legal_move() == bool(moves), position.fen()
+                if not moves:
+                    finished += 1
+                    break
+                position.make(rng.choice(moves))
+    assert finished
+
+
+def test_has_legal_move_at_mates_and_stalemates():
+    for fen in ('rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3',  # Mate
+                '7k/5Q2/6K1/8/8/8/8/8 b - - 0 1',                                 # Stalemate
+                '8/8/8/8/8/5k2/5p2/5K2 w - - 0 1'):                               # Stalemate
+        assert not Position(fen).has_legal_move()
+    # In check, with the checker to take
+    assert Position('7k/6Q1/8/5K2/8/8/8/8 b - - 0 1').has_legal_move()
+
+
+def test_repetitions_are_counted_back_to_the_last_irreversible_move():
+    position = Position()
+    start = position.key
+    play_uci(position, 'g1f3', 'g8f6', 'f3g1', 'f6g8')
+    assert position.key == start
+    assert position.is_repetition() and not position.is_repetition(2)
+    play_uci(position, 'g1f3', 'g8f6', 'f3g1', 'f6g8')
+    assert position.is_repetition(2)
+
+    # A pawn move cannot be taken back: counting starts again after it
+    play_uci(position, 'e2e4', 'g8f6', 'g1f3', 'f6g8')
+    assert position.halfmove == 3 and not position.is_repetition()
+    play_uci(position, 'f3g1')
+    assert position.is_repetition() and not position.is_repetition(2)
+
+
+def test_same_placement_with_the_other_side_to_move_is_no_repetition():
+    # The white king walks round a triangle: the men are back, with black to move
+    position = Position('4k3/8/8/8/8/8/8/R3K3 w - - 0 1')
+    placement = position.fen().split()[0]
+    play_uci(position, 'e1d1', 'e8f8', 'd1d2', 'f8e8', 'd2e1')
+    assert position.fen().split()[0] == placement
+    assert not position.is_repetition()
+    play_uci(position, 'e8f8', 'e1d1', 'f8e8', 'd1e1')
+    assert position.is_repetition()
+
+
+def test_threefold_repetition_ends_the_game():
+    game = Chess()
+    for move in KNIGHT_SHUFFLE * 2:
+        assert not game.game_over
+        assert game.make_move(*move)
+    assert game.game_over and game.winner is None
+
+
+def test_fifty_move_rule_ends_the_game_at_a_hundred_plies():
+    for halfmove, over in ((98, False), (99, True)):
+        game = Chess()
+        game.position = Position(f'4k3/8/8/8/8/8/8/R3K3 w - - {halfmove} 80')
+        game._sync_board()
+        assert game.make_move(7, 0, 6, 0)
+        assert game.game_over == over and game.winner is None
+
+
+def test_search_scores_repetitions_and_the_fifty_move_limit_as_draws():
+    # A queen up, with no capture or mate in reach
+    fen = 'k7/8/8/8/8/8/8/KQ6 w - - {} 80'
+    scores = {}
+    for halfmove in (0, 99):
+        position = Position(fen.format(halfmove))
+        searcher = ChessSearch(position, side_to_move_evaluator(position, PawnHashTable()))
+        _, scores[halfmove] = searcher.search(3)
+    assert scores[0] > 5 and scores[99] == 0
+
+    # Nf3 Nf6 Ng1 Ng8 is the start position again: a draw, searched no further
+    position = Position()
+    play_uci(position, 'g1f3', 'g8f6', 'f3g1')
+    searcher = ChessSearch(position, side_to_move_evaluator(position, PawnHashTable()))
+    position.make(next(move for move in position.legal_moves() if move_to_uci(move) == 'f6g8'))
+    assert searcher.negamax(2, -10 ** 6, 10 ** 6, 1) == 0
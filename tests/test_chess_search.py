@@ -0,0 +1,181 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess_bitboard import NO_PIECE, PAWN, Position, move_promotion, move_to_uci, SEE_VALUES
+from chess_eval import PawnHashTable, side_to_move_evaluator
+from chess_perft import KIWIPETE_FEN
+from chess_search import ChessSearch, MATE_SCORE
+from transposition import NO_MOVE
+
+OPENING_FEN = 'r1bqkbnr/pppp1ppp/2n5/4p3/4P3/5N2/PPPP1PPP/RNBQKB1R w KQkq - 2 3'
+
+
+def searcher_for(fen):
+    position = Position(fen)
+    return ChessSearch(position, side_to_move_evaluator(position, PawnHashTable()))
+
+
+def is_capture(move):
+    return bool(move & 0x4000)
+
+
+def mvv_lva(position, move):
+    """(victim, -attacker) piece types; en passant takes a pawn from an empty square"""
+    victim = position.squares[(move >> 6) & 63]
+    return (victim % 6 if victim != NO_PIECE else PAWN, -(position.squares[move & 63] % 6))
+
+
+def test_hash_move_then_captures_by_mvv_lva_then_killers_then_history():
+    searcher = searcher_for(KIWIPETE_FEN)
+    position = searcher.position
+    moves = position.legal_moves()
+    quiet = [move for move in moves if not is_capture(move) and move_promotion(move) is None]
+    hash_move, killer_1, killer_2, good = quiet[0], quiet[1], quiet[2], quiet[3]
+    searcher.killers[2] = [killer_1, killer_2]
+    searcher.history[(position.side << 12) | (good & 0xFFF)] = 500
+
+    ordered = searcher.order_moves(moves, hash_move, 2)
+    assert sorted(ordered) == sorted(moves)
+    assert ordered[0] == hash_move
+    captures = [move for move in ordered if is_capture(move)]
+    assert ordered[1:1 + len(captures)] == captures
+    keys = [mvv_lva(position, move) for move in captures]
+    assert keys == sorted(keys, reverse=True)
+    assert ordered[1 + len(captures):4 + len(captures)] == [killer_1, killer_2, good]
+    # Killers belong to their ply
+    assert searcher.order_moves(moves, NO_MOVE, 3)[len(captures)] == good
+
+
+def test_promotions_are_ordered_queen_first():
+    searcher = searcher_for('1r2k3/P7/8/8/8/8/8/4K3 w - - 0 1')
+    ordered = [move_to_uci(move) for move in searcher.order_moves(
+        searcher.position.legal_moves(), NO_MOVE, 0)]
+    # A queen promotion ranks with taking a queen, under-promotions only by what they take
+    assert ordered[:5] == ['a7a8q', 'a7b8q', 'a7b8r', 'a7b8b', 'a7b8n']
+
+
+def test_search_learns_killers_and_history():
+    searcher = searcher_for(OPENING_FEN)
+    searcher.search(3)
+    assert any(killers[0] != NO_MOVE for killers in searcher.killers)
+    assert any(searcher.history)
+    # A new search halves what history learned instead of forgetting it
+    before = list(searcher.history)
+    searcher.new_search()
+    assert list(searcher.history) == [value >> 1 for value in before]
+
+
+def test_ordering_saves_nodes():
+    ordered = searcher_for(OPENING_FEN)
+    move, _ = ordered.search(3)
+    assert move in ordered.position.legal_moves()
+
+    unordered = searcher_for(OPENING_FEN)
+    unordered.order_moves = lambda moves, hash_move, ply: list(moves)
+    unordered.search(3)
+    assert ordered.nodes * 2 < unordered.nodes
+    assert ordered.qnodes * 2 < unordered.qnodes
+
+
+def find(position, uci):
+    return next(move for move in position.legal_moves() if move_to_uci(move) == uci)
+
+
+@pytest.mark.parametrize('fen, uci, expected', [
+    ('k7/8/8/3n4/4P3/8/8/K7 w - - 0 1', 'e4d5', 3),                # Free knight
+    ('k7/8/2p5/3p4/8/8/3Q4/K7 w - - 0 1', 'd2d5', 1 - 9),           # Queen for a pawn
+    ('k7/8/8/3p4/8/8/3R4/3Q3K w - - 0 1', 'd2d5', 1),
+    ('k7/8/4p3/3p4/8/8/3R4/3Q3K w - - 0 1', 'd2d5', 1 - 5 + 1),     # The queen behind recaptures
+    ('k7/3r4/8/3r4/8/8/3R4/3R2K1 w - - 0 1', 'd2d5', 5),            # Equal trades on d5
+    ('k7/8/8/2n1p3/8/3B4/8/K7 w - - 0 1', 'd3c4', 0),               # Not a capture
+    ('k7/8/8/3pP3/8/8/8/K7 w - d6 0 1', 'e5d6', 1),                 # En passant
+    ('r3k3/1P6/8/8/8/8/8/4K3 w - - 0 1', 'b7a8q', 5 + 9 - 1),       # Capture and promotion
+    ('k7/8/8/8/8/2p5/1K6/8 w - - 0 1', 'b2c3', 1),
+    ('k7/1p6/8/8/8/8/1R6/K7 w - - 0 1', 'b2b7', 1 - 5),
+    ('k7/1p6/8/8/8/8/1R6/KQ6 w - - 0 1', 'b2b7', 1),                # The king may not recapture
+])
+def test_static_exchange_evaluation(fen, uci, expected):
+    position = Position(fen)
+    move = find(position, uci)
+    assert position.see(move) == expected
+    assert position.fen() == fen
+
+
+def test_see_values_are_pawn_units():
+    assert SEE_VALUES[:5] == (1, 3, 3, 5, 9)
+
+
+def test_quiescence_takes_what_hangs_and_leaves_what_is_defended():
+    # Both knights hang; the queen on d5 is defended
+    searcher = searcher_for('k7/8/2p5/3q4/8/2n1N3/8/K2Q4 w - - 0 1')
+    static = searcher.evaluate()
+    score = searcher.quiesce(-1000, 1000, 0)
+    assert score >= static + 3 - 1  # Wins the knight on c3 at least
+    move, _ = searcher.search(1)
+    assert move_to_uci(move) in ('d1c3', 'e3d5')
+    assert searcher.position.fen() == 'k7/8/2p5/3q4/8/2n1N3/8/K2Q4 w - - 0 1'
+
+
+def test_depth_one_search_does_not_grab_a_defended_pawn():
+    searcher = searcher_for('k7/8/2p5/3p4/8/8/3Q4/K7 w - - 0 1')
+    move, _ = searcher.search(1)
+    assert move_to_uci(move) != 'd2d5'
+
+
+def test_quiescence_sees_mate_in_check():
+    searcher = searcher_for('rnb1kbnr/pppp1ppp/8/4p3/6Pq/5P2/PPPPP2P/RNBQKBNR w KQkq - 1 3')
+    assert searcher.quiesce(-1000, 1000, 0) == -MATE_SCORE
+
+
+def selective_searcher(fen, enabled):
+    searcher = searcher_for(fen)
+    searcher.configure(null_move_pruning=enabled, late_move_reductions=enabled,
+                       principal_variation_search=enabled)
+    return searcher
+
+
+@pytest.mark.parametrize('fen, uci, mate_in', [
+    ('kbK5/pp6/1P6/8/8/8/8/R7 w - - 0 1', 'a1a6', 2),
+    ('r1bqkb1r/pppp1ppp/2n2n2/4p2Q/2B1P3/8/PPPP1PPP/RNB1K1NR w KQkq - 4 4', 'h5f7', 1),
+    ('6k1/5ppp/8/8/8/8/5PPP/3R2K1 w - - 0 1', 'd1d8', 1),           # Back rank
+])
+def test_selective_search_still_finds_mates(fen, uci, mate_in):
+    # Reductions may hide a quiet mating move at low depths, not with a ply to spare
+    for enabled in (False, True):
+        searcher = selective_searcher(fen, enabled)
+        move, score = searcher.search(5)
+        assert move_to_uci(move) == uci
+        assert score == MATE_SCORE - (2 * mate_in - 1)
+
+
+def test_selective_search_visits_fewer_nodes():
+    full = selective_searcher(KIWIPETE_FEN, False)
+    full.search(4)
+    selective = selective_searcher(KIWIPETE_FEN, True)
+    move, _ = selective.search(4)
+    assert move in selective.position.legal_moves()
+    assert selective.nodes < full.nodes
+    assert selective.position.fen() == KIWIPETE_FEN
+
+
+def null_moves_tried(fen, depth, monkeypatch):
+    searcher = selective_searcher(fen, True)
+    position = searcher.position
+    passes = []
+
+    def make_null():
+        passes.append(position.fen())
+        Position.make_null(position)
+    monkeypatch.setattr(position, 'make_null', make_null)
+    searcher.search(depth)
+    return len(passes)
+
+
+def test_no_null_move_with_only_king_and_pawns(monkeypatch):
+    assert null_moves_tried(OPENING_FEN, 4, monkeypatch)
+    # Zugzwang is common in pawn endings: passing would often be the best move there
+    assert not null_moves_tried('8/8/1p6/1Pk5/8/2K5/8/8 w - - 0 1', 6, monkeypatch)
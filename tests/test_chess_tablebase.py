@@ -0,0 +1,220 @@
+import os
+import random
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess_bitboard import PAWN, WHITE, BLACK, PIECE_SYMBOLS, Position, move_promotion
+from chess_eval import PawnHashTable, side_to_move_evaluator
+from chess_search import ChessSearch, MATE_SCORE
+from chess_tablebase import (
+    WIN, DRAW, LOSS, Ending, Tablebase, _legal_moves, _transform, _unmoves, dependencies,
+    ending_name, generate_all, get_default_tablebase, is_ending_name
+)
+
+tablebase = get_default_tablebase()
+needs_tables = pytest.mark.skipif(tablebase is None, reason='endgame tables not generated')
+
+FOUR_MEN = ('KQKR', 'KRKP', 'KBNK')
+SHIPPED = ('KQK', 'KRK', 'KPK', 'KBNK')
+
+
+def random_placement(ending, rng):
+    """Squares of the ending's men, pawns off the back ranks"""
+    while True:
+        squares = [rng.randrange(8, 56) if piece_type == PAWN else rng.randrange(64)
+                   for _, piece_type in ending.men]
+        if len(set(squares)) == len(squares):
+            return squares
+
+
+def to_fen(ending, squares, side):
+    board = ['.'] * 64
+    for (color, piece_type), sq in zip(ending.men, squares):
+        if sq >= 0:
+            board[sq] = PIECE_SYMBOLS[color * 6 + piece_type]
+    rows = []
+    for row in range(8):
+        text = ''.join(board[row * 8:row * 8 + 8])
+        for empty in range(8, 0, -1):
+            text = text.replace('.' * empty, str(empty))
+        rows.append(text)
+    return f"{'/'.join(rows)} {'wb'[side]} - - 0 1"
+
+
+def random_positions(name, count, seed):
+    """(ending, squares, side, Position) of legal positions: the side that just moved is not in check"""
+    ending = Ending(name)
+    rng = random.Random(seed)
+    found = []
+    while len(found) < count:
+        squares = random_placement(ending, rng)
+        side = rng.choice((WHITE, BLACK))
+        position = Position(to_fen(ending, squares, side))
+        if position.is_attacked(position.king_square(side ^ 1), side):
+            continue
+        found.append((ending, squares, side, position))
+    return found
+
+
+def engine_moves(position):
+    return sorted((move & 63, (move >> 6) & 63, move_promotion(move)) for move in position.legal_moves())
+
+
+def solver_moves(ending, squares, side):
+    return sorted((squares[man], to, promotion) for man, to, _, promotion in _legal_moves(ending.men, squares, side))
+
+
+def brute_force(position, plies):
+    """WIN or LOSS if the side to move is mated or mates within plies, else None"""
+    moves = position.legal_moves()
+    if not moves:
+        return LOSS if position.in_check() else DRAW
+    if plies <= 0:
+        return None
+    results = []
+    for move in moves:
+        position.make(move)
+        results.append(brute_force(position, plies - 1))
+        position.unmake()
+    if LOSS in results:
+        return WIN
+    if all(result == WIN for result in results):
+        return LOSS
+    return None
+
+
+def test_ending_names():
+    assert ending_name([], [4]) == ('KQK', True)
+    assert ending_name([3], [0]) == ('KRKP', False)
+    assert ending_name([0], [3]) == ('KRKP', True)
+    assert ending_name([2, 1], []) == ('KBNK', False)
+    assert is_ending_name('KQKR') and not is_ending_name('KRKQ') and not is_ending_name('KNBK')
+    assert not is_ending_name('KQ') and not is_ending_name('KXK')
+    assert dependencies('KQK') == []
+    assert dependencies('KPK') == ['KQK', 'KRK']
+    assert dependencies('KRKP') == ['KPK', 'KQK', 'KQKR', 'KRK', 'KRKB', 'KRKN', 'KRKR']
+
+
+@pytest.mark.parametrize('name', ('KQK', 'KPK') + FOUR_MEN)
+def test_symmetric_placements_share_an_index(name):
+    ending = Ending(name)
+    pawns = ending.diagonal == ()
+    transforms = [(files, False, False) for files in (False, True)] if pawns else \
+        [(files, ranks, transpose) for files in (False, True) for ranks in (False, True) for transpose in (False, True)]
+    rng = random.Random(3)
+    for _ in range(300):
+        squares = random_placement(ending, rng)
+        index = ending.index(squares)
+        assert 0 <= index < ending.size
+        standard = ending.placement(index)
+        assert ending.index(standard) == index
+        for transform in transforms:
+            assert ending.index([_transform(sq, *transform) for sq in squares]) == index
+
+
+@pytest.mark.parametrize('name', ('KQK', 'KPK') + FOUR_MEN)
+def test_solver_moves_match_the_engine(name):
+    for ending, squares, side, position in random_positions(name, 150, seed=len(name)):
+        assert solver_moves(ending, squares, side) == engine_moves(position), position.fen()
+
+
+@pytest.mark.parametrize('name', ('KPK',) + FOUR_MEN)
+def test_unmoves_find_every_predecessor(name):
+    for ending, squares, side, position in random_positions(name, 100, seed=7):
+        index = ending.index(squares)
+        for man, to, captured, promotion in _legal_moves(ending.men, squares, side):
+            if captured >= 0 or promotion is not None:
+                continue
+            after = list(squares)
+            after[man] = to
+            assert index in _unmoves(ending, after, side ^ 1), position.fen()
+
+
+def test_generated_tables_match_the_shipped_ones(tmp_path):
+    generate_all(str(tmp_path), pieces=3, names=['KQK'])
+    small = Tablebase(str(tmp_path))
+    assert small.max_men == 3 and list(small.tables) == ['KQK']
+    if tablebase is not None:
+        for _, _, _, position in random_positions('KQK', 200, seed=2):
+            assert small.probe(position) == tablebase.probe(position)
+    small.close()
+
+
+@needs_tables
+@pytest.mark.parametrize('name, longest', [('KQK', 19), ('KRK', 31), ('KPK', 55), ('KBNK', 65)])
+def test_longest_wins(name, longest):
+    # Mate in 10, 16, 28 and 33 moves
+    table = tablebase.tables[name]
+    values = [table.value(side, index) for side in (WHITE, BLACK) for index in range(table.ending.size)]
+    assert max(value - 1 for value in values if value and not value & 1) == longest
+
+
+@needs_tables
+@pytest.mark.parametrize('name', SHIPPED)
+def test_results_agree_with_the_moves(name):
+    # A result must follow from the results one move later
+    for _, _, _, position in random_positions(name, 150, seed=11):
+        children = []
+        for move in position.legal_moves():
+            position.make(move)
+            children.append(tablebase.probe(position))
+            position.unmake()
+        if None in children:
+            continue  # A capture left the tables
+        wins = [plies for result, plies in children if result == LOSS]
+        if not children:
+            expected = (LOSS, 0) if position.in_check() else (DRAW, 0)
+        elif wins:
+            expected = (WIN, min(wins) + 1)
+        elif all(result == WIN for result, _ in children):
+            expected = (LOSS, max(plies for _, plies in children) + 1)
+        else:
+            expected = (DRAW, 0)
+        assert tablebase.probe(position) == expected, position.fen()
+
+
+@needs_tables
+@pytest.mark.parametrize('name', ['KQK', 'KRK'])
+def test_short_results_match_a_brute_force_search(name):
+    checked = 0
+    for _, _, _, position in random_positions(name, 3000, seed=5):
+        result, plies = tablebase.probe(position)
+        if result == DRAW or plies > 3:
+            continue
+        checked += 1
+        assert brute_force(position, plies) == result, position.fen()
+        if plies >= 2:
+            # Not any sooner
+            assert brute_force(position, plies - 2) is None, position.fen()
+    assert checked > 5
+
+
+@needs_tables
+def test_colours_swapped_probe_alike():
+    for _, _, _, position in random_positions('KRK', 50, seed=8) + random_positions('KPK', 50, seed=8):
+        fen = position.fen().split()
+        rows = fen[0].split('/')[::-1]
+        swapped = Position(f"{'/'.join(rows).swapcase()} {'bw'[fen[1] == 'b']} - - 0 1")
+        assert tablebase.probe(swapped) == tablebase.probe(position)
+
+
+@needs_tables
+def test_uncovered_positions_are_not_probed():
+    assert tablebase.probe(Position()) is None
+    assert tablebase.probe(Position('4k3/8/8/8/8/8/8/R3K3 w Q - 0 1')) is None  # Castling
+    assert tablebase.probe(Position('8/8/8/8/8/8/8/K1k5 w - - 0 1')) == (DRAW, 0)
+    assert tablebase.probe(Position('8/8/8/8/8/8/8/KBk5 b - - 0 1')) == (DRAW, 0)
+
+
+@needs_tables
+def test_search_plays_the_quickest_mate_from_the_tables():
+    position = Position('7k/8/8/5K2/8/8/8/6Q1 w - - 0 1')
+    searcher = ChessSearch(position, side_to_move_evaluator(position, PawnHashTable()), tablebase=tablebase)
+    assert tablebase.probe(position) == (WIN, 3)
+    move, score = searcher.probe_root()
+    assert score == MATE_SCORE - 3
+    position.make(move)
+    assert tablebase.probe(position) == (LOSS, 2)
@@ -0,0 +1,76 @@
+import os
+import random
+import sys
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess_bitboard import Position
+from chess_eval import PawnHashTable, evaluate_position
+from chess_tune import PST_PARAMETERS, TexelTuner, current_parameters, extract_features
+
+
+def random_positions(count, seed=9):
+    """FENs from random games, each labelled with a made-up result"""
+    rng = random.Random(seed)
+    lines = []
+    while len(lines) < count:
+        position = Position()
+        for _ in range(rng.randrange(10, 60)):
+            moves = position.legal_moves()
+            if not moves:
+                break
+            position.make(rng.choice(moves))
+        if not position.in_check():
+            lines.append(f"{position.fen()} {rng.choice(['1-0', '0-1', '1/2-1/2'])}")
+    return lines
+
+
+@pytest.fixture(scope='module')
+def dataset(tmp_path_factory):
+    path = tmp_path_factory.mktemp('tune') / 'positions.txt'
+    lines = random_positions(40)
+    path.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    return lines, extract_features(str(path), skip_plies=0)
+
+
+def test_features_score_like_the_engine(dataset):
+    lines, features = dataset
+    assert len(features['results']) == len(lines)
+    scores = TexelTuner(features).scores(current_parameters())
+    pawn_table = PawnHashTable()
+    for line, score in zip(lines, scores):
+        fen = ' '.join(line.split()[:6])
+        assert score == pytest.approx(evaluate_position(Position(fen), pawn_table), abs=1e-3)
+
+
+def test_gradient_matches_finite_differences(dataset):
+    _, features = dataset
+    tuner = TexelTuner(features)
+    params = current_parameters()
+    scale = 0.8
+    _, gradient = tuner.gradient(params, scale)
+    rng = random.Random(4)
+    # Piece values, table entries of pieces on the board, and pawn terms
+    columns = list(range(5)) + rng.sample(range(5, PST_PARAMETERS), 20) + \
+        list(range(PST_PARAMETERS, len(params)))
+    step = 0.05
+    for column in columns:
+        up, down = params.copy(), params.copy()
+        up[column] += step
+        down[column] -= step
+        numeric = (tuner.loss(up, scale) - tuner.loss(down, scale)) / (2 * step)
+        assert gradient[column] == pytest.approx(numeric, rel=1e-2, abs=1e-5), column
+
+
+def test_tuning_lowers_the_loss(dataset):
+    _, features = dataset
+    tuner = TexelTuner(features)
+    params = current_parameters()
+    scale = tuner.fit_scale(params)
+    assert 0.01 < scale < 5.0
+    tuned = tuner.tune(params, scale, iterations=50, report_every=0)
+    assert tuner.loss(tuned, scale) < tuner.loss(params, scale)
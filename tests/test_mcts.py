@@ -0,0 +1,109 @@
+import os
+import random
+import sys
+
+ROOT = os.path.join(os.path.dirname(__file__), '..')
+sys.path.insert(0, os.path.join(ROOT, 'src', 'PlantvsAi_zombitx64', 'game'))
+sys.path.insert(0, ROOT)
+
+from algorithm.mcts import MCTS
+from checkers import Checkers
+from checkers_bitboard import Position as CheckersPosition, square
+from chess import Chess
+from chess_bitboard import Position as ChessPosition, move_to_uci
+
+
+class Nim:
+    """Take one to three stones; whoever takes the last stone wins"""
+    def __init__(self, stones):
+        self.stones = stones
+        self.taken = []
+
+    def legal_moves(self):
+        return list(range(1, min(3, self.stones) + 1))
+
+    def play(self, move):
+        self.stones -= move
+        self.taken.append(move)
+
+    def undo(self):
+        self.stones += self.taken.pop()
+
+    def terminal(self):
+        return self.stones == 0
+
+    def result(self):
+        return -1  # The other side took the last stone
+
+    def hash(self):
+        return self.stones * 2 + len(self.taken) % 2
+
+
+def test_any_game_with_the_protocol():
+    game = Nim(9)
+    # Taking one leaves a multiple of four, a lost position for the other side
+    assert MCTS(seed=3).search(game, time_limit=10, max_iterations=3000) == 1
+    assert game.stones == 9 and not game.taken
+
+
+def test_finished_game_has_no_move():
+    assert MCTS().search(Nim(0), max_iterations=10) is None
+
+
+def test_checkers_terminal_matches_move_generation():
+    rng = random.Random(3)
+    for _ in range(100):
+        position = CheckersPosition()
+        while True:
+            moves = position.legal_moves()
+            assert position.terminal() == (not moves)
+            if not moves:
+                assert position.result() == -1
+                break
+            position.play(rng.choice(moves))
+
+
+def test_checkers_search_restores_the_position():
+    position = CheckersPosition()
+    fen, key = position.fen(), position.key
+    move = MCTS(seed=1).search(position, time_limit=10, max_iterations=300)
+    assert move in position.legal_moves()
+    assert (position.fen(), position.key, position.ply) == (fen, key, 0)
+
+
+def test_chess_search_finds_mate_in_one():
+    position = ChessPosition('6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1')
+    move = MCTS(seed=1, rollout_limit=30).search(position, time_limit=30, max_iterations=3000)
+    assert move_to_uci(move) == 'a1a8'
+    assert position.fen() == '6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1'
+
+
+def test_games_get_an_ai_move():
+    checkers = Checkers()
+    checkers.set_difficulty('hard')
+    assert checkers.make_move(5, 1, 4, 0)
+    (from_row, from_col), (to_row, to_col) = checkers.get_ai_move()
+    assert checkers.position.find_move(square(from_row, from_col), square(to_row, to_col)) is not None
+
+    chess = Chess()
+    chess.set_difficulty('hard')
+    chess.make_move(6, 4, 4, 4)
+    fen = chess.position.fen()
+    (from_row, from_col), (to_row, to_col), promotion = chess.get_ai_move()
+    assert chess.position.fen() == fen
+    assert chess.board[from_row][from_col]['color'] == 'black'
+    assert promotion is None
+
+
+def test_chess_ai_move_keeps_the_promotion_piece():
+    chess = Chess()
+    chess.set_difficulty('easy')
+    # The king is boxed in, so every legal move promotes the b-pawn
+    chess.position.set_fen('k7/P7/K7/8/8/8/1p6/8 b - - 0 1')
+    chess._sync_board()
+    chess.player_turn = False
+    (from_row, from_col), (to_row, to_col), promotion = chess.get_ai_move()
+    assert ((from_row, from_col), (to_row, to_col)) == ((6, 1), (7, 1))
+    assert promotion in ('Q', 'R', 'B', 'N')
+    assert chess.make_move(from_row, from_col, to_row, to_col, promotion)
+    assert chess.board[7][1] == {'piece': promotion, 'color': 'black', 'moved': True}
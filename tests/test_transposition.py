@@ -0,0 +1,84 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'src', 'PlantvsAi_zombitx64', 'game'))
+
+from chess_bitboard import Position, move_to_uci
+from chess_eval import PawnHashTable, side_to_move_evaluator
+from chess_search import ChessSearch, MATE_SCORE, _score_from_tt, _score_to_tt
+from transposition import (
+    TranspositionTable, ZobristKeys, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE
+)
+
+
+def test_zobrist_keys_are_reproducible():
+    first, second = ZobristKeys(12, 64), ZobristKeys(12, 64)
+    assert first.pieces == second.pieces and first.side == second.side
+    placements = [(0, 8), (5, 60), (11, 4)]
+    assert first.hash(placements) == first.hash(reversed(placements))
+    assert first.hash(placements, 1) == first.hash(placements) ^ first.side
+
+
+def test_store_and_probe():
+    tt = TranspositionTable(size_bits=4)
+    assert tt.probe(42) is None
+    tt.store(42, 3, LOWER_BOUND, 1.5, 7)
+    assert tt.probe(42) == (3, LOWER_BOUND, 1.5, 7)
+    assert tt.best_move(42) == 7
+    # A result without a move keeps the move already known
+    tt.store(42, 4, UPPER_BOUND, -0.5)
+    assert tt.probe(42) == (4, UPPER_BOUND, -0.5, 7)
+    assert tt.stats()['hits'] == 2 and tt.stats()['misses'] == 1
+    tt.clear()
+    assert tt.probe(42) is None and tt.best_move(42) == NO_MOVE
+
+
+def test_replacement_keeps_the_deep_entry():
+    tt = TranspositionTable(size_bits=4)
+    deep, shallow, other = 3, 3 + 16, 3 + 32  # All on index 3
+    tt.store(deep, 8, EXACT, 1.0, 1)
+    tt.store(shallow, 2, EXACT, 2.0, 2)
+    # The shallow result went to the always-replace slot
+    assert tt.probe(deep)[0] == 8 and tt.probe(shallow)[0] == 2
+    tt.store(other, 1, EXACT, 3.0, 3)
+    assert tt.probe(deep)[0] == 8
+    assert tt.probe(shallow) is None
+    assert tt.stats()['overwrites'] == 1
+
+    # In a new search the old deep entry may be replaced, and moves to the second slot
+    tt.new_search()
+    tt.store(shallow, 1, EXACT, 4.0, 4)
+    assert tt.probe(shallow) == (1, EXACT, 4.0, 4)
+    assert tt.probe(deep)[0] == 8
+    assert tt.probe(other) is None
+    assert tt.stats()['overwrites'] == 2
+
+
+def test_storing_the_same_position_is_not_an_overwrite():
+    tt = TranspositionTable(size_bits=4)
+    for depth in range(1, 6):
+        tt.store(5, depth, EXACT, 0.0, depth)
+    assert tt.stats()['overwrites'] == 0
+    assert tt.probe(5) == (5, EXACT, 0.0, 5)
+
+
+def test_mate_scores_are_stored_relative_to_the_node():
+    for ply in range(0, 10):
+        for score in (MATE_SCORE - 7, -(MATE_SCORE - 7), 3.25, 0):
+            assert _score_from_tt(_score_to_tt(score, ply), ply) == score
+    # Mated 5 plies below the root, seen from a node 3 plies below it: mate in 2 there
+    assert _score_to_tt(-(MATE_SCORE - 5), 3) == -(MATE_SCORE - 2)
+
+
+def test_search_keeps_mate_distances_through_the_table():
+    # Ra6 and mate next move
+    position = Position('kbK5/pp6/1P6/8/8/8/8/R7 w - - 0 1')
+    searcher = ChessSearch(position, side_to_move_evaluator(position, PawnHashTable()))
+    for depth in (3, 4, 5):
+        move, score = searcher.search(depth)
+        assert move_to_uci(move) == 'a1a6'
+        assert score == MATE_SCORE - 3
+    position.make(move)
+    depth, flag, stored, _ = searcher.tt.probe(position.key)
+    assert _score_from_tt(stored, 1) == -(MATE_SCORE - 3)
+    assert stored == -(MATE_SCORE - 2)